@@ -0,0 +1,182 @@
+import os, math, time, heapq, asyncio, itertools
+from collections import Counter
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+import metrics
+
+# Priority classes, best first; requests are classed by endpoint, background work is "batch"
+CLASSES = ("interactive", "standard", "batch")
+RANK = {c: i for i, c in enumerate(CLASSES)}
+ENDPOINT_CLASS = {
+    "/hint": "interactive", "/hint/stream": "interactive", "/grade/short": "interactive",
+    "/generate": "standard", "/generate/stream": "standard", "/grade/short/batch": "standard",
+    "/generate/batch": "batch",
+    **{
+        k.strip(): v.strip() for k, v in
+        (item.split("=", 1) for item in os.getenv("ADMISSION_ENDPOINT_CLASS", "").split(",") if "=" in item)
+    },
+}
+
+
+def _per_class(env: str, default: str) -> Dict[str, float]:
+    return {k.strip(): float(v) for k, v in
+            (item.split("=", 1) for item in os.getenv(env, default).split(",") if "=" in item)}
+
+
+# Waiters allowed per class and (backend, model); beyond that requests get 429
+QUEUE_LIMITS = {k: int(v) for k, v in _per_class("ADMISSION_QUEUE_LIMITS", "interactive=64,standard=32,batch=256").items()}
+# Deadline when the client sends none (seconds, 0 = none); clients send X-Deadline-Ms
+DEFAULT_DEADLINES = _per_class("ADMISSION_DEADLINES", "interactive=60,standard=0,batch=0")
+# Slots per (backend, model) that batch work may never take, so interactive calls are not starved
+RESERVED = int(os.getenv("ADMISSION_RESERVED", "1"))
+
+priority_var: ContextVar[str] = ContextVar("admission_priority", default="standard")
+deadline_var: ContextVar[Optional[float]] = ContextVar("admission_deadline", default=None)  # time.monotonic()
+
+_shed: Counter = Counter()
+
+
+class Rejected(Exception):
+    """Shed before reaching the LLM; the service turns it into 429/503 with Retry-After."""
+
+    def __init__(self, status: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+def begin_request(endpoint: str, deadline_ms: Optional[str]) -> None:
+    cls = ENDPOINT_CLASS.get(endpoint, "standard")
+    priority_var.set(cls)
+    budget = None
+    if deadline_ms:
+        try:
+            budget = float(deadline_ms) / 1000.0
+        except ValueError:
+            budget = None
+    if budget is None and DEFAULT_DEADLINES.get(cls):
+        budget = DEFAULT_DEADLINES[cls]
+    deadline_var.set(time.monotonic() + budget if budget else None)
+
+
+async def run_as(cls: str, coro):
+    """Await coro in another priority class (call it inside its own task: the change is task-local)."""
+    priority_var.set(cls)
+    return await coro
+
+
+def _shed_one(cls: str, reason: str) -> None:
+    _shed[(cls, reason)] += 1
+    metrics.ADMISSION_SHED.labels(cls, reason).inc()
+
+
+class Gate:
+    """
+    Priority semaphore for one (backend, model). Waiters are served best class first,
+    FIFO within a class; per-class queues are bounded; waiters whose deadline passes
+    are dropped; batch work never holds more than limit - ADMISSION_RESERVED slots.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.active: Counter = Counter()
+        self.queued: Counter = Counter()
+        self.ewma_s: Optional[float] = None  # slot hold time, for wait estimates
+        self._heap: list = []
+        self._seq = itertools.count()
+
+    def _can_run(self, cls: str) -> bool:
+        if sum(self.active.values()) >= self.limit:
+            return False
+        return cls != "batch" or self.active["batch"] < max(1, self.limit - RESERVED)
+
+    def _estimate(self, cls: str) -> float:
+        ahead = sum(n for c, n in self.queued.items() if RANK[c] <= RANK[cls])
+        return (ahead + 1) * (self.ewma_s or 1.0) / self.limit
+
+    def _dispatch(self) -> None:
+        now = time.monotonic()
+        while self._heap:
+            rank, _, cls, deadline, fut = self._heap[0]
+            if fut.done():
+                heapq.heappop(self._heap)
+                continue
+            if deadline is not None and now >= deadline:
+                heapq.heappop(self._heap)
+                fut.set_exception(Rejected(503, "Deadline passed while queued for the LLM.", self._estimate(cls)))
+                continue
+            if not self._can_run(cls):
+                return  # best waiter cannot run yet; everything behind it ranks the same or lower
+            heapq.heappop(self._heap)
+            self.active[cls] += 1
+            fut.set_result(None)
+
+    def _release(self, cls: str, held_s: Optional[float]) -> None:
+        self.active[cls] -= 1
+        if held_s is not None:
+            self.ewma_s = held_s if self.ewma_s is None else 0.2 * held_s + 0.8 * self.ewma_s
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self):
+        cls = priority_var.get()
+        deadline = deadline_var.get()
+        now = time.monotonic()
+        if deadline is not None and now >= deadline:
+            _shed_one(cls, "expired")
+            raise Rejected(503, "Deadline passed before the LLM call was scheduled.", 1)
+        if not self._heap and self._can_run(cls):
+            self.active[cls] += 1
+        else:
+            if self.queued[cls] >= QUEUE_LIMITS.get(cls, 32):
+                _shed_one(cls, "queue_full")
+                raise Rejected(429, f"LLM queue for {cls} requests is full.", self._estimate(cls))
+            wait = self._estimate(cls)
+            if deadline is not None and self.ewma_s is not None and now + wait > deadline:
+                _shed_one(cls, "deadline")
+                raise Rejected(503, "The LLM queue is too long to meet the request deadline.", wait)
+            fut = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._heap, (RANK[cls], next(self._seq), cls, deadline, fut))
+            self.queued[cls] += 1
+            metrics.ADMISSION_QUEUED.labels(cls).inc()
+            self._dispatch()  # a free slot may be held back only for batch waiters ahead of us
+            try:
+                if deadline is None:
+                    await fut
+                else:
+                    await asyncio.wait_for(fut, max(0.0, deadline - now))
+            except asyncio.TimeoutError:
+                _shed_one(cls, "expired")
+                raise Rejected(503, "Deadline passed while queued for the LLM.", self._estimate(cls))
+            except Rejected:
+                _shed_one(cls, "expired")
+                raise
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled() and fut.exception() is None:
+                    self._release(cls, None)  # granted as we were cancelled: hand the slot on
+                raise
+            finally:
+                self.queued[cls] -= 1
+                metrics.ADMISSION_QUEUED.labels(cls).dec()
+        metrics.ADMISSION_WAIT.labels(cls).observe(time.monotonic() - now)
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(cls, time.monotonic() - t0)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit, "active": dict(+self.active), "queued": dict(+self.queued),
+            "ewma_s": round(self.ewma_s, 3) if self.ewma_s is not None else None,
+        }
+
+
+def stats() -> dict:
+    return {
+        "queue_limits": QUEUE_LIMITS, "default_deadlines": DEFAULT_DEADLINES, "reserved": RESERVED,
+        "shed": {f"{c}/{r}": n for (c, r), n in sorted(_shed.items())},
+    }
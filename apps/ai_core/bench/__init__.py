@@ -0,0 +1,9 @@
+"""
+Load-testing and benchmark tools for ai_core (run from apps/ai_core):
+
+    python -m bench.fake_llm --port 11500 --latency lognormal:0.4,0.5 --tokens-per-s 25 --malformed 0.05
+    LLM_BASE_URL=http://localhost:11500/v1 uvicorn service:app --port 8000
+    python -m bench.load --base http://localhost:8000 --scenario mix --rps 10 --duration 60 --out load.json
+    python -m bench.micro --out micro.json
+    python -m bench.compare before.json after.json
+"""
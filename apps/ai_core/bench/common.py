@@ -0,0 +1,53 @@
+import json, math, os, platform, subprocess, time
+from typing import Dict, List
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    k = (len(sorted_values) - 1) * p / 100.0
+    lo, hi = math.floor(k), math.ceil(k)
+    if lo == hi:
+        return sorted_values[lo]
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(latencies_s: List[float], wall_s: float, errors: int = 0, **extra) -> Dict:
+    xs = sorted(latencies_s)
+    ms = lambda v: round(v * 1000.0, 3)
+    return {
+        "count": len(xs), "errors": errors,
+        "throughput_rps": round(len(xs) / wall_s, 3) if wall_s > 0 else 0.0,
+        "mean_ms": ms(sum(xs) / len(xs)) if xs else None,
+        "p50_ms": ms(percentile(xs, 50)) if xs else None,
+        "p95_ms": ms(percentile(xs, 95)) if xs else None,
+        "p99_ms": ms(percentile(xs, 99)) if xs else None,
+        "max_ms": ms(xs[-1]) if xs else None,
+        **extra,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, timeout=5, cwd=os.path.dirname(__file__)).stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def write_results(path: str, kind: str, args: Dict, results: Dict) -> Dict:
+    doc = {
+        "meta": {
+            "kind": kind, "commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(), "host": platform.node(), "args": args,
+        },
+        "results": results,
+    }
+    text = json.dumps(doc, indent=2, ensure_ascii=False)
+    if path == "-":
+        print(text)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"wrote {path}")
+    return doc
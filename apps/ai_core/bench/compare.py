@@ -0,0 +1,59 @@
+"""
+Compare two benchmark result files (bench.load / bench.micro output).
+
+    python -m bench.compare baseline.json candidate.json --threshold 0.10
+
+Lower is better for *_ms / *_us / *_s; higher is better for throughput_rps, ops_per_s and
+queries_per_s. Exits 1 if any metric regressed by more than the threshold.
+"""
+import argparse, json, sys
+
+HIGHER_IS_BETTER = ("throughput_rps", "ops_per_s", "queries_per_s")
+LOWER_IS_BETTER = ("_ms", "_us", "_s")
+
+
+def flatten(d, prefix=""):
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            yield from flatten(v, key + ".")
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            yield key, float(v)
+
+
+def direction(key: str) -> int:
+    leaf = key.rsplit(".", 1)[-1]
+    if leaf in HIGHER_IS_BETTER:
+        return 1
+    if leaf.endswith(LOWER_IS_BETTER) and not leaf.startswith("max"):
+        return -1
+    return 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("baseline")
+    ap.add_argument("candidate")
+    ap.add_argument("--threshold", type=float, default=0.10)
+    a = ap.parse_args()
+    with open(a.baseline, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(a.candidate, encoding="utf-8") as f:
+        cand = json.load(f)
+    old = dict(flatten(base["results"]))
+    new = dict(flatten(cand["results"]))
+    print(f"baseline {base['meta'].get('commit')}  ->  candidate {cand['meta'].get('commit')}")
+    regressions = 0
+    for key in sorted(old.keys() & new.keys()):
+        sign = direction(key)
+        if sign == 0 or old[key] == 0:
+            continue
+        change = (new[key] - old[key]) / abs(old[key])
+        worse = -change * sign > a.threshold
+        regressions += worse
+        print(f"{'REGRESSION ' if worse else '           '}{key:60s} {old[key]:>12.3f} -> {new[key]:>12.3f} ({change:+.1%})")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Fake OpenAI-compatible LLM server for load tests (POST /v1/chat/completions, GET /v1/models).
+
+Answers look like what ai_core's prompts ask for (MCQ / short / coding / SQL JSON,
+grading JSON, hints with a <think> block), with tunable latency, token rate and
+a fraction of deliberately malformed outputs.
+
+    python -m bench.fake_llm --port 11500 --latency lognormal:0.4,0.5 --tokens-per-s 25 --malformed 0.05
+
+Latency specs: fixed:S | uniform:A,B | lognormal:MEDIAN,SIGMA | exp:MEAN (seconds, before the first token).
+"""
+import argparse, asyncio, json, os, random, re, time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CONFIG = {
+    "latency": os.getenv("FAKE_LLM_LATENCY", "lognormal:0.3,0.5"),
+    "tokens_per_s": float(os.getenv("FAKE_LLM_TOKENS_PER_S", "30")),
+    "malformed": float(os.getenv("FAKE_LLM_MALFORMED", "0")),
+    "error_rate": float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),  # HTTP 500s
+    "chars_per_token": 4,
+}
+
+app = FastAPI(title="fake-llm")
+_rng = random.Random(int(os.getenv("FAKE_LLM_SEED", "0")) or None)
+_stats = {"requests": 0, "streams": 0, "malformed": 0, "errors": 0}
+
+
+def sample_latency(spec: str) -> float:
+    kind, _, params = spec.partition(":")
+    p = [float(x) for x in params.split(",") if x.strip()]
+    if kind == "fixed":
+        return p[0]
+    if kind == "uniform":
+        return _rng.uniform(p[0], p[1])
+    if kind == "lognormal":
+        import math
+        return _rng.lognormvariate(math.log(max(p[0], 1e-6)), p[1])
+    if kind == "exp":
+        return _rng.expovariate(1.0 / p[0])
+    raise ValueError(f"unknown latency spec: {spec}")
+
+
+def _topic(text: str) -> str:
+    m = re.search(r"(?m)^Topic:\s*(.+?)\.?$", text)
+    return m.group(1).strip() if m else "general"
+
+
+def _difficulty(text: str) -> str:
+    m = re.search(r"Difficulty:\s*(easy|medium|hard)", text)
+    return m.group(1) if m else "easy"
+
+
+def answer_for(messages) -> str:
+    user = messages[-1].get("content", "") if messages else ""
+    n = _rng.randint(1, 10_000)
+    if "multiple-choice question" in user:
+        correct = _rng.choice("ABCD")
+        return json.dumps({
+            "type": "mcq", "topic": _topic(user), "difficulty": _difficulty(user),
+            "question": f"Which statement about {_topic(user)} is true? (variant {n})",
+            "choices": [{"id": c, "text": f"Option {c} for variant {n}", "correct": c == correct} for c in "ABCD"],
+            "correct_id": correct, "explanation": "Because the other options are false.",
+        })
+    if "short-answer question" in user:
+        return json.dumps({
+            "type": "short", "topic": _topic(user), "difficulty": _difficulty(user),
+            "prompt": f"Explain one key property of {_topic(user)} (variant {n}).",
+            "rubric_points": ["names the property", "explains why it matters", "gives an example"],
+        })
+    if "coding task" in user:
+        return json.dumps({
+            "type": "coding", "title": f"Sum list {n}", "language": "python", "difficulty": _difficulty(user),
+            "tags": ["arrays"], "prompt": "Return the sum of nums.", "signature": "def solve(nums):",
+            "starter_code": "def solve(nums):\n    pass\n",
+            "tests": [{"name": "basic", "input": "[1, 2, 3]", "expected": "6"},
+                      {"name": "empty", "input": "[]", "expected": "0"}],
+            "constraints": ["len(nums) <= 10^5"], "explanation": "Use a running total.",
+            "reference_solution": "def solve(nums):\n    return sum(nums)\n",
+        })
+    if "SQL task" in user:
+        return json.dumps({
+            "type": "sql", "title": f"Count films {n}", "dataset": "sakila", "difficulty": _difficulty(user),
+            "prompt": "How many films are there per rating?",
+            "canonical_query": "SELECT rating, COUNT(*) AS n FROM film GROUP BY rating",
+            "expected_result_hash": None, "hints": ["Use GROUP BY"],
+        })
+    if "Student answers (JSON array" in user:
+        m = re.search(r"Student answers \(JSON array of \{id, answer\}\):\n(\[.*\])", user, re.S)
+        ids = [a.get("id") for a in json.loads(m.group(1))] if m else []
+        return json.dumps({"results": [
+            {"id": i, "correct": _rng.random() < 0.6, "score": round(_rng.random(), 2), "feedback": "Terse feedback."}
+            for i in ids]})
+    if "Student answer" in user:
+        score = round(_rng.random(), 2)
+        return json.dumps({"correct": score >= 0.8, "score": score, "feedback": "Missing: an example."})
+    return "<think>The loop seems off by one.</think>Check the loop bounds against the array length. Then retest."
+
+
+def malform(text: str) -> str:
+    return _rng.choice([
+        lambda t: "```json\n" + t[: max(1, len(t) // 2)],  # truncated inside a fence
+        lambda t: "Sure! Here is the question:\n" + t,      # prose before the JSON
+        lambda t: t.replace('"type": "mcq"', '"type": "multiple_choice"').replace('"choices": [{', '"choices": "A) x; B) y", "x": [{'),
+        lambda t: "{}",
+    ])(text)
+
+
+def _completion(text: str, model: str) -> dict:
+    return {
+        "id": f"fake-{_rng.randint(0, 1 << 30)}", "object": "chat.completion", "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"completion_tokens": max(1, len(text) // CONFIG["chars_per_token"])},
+    }
+
+
+@app.get("/v1/models")
+async def models():
+    return {"object": "list", "data": [{"id": "fake", "object": "model"}]}
+
+
+@app.get("/stats")
+async def stats():
+    return {**_stats, "config": CONFIG}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    _stats["requests"] += 1
+    if _rng.random() < CONFIG["error_rate"]:
+        _stats["errors"] += 1
+        return JSONResponse({"error": {"message": "injected failure"}}, status_code=500)
+
+    text = answer_for(body.get("messages") or [])
+    if _rng.random() < CONFIG["malformed"]:
+        _stats["malformed"] += 1
+        text = malform(text)
+    cpt = CONFIG["chars_per_token"]
+    if body.get("max_tokens"):
+        text = text[: int(body["max_tokens"]) * cpt]
+    for s in body.get("stop") or []:
+        if s and s in text:
+            text = text[: text.index(s)]
+    first_token_s = sample_latency(CONFIG["latency"])
+    per_token_s = 1.0 / CONFIG["tokens_per_s"] if CONFIG["tokens_per_s"] > 0 else 0.0
+    model = body.get("model", "fake")
+
+    if not body.get("stream"):
+        await asyncio.sleep(first_token_s + per_token_s * (len(text) / cpt))
+        return _completion(text, model)
+
+    _stats["streams"] += 1
+
+    async def events():
+        await asyncio.sleep(first_token_s)
+        for i in range(0, len(text), cpt):
+            chunk = {"choices": [{"index": 0, "delta": {"content": text[i:i + cpt]}, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(per_token_s)
+        yield "data: " + json.dumps({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}) + "\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=11500)
+    ap.add_argument("--latency", default=CONFIG["latency"])
+    ap.add_argument("--tokens-per-s", type=float, default=CONFIG["tokens_per_s"])
+    ap.add_argument("--malformed", type=float, default=CONFIG["malformed"])
+    ap.add_argument("--error-rate", type=float, default=CONFIG["error_rate"])
+    ap.add_argument("--seed", type=int, default=None)
+    a = ap.parse_args()
+    sample_latency(a.latency)  # validate early
+    CONFIG.update(latency=a.latency, tokens_per_s=a.tokens_per_s, malformed=a.malformed, error_rate=a.error_rate)
+    if a.seed is not None:
+        _rng.seed(a.seed)
+    import uvicorn
+    uvicorn.run(app, host=a.host, port=a.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Drive a running ai_core at a target request rate (open loop) or concurrency (closed loop)
+and report p50/p95/p99 latency and throughput per scenario as JSON.
+
+    python -m bench.load --base http://localhost:8000 --scenario generate --rps 5 --duration 30
+    python -m bench.load --scenario mix --concurrency 16 --duration 60 --out load.json
+
+Scenarios: generate, grade_short, hint, ingest, mix (weighted blend of the four).
+"""
+import argparse, asyncio, itertools, random, time
+from collections import Counter, defaultdict
+
+import httpx
+
+from bench.common import summarize, write_results
+
+TOPICS = ["SQL GROUP BY", "AWS S3", "Amazon EFS", ".NET delegates", "Python generators", "HTTP caching"]
+SHORT_Q = {
+    "type": "short", "topic": "AWS S3", "difficulty": "easy",
+    "prompt": "Explain what S3 is used for.",
+    "rubric_points": ["object storage", "high durability", "accessed over HTTP"],
+}
+ANSWERS = [
+    "S3 is object storage with high durability, accessed over HTTP.",
+    "It stores files.",
+    "S3 is a block device you attach to EC2.",
+    "",
+]
+MIX = {"generate": 5, "grade_short": 3, "hint": 2, "ingest": 1}
+
+
+def make_request(scenario: str, n: int, rng: random.Random):
+    if scenario == "generate":
+        return "/generate", {"qtype": rng.choice(["mcq", "short"]), "topic": rng.choice(TOPICS),
+                             "difficulty": rng.choice(["easy", "medium"]), "distinct": True}
+    if scenario == "grade_short":
+        return "/grade/short", {"question": SHORT_Q, "answer_text": rng.choice(ANSWERS) + f" ({n})"}
+    if scenario == "hint":
+        return "/hint", {"question": {"type": "coding", "title": "Counting sort", "language": "python",
+                                      "prompt": "Sort nums with counting sort."},
+                         "failed_tests": [{"name": "dupes", "input": "[3,1,3]", "expected": "[1,3,3]"}],
+                         "partial_answer": "def solve(nums):\n    return nums"}
+    if scenario == "ingest":
+        topic = rng.choice(TOPICS)
+        return "/rag/ingest", {"title": f"{topic} note {n}", "source": "bench",
+                               "text": f"{topic} synthetic note {n}. " + " ".join(rng.choice(TOPICS) for _ in range(40))}
+    raise ValueError(scenario)
+
+
+def pick_scenario(scenario: str, rng: random.Random) -> str:
+    if scenario != "mix":
+        return scenario
+    names, weights = zip(*MIX.items())
+    return rng.choices(names, weights=weights)[0]
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    lat = defaultdict(list)
+    errors, statuses = Counter(), defaultdict(Counter)
+    counter = itertools.count()
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=max(args.concurrency, 100), max_keepalive_connections=max(args.concurrency, 100))
+
+    async with httpx.AsyncClient(base_url=args.base, timeout=timeout, limits=limits) as client:
+        async def one():
+            n = next(counter)
+            scen = pick_scenario(args.scenario, rng)
+            path, body = make_request(scen, n, rng)
+            t0 = time.perf_counter()
+            try:
+                r = await client.post(path, json=body)
+                statuses[scen][str(r.status_code)] += 1
+                if r.status_code >= 400:
+                    errors[scen] += 1
+                else:
+                    lat[scen].append(time.perf_counter() - t0)
+            except httpx.HTTPError as e:
+                statuses[scen][type(e).__name__] += 1
+                errors[scen] += 1
+
+        start = time.perf_counter()
+        deadline = start + args.duration
+        if args.rps:
+            # Open loop: arrivals don't wait for completions (Poisson by default)
+            tasks = []
+            t = start
+            while t < deadline:
+                gap = rng.expovariate(args.rps) if args.poisson else 1.0 / args.rps
+                t += gap
+                await asyncio.sleep(max(0.0, t - time.perf_counter()))
+                tasks.append(asyncio.create_task(one()))
+            await asyncio.gather(*tasks)
+        else:
+            async def worker():
+                while time.perf_counter() < deadline:
+                    await one()
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        wall = time.perf_counter() - start
+
+    results = {s: summarize(lat[s], wall, errors[s], status=dict(statuses[s])) for s in sorted(statuses)}
+    results["_all"] = summarize([x for xs in lat.values() for x in xs], wall, sum(errors.values()))
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--base", default="http://localhost:8000")
+    ap.add_argument("--scenario", default="mix", choices=["generate", "grade_short", "hint", "ingest", "mix"])
+    ap.add_argument("--rps", type=float, default=0.0, help="target arrival rate (open loop)")
+    ap.add_argument("--concurrency", type=int, default=8, help="workers when --rps is not given (closed loop)")
+    ap.add_argument("--no-poisson", dest="poisson", action="store_false", help="fixed inter-arrival gaps")
+    ap.add_argument("--duration", type=float, default=30.0)
+    ap.add_argument("--timeout", type=float, default=600.0)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", default="-")
+    args = ap.parse_args()
+    results = asyncio.run(run(args))
+    write_results(args.out, "load", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
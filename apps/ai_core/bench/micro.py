@@ -0,0 +1,118 @@
+"""
+Microbenchmarks for the hot pure-Python helpers and RAG retrieval.
+
+    python -m bench.micro --out micro.json
+    python -m bench.micro --only normalize_mcq,ensure_json --repeat 20000
+    python -m bench.micro --corpus-size 20000 --queries 200   # RAGIndex over a synthetic corpus
+
+RAG benchmarks need sentence-transformers (+ chromadb for --rag-backend chroma) and use a
+throwaway RAG_PERSIST dir. For store-only numbers (recall, latency, memory) see bench.vector_index.
+"""
+import argparse, json, os, random, tempfile, time
+
+from bench.common import summarize, write_results
+
+MCQ_VARIANTS = [
+    {"type": "mcq", "topic": "S3", "difficulty": "easy", "question": "q?",
+     "choices": [{"id": c, "text": f"t{c}", "correct": c == "B"} for c in "ABCD"], "correct_id": "B", "explanation": "e"},
+    {"type": "multiple_choice", "topic": "S3", "difficulty": "easy", "question": "q?",
+     "choices": ["A) one", "B) two", "C) three", "D) four"], "answer": "c", "explanation": "e"},
+    {"type": "MCQ", "topic": "S3", "difficulty": "easy", "question": "q?",
+     "choices": ["one", "two", "three", "four", "five"], "correct": "D) four", "explanation": "e"},
+]
+JSON_TEXT = json.dumps(MCQ_VARIANTS[0])
+YAML_TEXT = "type: mcq\ntopic: S3\ndifficulty: easy\nquestion: q?\ncorrect_id: B\nexplanation: e\nchoices:\n" + \
+    "".join(f"  - id: {c}\n    text: t{c}\n" for c in "ABCD")
+COT_TEXT = "<think>" + "Let me reason about the loop. " * 40 + "</think>\nCheck the loop bounds. Then retest."
+
+
+def timeit(fn, repeat: int, inner: int = 1) -> dict:
+    lat = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(inner):
+            fn()
+        lat.append((time.perf_counter() - t0) / inner)
+    wall = time.perf_counter() - start
+    # Sub-millisecond numbers read better in microseconds: summarize() scales by 1000, so feed it ms
+    out = {k.replace("_ms", "_us"): v for k, v in summarize([x * 1000 for x in lat], wall).items()}
+    out["ops_per_s"] = round(repeat * inner / wall, 1) if wall else None
+    return out
+
+
+def bench_helpers(repeat: int, only) -> dict:
+    from utils import normalize_mcq, ensure_json, strip_cot, first_sentence
+    cases = {
+        "normalize_mcq": lambda: [normalize_mcq(dict(v)) for v in MCQ_VARIANTS],
+        "ensure_json.json": lambda: ensure_json(JSON_TEXT),
+        "ensure_json.yaml": lambda: ensure_json(YAML_TEXT),
+        "strip_cot": lambda: strip_cot(COT_TEXT),
+        "first_sentence": lambda: first_sentence(strip_cot(COT_TEXT)),
+    }
+    return {name: timeit(fn, repeat) for name, fn in cases.items()
+            if not only or name.split(".")[0] in only}
+
+
+def synthetic_corpus(n: int, rng: random.Random):
+    topics = ["S3", "EBS", "EFS", "GROUP BY", "JOIN", "index", "delegate", "generator", "closure", "cache"]
+    words = "storage block file object query aggregate row column method type list value key lookup".split()
+    for i in range(n):
+        t = rng.choice(topics)
+        body = " ".join(rng.choice(words) for _ in range(rng.randint(40, 160)))
+        yield {"title": f"{t} doc {i}", "text": f"{t}: {body}.", "source": f"synthetic:{i}"}
+
+
+def bench_rag(corpus_size: int, queries: int, top_k: int, seed: int, backend: str) -> dict:
+    try:
+        import sentence_transformers  # noqa: F401
+        if backend == "chroma":
+            import chromadb  # noqa: F401
+    except ImportError as e:
+        return {"skipped": f"RAG dependencies missing: {e}"}
+    os.environ["RAG_PERSIST"] = tempfile.mkdtemp(prefix="bench_rag_")
+    os.environ.setdefault("RAG_CACHE_SIZE", "0")  # measure the real path, not the cache
+    from rag.indexer import RAGIndex
+    rng = random.Random(seed)
+    idx = RAGIndex(collection_name=f"bench_{corpus_size}", backend=backend)
+    docs = list(synthetic_corpus(corpus_size, rng))
+    t0 = time.perf_counter()
+    for i in range(0, len(docs), 256):
+        idx.add_documents(docs[i:i + 256])
+    ingest_s = time.perf_counter() - t0
+    qs = [f"{rng.choice(['S3', 'JOIN', 'delegate', 'cache'])} {rng.choice(['storage', 'query', 'method'])} {i}"
+          for i in range(queries)]
+    it = iter(qs)
+    single = timeit(lambda: idx.retrieve(next(it), top_k=top_k), repeat=queries)
+    batch = 32
+    t0 = time.perf_counter()
+    for i in range(0, len(qs), batch):
+        idx.retrieve_many(qs[i:i + batch], [top_k] * len(qs[i:i + batch]))
+    batched_s = time.perf_counter() - t0
+    return {
+        "backend": backend, "corpus_docs": corpus_size, "ingest_s": round(ingest_s, 3),
+        "retrieve": single,
+        "retrieve_many": {"batch": batch, "queries_per_s": round(len(qs) / batched_s, 1)},
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=5000)
+    ap.add_argument("--only", default="", help="comma-separated: normalize_mcq,ensure_json,strip_cot,first_sentence,rag")
+    ap.add_argument("--corpus-size", type=int, default=2000)
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--top-k", type=int, default=6)
+    ap.add_argument("--rag-backend", default=os.getenv("RAG_BACKEND", "chroma"), choices=["chroma", "numpy"])
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", default="-")
+    args = ap.parse_args()
+    only = {x.strip() for x in args.only.split(",") if x.strip()}
+    results = bench_helpers(args.repeat, only - {"rag"}) if only != {"rag"} else {}
+    if not only or "rag" in only:
+        results["rag"] = bench_rag(args.corpus_size, args.queries, args.top_k, args.seed, args.rag_backend)
+    write_results(args.out, "micro", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Vector store comparison: NumpyStore (float32 / float16 / int8) vs Chroma on
+recall@k against exact float32 search, query latency and memory, using synthetic
+clustered embeddings (no embedder needed).
+
+    python -m bench.vector_index --n 100000 --dim 384 --queries 200 --out index.json
+    python -m bench.vector_index --backends numpy:int8,chroma --batch 32
+"""
+import argparse, shutil, tempfile, time
+
+import numpy as np
+
+from bench.common import summarize, write_results
+
+
+def synthetic(n: int, dim: int, queries: int, seed: int):
+    # Clustered like real chunk embeddings, so top-k neighbours are not all near-ties
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(8, n // 200), dim)).astype(np.float32)
+    data = centers[rng.integers(0, len(centers), n)] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32)
+    qs = centers[rng.integers(0, len(centers), queries)] + 0.35 * rng.standard_normal((queries, dim)).astype(np.float32)
+    norm = lambda x: x / np.linalg.norm(x, axis=1, keepdims=True)
+    return norm(data), norm(qs)
+
+
+def exact_topk(data: np.ndarray, qs: np.ndarray, k: int) -> np.ndarray:
+    sims = data @ qs.T
+    top = np.argpartition(-sims, k - 1, axis=0)[:k].T
+    return top
+
+
+def run_backend(spec: str, data, qs, truth, k: int, batch: int, ingest_batch: int) -> dict:
+    from rag.stores import NumpyStore, ChromaStore
+    kind, _, dtype = spec.partition(":")
+    tmp = tempfile.mkdtemp(prefix="bench_vec_")
+    try:
+        if kind == "numpy":
+            store = NumpyStore("bench", tmp, dtype or "float16")
+        elif kind == "chroma":
+            try:
+                store = ChromaStore("bench", tmp)
+            except ImportError as e:
+                return {"skipped": f"chromadb missing: {e}"}
+        else:
+            raise ValueError(spec)
+        ids = [str(i) for i in range(len(data))]
+        t0 = time.perf_counter()
+        for s in range(0, len(data), ingest_batch):
+            e = min(len(data), s + ingest_batch)
+            store.add(ids[s:e], data[s:e], [""] * (e - s), [{"row": i} for i in range(s, e)])
+        ingest_s = time.perf_counter() - t0
+
+        lat, found = [], []
+        start = time.perf_counter()
+        for s in range(0, len(qs), batch):
+            t0 = time.perf_counter()
+            hits = store.query(qs[s:s + batch], k)
+            lat.append((time.perf_counter() - t0) / len(hits))
+            found.extend([int(h[0]) for h in hs] for hs in hits)
+        wall = time.perf_counter() - start
+        recall = np.mean([len(set(f) & set(t.tolist())) / k for f, t in zip(found, truth)])
+        out = summarize(lat, wall)
+        out.update({"recall_at_k": round(float(recall), 4), "ingest_s": round(ingest_s, 3),
+                    "queries_per_s": round(len(qs) / wall, 1), "store": store.stats()})
+        return out
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--n", type=int, default=50000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=6)
+    ap.add_argument("--batch", type=int, default=1, help="queries per store.query call")
+    ap.add_argument("--ingest-batch", type=int, default=5000)
+    ap.add_argument("--backends", default="numpy:float32,numpy:float16,numpy:int8,chroma")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", default="-")
+    args = ap.parse_args()
+    data, qs = synthetic(args.n, args.dim, args.queries, args.seed)
+    truth = exact_topk(data, qs, args.k)
+    results = {spec: run_backend(spec, data, qs, truth, args.k, args.batch, args.ingest_batch)
+               for spec in args.backends.split(",") if spec}
+    write_results(args.out, "vector_index", vars(args), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import os, re, io, ast, sys, json, math, time, select, signal, asyncio, resource, importlib, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import sandbox
+
+WORKERS = int(os.getenv("CODE_WORKERS", str(min(4, os.cpu_count() or 1))))  # pre-forked runner processes
+TIMEOUT_S = float(os.getenv("CODE_TIMEOUT_S", "2"))        # wall time per test
+MEMORY_MB = int(os.getenv("CODE_MEMORY_MB", "256"))        # address space per test process
+MAX_OUTPUT = int(os.getenv("CODE_MAX_OUTPUT", "2000"))     # chars of repr/stdout/error kept per test
+VALIDATE = os.getenv("CODE_VALIDATE_TESTS", "1") == "1"    # generation: run the tests against the reference solution
+LANGUAGES = {"python"}
+# The jail has no stdlib: these are imported in each runner before forking and are all a solution can import
+MODULES = ("array", "bisect", "collections", "copy", "dataclasses", "datetime", "decimal", "enum", "fractions",
+           "functools", "heapq", "itertools", "json", "math", "operator", "random", "re", "statistics", "string",
+           "typing")
+
+_FUNC = re.compile(r"(?:def\s+)?([A-Za-z_]\w*)\s*\(")
+# Defence in depth only (C-level calls raise no audit events); sandbox.confine is the boundary
+_BLOCKED = ("socket.", "subprocess.", "os.system", "os.exec", "os.spawn", "os.posix_spawn", "os.fork",
+            "os.forkpty", "os.kill", "pty.", "ctypes.", "shutil.rmtree", "os.remove", "os.unlink", "os.rmdir")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_counts = {"submissions": 0, "tests": 0, "passed": 0, "failed": 0, "timeouts": 0, "skipped": 0}
+
+
+def function_name(signature: str) -> Optional[str]:
+    m = _FUNC.search(signature or "")
+    return m.group(1) if m else None
+
+
+def _matches(got, expected: str) -> bool:
+    try:
+        want = ast.literal_eval(expected.strip())
+    except Exception:
+        return str(got).strip() == expected.strip()
+    if isinstance(want, float) or isinstance(got, float):
+        try:
+            return math.isclose(float(got), float(want), rel_tol=1e-6, abs_tol=1e-9)
+        except (TypeError, ValueError):
+            return False
+    if isinstance(want, (list, tuple)) and isinstance(got, (list, tuple)):
+        return list(got) == list(want)
+    return got == want
+
+
+def _audit(event, args):
+    if event.startswith(_BLOCKED):
+        raise PermissionError(f"{event} is not allowed in the sandbox")
+
+
+def _sandboxed(code: str, call: str, expected: str, w: int, root: str) -> None:
+    """Child side of one test: limits and confinement, then exec + compare; writes one JSON line to w."""
+    out = {"passed": False}
+    try:
+        cpu = max(1, math.ceil(TIMEOUT_S))
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+        resource.setrlimit(resource.RLIMIT_AS, (MEMORY_MB << 20, MEMORY_MB << 20))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        sandbox.confine(root, w)  # chroot, drop to an unprivileged uid, seccomp
+        resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))  # effective now that we are not root
+        sys.stdout = sys.stderr = buf = io.StringIO()
+        ns = {"__name__": "__solution__"}
+        exec("from typing import *", ns)
+        sys.addaudithook(_audit)  # cannot be removed once installed
+        exec(compile(code, "<solution>", "exec"), ns)
+        got = eval(compile(call, "<test>", "eval"), ns)
+        out = {"passed": _matches(got, expected), "got": repr(got)[:MAX_OUTPUT], "stdout": buf.getvalue()[:MAX_OUTPUT]}
+    except MemoryError:
+        out["error"] = "MemoryError: exceeded the memory limit"
+    except BaseException as e:
+        out["error"] = f"{type(e).__name__}: {e}"[:MAX_OUTPUT]
+    try:
+        os.write(w, json.dumps(out).encode())
+    finally:
+        os._exit(0)
+
+
+def _run_test(code: str, fn: str, test: Dict[str, str]) -> dict:
+    """Runs in a pool worker: fork a limited child per test (no interpreter start-up) and wait for it."""
+    name = test.get("name") or "test"
+    arg = (test.get("input") or "").strip()
+    call = arg if arg.startswith(f"{fn}(") else f"{fn}({arg})"
+    root = _prepare()
+    t0 = time.perf_counter()
+    r, w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(r)
+        _sandboxed(code, call, test.get("expected", ""), w, root)
+    os.close(w)
+    data, deadline, timed_out = b"", time.monotonic() + TIMEOUT_S, False
+    try:
+        while True:
+            left = deadline - time.monotonic()
+            if left <= 0 or not select.select([r], [], [], left)[0]:
+                timed_out = True
+                break
+            chunk = os.read(r, 65536)
+            if not chunk:
+                break
+            data += chunk
+    finally:
+        os.close(r)
+        if timed_out:
+            os.kill(pid, signal.SIGKILL)
+        _, status = os.waitpid(pid, 0)
+    res = {"name": name, "passed": False, "duration_ms": round((time.perf_counter() - t0) * 1000, 1)}
+    if timed_out:
+        res["error"] = f"Timed out after {TIMEOUT_S:g}s"
+    elif not data:
+        sig = os.WTERMSIG(status) if os.WIFSIGNALED(status) else None
+        res["error"] = "CPU time limit exceeded" if sig == signal.SIGXCPU else f"Crashed (status {status})"
+    else:
+        res.update(json.loads(data))
+    return res
+
+
+def _prepare() -> str:
+    for name in MODULES:
+        importlib.import_module(name)
+    return sandbox.jail()
+
+
+def _warm() -> int:
+    _prepare()
+    return os.getpid()
+
+
+def start() -> None:
+    """Pre-fork the runner processes (blocking; called from startup preload)."""
+    global _pool
+    if _pool is None and WORKERS > 0:
+        # forkserver: workers fork from a clean single-threaded server, never from the event loop process
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload([__name__])
+        _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=ctx)
+        for f in [_pool.submit(_warm) for _ in range(WORKERS)]:
+            f.result()
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def run_tests(code: str, signature: str, tests: Sequence[Dict[str, str]], early_exit: bool = False) -> List[dict]:
+    """
+    Run every test concurrently across the runner pool, results in test order.
+    With early_exit, the first failure cancels tests that have not started (reported as skipped).
+    """
+    fn = function_name(signature)
+    if fn is None:
+        raise ValueError("Cannot find the function name in the signature.")
+    if _pool is None:
+        await asyncio.to_thread(start)
+    _counts["submissions"] += 1
+    futs = [asyncio.wrap_future(_pool.submit(_run_test, code, fn, t)) for t in tests]
+    pending = set(futs)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if early_exit and any(not f.cancelled() and not f.result()["passed"] for f in done):
+                break
+    finally:
+        for f in pending:
+            f.cancel()
+    results = []
+    for t, f in zip(tests, futs):
+        if f.cancelled():
+            res = {"name": t.get("name") or "test", "passed": False, "skipped": True}
+        else:
+            res = f.result()
+        results.append(res)
+        _counts["tests"] += 1
+        key = "skipped" if res.get("skipped") else "passed" if res["passed"] else "failed"
+        _counts[key] += 1
+        if str(res.get("error", "")).startswith("Timed out"):
+            _counts["timeouts"] += 1
+    return results
+
+
+def stats() -> dict:
+    return {"workers": WORKERS, "started": _pool is not None, "timeout_s": TIMEOUT_S, "memory_mb": MEMORY_MB,
+            "validate_tests": VALIDATE, "sandbox": sandbox.available(), **_counts}
@@ -0,0 +1,116 @@
+import os, re
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+from schemas import GradeResult, GradeCodingResult, ShortQuestion
+
+SIM_HIT = float(os.getenv("GRADE_SIM_HIT", "0.70"))    # rubric point clearly covered
+SIM_MISS = float(os.getenv("GRADE_SIM_MISS", "0.25"))  # rubric point clearly absent
+
+_STOP = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were
+with must should include includes including mention explain describe key point
+""".split())
+_WORD = re.compile(r"[a-z0-9][a-z0-9_+#.\-]*", re.I)
+_SENT = re.compile(r"(?<=[.!?;])\s+|\n+")
+
+
+def keyword_fallback(question: ShortQuestion, answer: str) -> GradeResult:
+    """Deterministic fallback: simple rubric keyword coverage."""
+    pts = question.rubric_points
+    hits = sum(int(p.lower() in answer.lower()) for p in pts)
+    score = hits / max(1, len(pts))
+    missing = [p for p in pts if p.lower() not in answer.lower()]
+    return GradeResult(
+        correct=score >= 0.8,
+        score=score,
+        feedback=("Good coverage." if score >= 0.8 else f"Missing: {', '.join(missing[:4])}…"),
+    )
+
+
+class RubricMatcher:
+    """Precompiled per-point matchers: whole phrase, or all significant keywords."""
+
+    def __init__(self, points: Sequence[str]):
+        self.points = list(points)
+        self.phrases = [re.compile(r"\b" + re.escape(p.strip().rstrip(".").lower()) + r"\b") for p in self.points]
+        self.keywords = [
+            [re.compile(r"\b" + re.escape(w) + r"\b") for w in dict.fromkeys(_WORD.findall(p.lower()))
+             if w not in _STOP and len(w) > 1]
+            for p in self.points
+        ]
+
+    def coverage(self, answer: str) -> List[float]:
+        """Per point: 1.0 on a phrase match, else the fraction of its keywords present."""
+        a = answer.lower()
+        out = []
+        for phrase, kws in zip(self.phrases, self.keywords):
+            if phrase.search(a):
+                out.append(1.0)
+            elif kws:
+                out.append(sum(1 for k in kws if k.search(a)) / len(kws))
+            else:
+                out.append(0.0)
+        return out
+
+
+@lru_cache(maxsize=256)
+def matcher_for(points: tuple) -> RubricMatcher:
+    return RubricMatcher(points)
+
+
+def answer_units(answer: str, limit: int = 20) -> List[str]:
+    """Sentences of an answer, for max-similarity against short rubric points."""
+    units = [u.strip() for u in _SENT.split(answer) if u.strip()]
+    return (units or [answer.strip()])[:limit]
+
+
+def decide(question: ShortQuestion, answer: str, sims: Optional[List[float]] = None) -> Optional[GradeResult]:
+    """
+    Decide clear cases without the LLM; None means "ask the model".
+    `sims` is the best cosine similarity of any answer sentence to each rubric point.
+    """
+    pts = question.rubric_points
+    if not answer.strip():
+        return GradeResult(correct=False, score=0.0, feedback="No answer given.")
+    kw = matcher_for(tuple(pts)).coverage(answer)
+    hit, miss = [], []
+    for i, c in enumerate(kw):
+        s = sims[i] if sims is not None else None
+        if c >= 1.0 or (s is not None and s >= SIM_HIT):
+            hit.append(i)
+        elif c == 0.0 and (s is None or s < SIM_MISS):
+            miss.append(i)
+    if len(hit) == len(pts):
+        return GradeResult(correct=True, score=1.0, feedback="All rubric points covered.")
+    if len(miss) == len(pts):
+        return GradeResult(correct=False, score=0.0, feedback=f"Missing: {', '.join(pts[:4])}…")
+    return None
+
+
+def coding_result(results: List[dict]) -> GradeCodingResult:
+    """Score = share of tests passed; feedback names the first failing test."""
+    passed = sum(r["passed"] for r in results)
+    failed = next((r for r in results if not r["passed"] and not r.get("skipped")), None)
+    if failed is None:
+        fb = "All tests passed."
+    else:
+        why = failed.get("error") or f"got {failed.get('got')}"
+        fb = f"{passed}/{len(results)} tests passed. First failure: {failed['name']}: {why}"
+    return GradeCodingResult(correct=passed == len(results), score=round(passed / len(results), 3) if results else 0.0,
+                             feedback=fb, tests=results)
+
+
+def sql_result(expected, got) -> GradeResult:
+    """Compare sql_engine.QueryResult hashes; shape mismatches get a specific hint."""
+    if got.error:
+        return GradeResult(correct=False, score=0.0, feedback=f"Query failed: {got.error}")
+    if got.hash == expected.hash:
+        return GradeResult(correct=True, score=1.0, feedback="Correct.")
+    if expected.columns is not None and got.columns != expected.columns:
+        fb = f"Incorrect. Your query returns {got.columns} columns; expected {expected.columns}."
+    elif expected.rows is not None and got.rows != expected.rows:
+        fb = f"Incorrect. Your query returns {got.rows} rows; expected {expected.rows}."
+    else:
+        fb = "Incorrect. The result has the expected shape but different values."
+    return GradeResult(correct=False, score=0.0, feedback=fb)
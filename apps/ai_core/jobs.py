@@ -0,0 +1,278 @@
+import os, json, time, uuid, socket, asyncio, sqlite3, threading, logging
+from typing import Awaitable, Callable, Dict, Optional
+
+import admission
+import metrics
+
+PATH = os.getenv("JOBS_PATH", "./jobs.sqlite3")        # shared by all API workers on the host
+WORKERS = int(os.getenv("JOBS_WORKERS", "2"))          # jobs run at once per API process
+MAX_QUEUED = int(os.getenv("JOBS_MAX_QUEUED", "1000"))  # beyond that POST /jobs gets 429
+TTL_S = float(os.getenv("JOBS_TTL_S", "86400"))         # finished jobs are deleted after this
+LEASE_S = float(os.getenv("JOBS_LEASE_S", "60"))        # a running job whose worker stops renewing is retried
+MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "2"))
+MAX_WAIT_S = float(os.getenv("JOBS_MAX_WAIT_S", "60"))  # cap on GET /jobs/{id}?wait=
+POLL_S = float(os.getenv("JOBS_POLL_S", "1"))           # pick up jobs submitted through other processes
+PRIORITY = os.getenv("JOBS_PRIORITY", "batch")          # admission class of job LLM calls
+
+DONE = ("succeeded", "failed", "cancelled")
+log = logging.getLogger("quizforge.jobs")
+
+Handler = Callable[[dict, Callable[[dict], None]], Awaitable[dict]]
+
+
+class JobQueue:
+    """
+    Long-running generation/grading requests stored in SQLite and run by background workers.
+    Any API process may claim a queued job; a claim is a lease the worker renews, so jobs
+    of a crashed process are retried (up to JOBS_MAX_ATTEMPTS) instead of staying "running".
+    """
+
+    def __init__(self, handlers: Dict[str, Handler], path: str = PATH):
+        self.handlers = handlers
+        self.path = path
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._db: Optional[sqlite3.Connection] = None  # opened in start(): importing the app creates no files
+        self._lock = threading.Lock()
+        self._running: Dict[str, asyncio.Task] = {}
+        self._changed = asyncio.Event()  # replaced on every change; waiters hold the old one
+        self._wake = asyncio.Event()
+        self._tasks: list = []
+        self._stopping = False
+        self.counts = {"submitted": 0, "succeeded": 0, "failed": 0, "cancelled": 0, "requeued": 0,
+                       "retried": 0, "expired": 0}
+
+    # --- storage -----------------------------------------------------------
+    def _notify(self) -> None:
+        # Wakes local long-polls and SSE streams; waiters in other processes poll
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def submit(self, kind: str, payload: dict) -> Optional[dict]:
+        job_id = uuid.uuid4().hex
+        with self._lock, self._db:
+            queued = self._db.execute("SELECT COUNT(*) FROM jobs WHERE state = 'queued'").fetchone()[0]
+            if queued >= MAX_QUEUED:
+                return None
+            self._db.execute("INSERT INTO jobs (id, kind, payload, state, created) VALUES (?, ?, ?, 'queued', ?)",
+                             (job_id, kind, json.dumps(payload, ensure_ascii=False), time.time()))
+        self.counts["submitted"] += 1
+        self._wake.set()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, kind, state, created, started, finished, attempts, progress, result, error "
+                "FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job_id, kind, state, created, started, finished, attempts, progress, result, error = row
+        return {
+            "id": job_id, "kind": kind, "state": state, "created": created, "started": started,
+            "finished": finished, "attempts": attempts,
+            "progress": json.loads(progress) if progress else None,
+            "result": json.loads(result) if result else None, "error": error,
+        }
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        with self._lock, self._db:
+            self._db.execute("UPDATE jobs SET state = 'cancelled', finished = ? WHERE id = ? AND state IN "
+                             "('queued', 'running')", (time.time(), job_id))
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()  # other processes notice at their next lease renewal
+        self._notify()
+        return self.get(job_id)
+
+    def _claim(self) -> Optional[tuple]:
+        now = time.time()
+        with self._lock, self._db:
+            n = self._db.execute(
+                "UPDATE jobs SET state = 'failed', finished = ?, error = 'Worker lost (attempts exhausted).' "
+                "WHERE state = 'running' AND lease_until < ? AND attempts >= ?", (now, now, MAX_ATTEMPTS)).rowcount
+            self.counts["failed"] += n
+            # One statement: concurrent processes can never claim the same job
+            return self._db.execute(
+                "UPDATE jobs SET state = 'running', owner = ?, lease_until = ?, attempts = attempts + 1, "
+                "started = ? WHERE id = (SELECT id FROM jobs WHERE state = 'queued' "
+                "OR (state = 'running' AND lease_until < ?) ORDER BY created LIMIT 1) "
+                "RETURNING id, kind, payload, created, attempts", (self.owner, now + LEASE_S, now, now)).fetchone()
+
+    def _renew(self, job_id: str) -> bool:
+        with self._lock, self._db:
+            return self._db.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND state = 'running' AND owner = ?",
+                (time.time() + LEASE_S, job_id, self.owner)).rowcount == 1
+
+    def _release(self, job_id: str) -> None:
+        # Graceful shutdown: back to the queue at once, without using up an attempt
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE jobs SET state = 'queued', owner = NULL, lease_until = NULL, attempts = attempts - 1 "
+                "WHERE id = ? AND state = 'running' AND owner = ?", (job_id, self.owner))
+
+    def _progress(self, job_id: str, progress: dict) -> None:
+        with self._lock, self._db:
+            self._db.execute("UPDATE jobs SET progress = ? WHERE id = ? AND owner = ?",
+                             (json.dumps(progress), job_id, self.owner))
+        self._notify()
+
+    def _finish(self, job_id: str, state: str, result: Optional[dict] = None, error: Optional[str] = None) -> bool:
+        with self._lock, self._db:
+            done = self._db.execute(
+                "UPDATE jobs SET state = ?, finished = ?, result = ?, error = ?, lease_until = NULL "
+                "WHERE id = ? AND state = 'running' AND owner = ?",
+                (state, time.time(), json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 error, job_id, self.owner)).rowcount == 1
+        self._notify()
+        return done
+
+    def cleanup(self) -> int:
+        with self._lock, self._db:
+            n = self._db.execute("DELETE FROM jobs WHERE state IN ('succeeded', 'failed', 'cancelled') "
+                                 "AND finished < ?", (time.time() - TTL_S,)).rowcount
+        self.counts["expired"] += n
+        return n
+
+    # --- waiting -----------------------------------------------------------
+    async def wait(self, job_id: str, timeout_s: float) -> Optional[dict]:
+        """Current job, or as soon as it finishes within timeout_s (long-poll)."""
+        deadline = time.monotonic() + timeout_s
+        while True:
+            changed = self._changed
+            job = self.get(job_id)
+            left = deadline - time.monotonic()
+            if job is None or job["state"] in DONE or left <= 0:
+                return job
+            try:
+                await asyncio.wait_for(changed.wait(), min(POLL_S, left))
+            except asyncio.TimeoutError:
+                pass
+
+    async def watch(self, job_id: str):
+        """Yields the job each time its state or progress changes, ending once it is finished."""
+        last = None
+        while True:
+            changed = self._changed
+            job = self.get(job_id)
+            if job is None:
+                return
+            key = (job["state"], json.dumps(job["progress"]))
+            if key != last:
+                last = key
+                yield job
+            if job["state"] in DONE:
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), POLL_S)
+            except asyncio.TimeoutError:
+                pass
+
+    # --- workers -----------------------------------------------------------
+    async def _keep_lease(self, job_id: str, task: asyncio.Task):
+        while True:
+            await asyncio.sleep(LEASE_S / 3)
+            if not self._renew(job_id):
+                task.cancel()  # cancelled through another process, or the lease was lost
+                return
+
+    async def _run(self, job_id: str, kind: str, payload: str, created: float, attempts: int):
+        if attempts > 1:
+            self.counts["retried"] += 1
+        metrics.JOB_WAIT.labels(kind).observe(max(0.0, time.time() - created))
+        task = asyncio.current_task()
+        lease = asyncio.create_task(self._keep_lease(job_id, task))
+        self._running[job_id] = task
+        self._notify()
+        t0, state = time.perf_counter(), "failed"
+        try:
+            handler = self.handlers.get(kind)
+            if handler is None:
+                raise ValueError(f"Unknown job kind {kind!r}.")
+            while True:
+                try:
+                    result = await handler(json.loads(payload), lambda p: self._progress(job_id, p))
+                    break
+                except admission.Rejected as e:
+                    await asyncio.sleep(e.retry_after)  # shed under load: a job waits its turn instead of failing
+            state = "succeeded"
+            self._finish(job_id, state, result=result)
+        except asyncio.CancelledError:
+            state = "cancelled"  # DELETE /jobs/{id}, or the lease was lost to another process
+            if self._stopping:
+                state = "requeued"
+                self._release(job_id)
+        except Exception as e:
+            self._finish(job_id, state, error=str(getattr(e, "detail", None) or repr(e))[:1000])
+            log.warning("job %s (%s) failed: %r", job_id, kind, e)
+        finally:
+            lease.cancel()
+            self._running.pop(job_id, None)
+            self.counts[state] += 1
+            metrics.JOB_SECONDS.labels(kind, state).observe(time.perf_counter() - t0)
+
+    async def _worker(self):
+        admission.priority_var.set(PRIORITY)  # job LLM calls queue behind interactive requests
+        admission.deadline_var.set(None)
+        while True:
+            job = self._claim()
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), POLL_S)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            metrics.endpoint_var.set(f"job:{job[1]}")
+            # Own task, so cancelling the job (DELETE /jobs/{id}) leaves the worker running
+            task = asyncio.create_task(self._run(*job))
+            try:
+                await asyncio.shield(task)
+            except asyncio.CancelledError:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                raise
+
+    async def _cleaner(self):
+        while True:
+            try:
+                n = await asyncio.to_thread(self.cleanup)
+                if n:
+                    log.info("deleted %d finished jobs older than %ss", n, TTL_S)
+            except sqlite3.Error as e:
+                log.warning("job cleanup failed: %s", e)
+            await asyncio.sleep(max(60.0, min(TTL_S / 4, 3600.0)))
+
+    def _open(self) -> None:
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+                "state TEXT NOT NULL, created REAL NOT NULL, started REAL, finished REAL, "
+                "owner TEXT, lease_until REAL, attempts INTEGER NOT NULL DEFAULT 0, "
+                "progress TEXT, result TEXT, error TEXT)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs(state, created)")
+
+    def start(self) -> None:
+        self._open()
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(max(1, WORKERS))]
+        self._tasks.append(asyncio.create_task(self._cleaner()))
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._db.close()
+        self._db = None
+
+    def stats(self) -> dict:
+        if self._db is None:
+            return {"workers": WORKERS, "started": False}
+        with self._lock:
+            states = dict(self._db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+        return {"workers": WORKERS, "running_here": len(self._running), "ttl_s": TTL_S, "states": states,
+                **self.counts}
@@ -1,5 +1,12 @@
-import os, httpx, json
-from typing import List, Dict, Optional, Union
+import os, httpx, json, asyncio, hashlib, time
+from contextvars import ContextVar
+from collections import Counter
+from typing import AsyncIterator, List, Dict, Optional, Union
+
+from cache import TTLCache, SQLiteCache
+from llm_router import Router, parse_urls, retryable
+from admission import Gate
+import metrics
 
 BASE_URL = os.getenv("LLM_BASE_URL", "http://localhost:11434/v1")
 API_KEY  = os.getenv("LLM_API_KEY", "ollama")
@@ -8,16 +15,162 @@ MODEL_CODER   = os.getenv("MODEL_CODER", "qwen2.5-coder:7b")
 MODEL_REASON  = os.getenv("MODEL_REASONER", "deepseek-r1:7b")
 TIMEOUT_S = int(os.getenv("LLM_TIMEOUT", "600"))
 
+# Backends per model kind (comma-separated base URLs); default: LLM_BASE_URL for all
+BACKENDS = {
+    kind: parse_urls(os.getenv(f"LLM_BACKENDS_{kind.upper()}", "")) or
+          parse_urls(os.getenv("LLM_BACKENDS", "")) or [BASE_URL.rstrip("/")]
+    for kind in ("general", "coding", "reason")
+}
+RETRIES = int(os.getenv("LLM_RETRIES", "1"))  # extra attempts on another backend
+
+# Connection pool (one shared client per process)
+POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "20"))
+POOL_MAX_KEEPALIVE   = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY_S   = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "120"))
+HTTP2 = os.getenv("LLM_HTTP2", "0") == "1"
+
+# Max in-flight requests per model and backend; overrides as "model=n,model=n"
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+MODEL_CONCURRENCY = {
+    k.strip(): int(v) for k, v in
+    (item.rsplit("=", 1) for item in os.getenv("LLM_MODEL_CONCURRENCY", "").split(",") if "=" in item)
+}
+
+# Response cache for deterministic calls (opt-in)
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "0") == "1"
+CACHE_ANY_TEMPERATURE = os.getenv("LLM_CACHE_ANY_TEMPERATURE", "0") == "1"  # default: temperature == 0 only
+CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "2048"))
+CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", "86400"))
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")  # SQLite file for the on-disk tier; empty = memory only
+
+# Startup warm-up: one tiny completion per model and backend so weights are resident before traffic
+WARMUP = os.getenv("LLM_WARMUP", "1") == "1"
+WARMUP_TIMEOUT_S = float(os.getenv("LLM_WARMUP_TIMEOUT_S", "300"))
+
 HEADERS = {"Authorization": f"Bearer {API_KEY}"}
 
-async def chat(
+_client: Optional[httpx.AsyncClient] = None
+_gates: Dict[tuple, Gate] = {}
+router = Router(BACKENDS, {MODEL_GENERAL: "general", MODEL_CODER: "coding", MODEL_REASON: "reason"})
+
+_memory_cache = TTLCache(CACHE_SIZE, CACHE_TTL_S)
+_disk_cache: Optional[SQLiteCache] = SQLiteCache(CACHE_PATH, CACHE_TTL_S) if CACHE_ENABLED and CACHE_PATH else None
+_inflight: Dict[str, asyncio.Future] = {}
+_cache_counts: Counter = Counter()
+# Per-request tally (set by the HTTP middleware) so responses can report cache use
+_cache_events: ContextVar[Optional[Counter]] = ContextVar("llm_cache_events", default=None)
+_warmup: Dict[str, dict] = {}
+
+
+def _new_client() -> httpx.AsyncClient:
+    # Use explicit httpx.Timeout object
+    timeout = httpx.Timeout(connect=10.0, read=TIMEOUT_S, write=60.0, pool=10.0)
+    limits = httpx.Limits(
+        max_connections=POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=POOL_MAX_KEEPALIVE,
+        keepalive_expiry=KEEPALIVE_EXPIRY_S,
+    )
+    return httpx.AsyncClient(headers=HEADERS, timeout=timeout, limits=limits, http2=HTTP2)
+
+
+def get_client() -> httpx.AsyncClient:
+    """Shared client; created on first use if startup() was not called (scripts, tests)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _new_client()
+    return _client
+
+
+async def startup() -> None:
+    get_client()
+    router.start(get_client)
+
+
+async def shutdown() -> None:
+    global _client
+    await router.stop()
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _warm(url: str, models: List[str]) -> None:
+    # Sequential per backend: a host that keeps few models loaded would otherwise evict one for another
+    for model in models:
+        key = f"{model}@{url}"
+        _warmup[key] = {"state": "loading"}
+        t0 = time.perf_counter()
+        payload = _payload([{"role": "user", "content": "Reply with OK."}], model, 0.0, False, 1, None)
+        try:
+            r = await get_client().post(f"{url}/chat/completions", json=payload, timeout=WARMUP_TIMEOUT_S)
+            r.raise_for_status()
+            _warmup[key] = {"state": "ready", "ms": round((time.perf_counter() - t0) * 1000)}
+        except Exception as e:
+            _warmup[key] = {"state": "failed", "error": repr(e)[:200]}
+
+
+async def warmup() -> None:
+    """Load every configured model on every backend that serves it (startup task; never raises)."""
+    if not WARMUP:
+        return
+    by_url: Dict[str, List[str]] = {}
+    for model in dict.fromkeys((MODEL_GENERAL, MODEL_CODER, MODEL_REASON)):
+        for b in router.candidates(model):
+            by_url.setdefault(b.url, []).append(model)
+    await asyncio.gather(*(_warm(url, models) for url, models in by_url.items()))
+
+
+def warmup_stats() -> dict:
+    return {"enabled": WARMUP, "models": dict(_warmup)}
+
+
+def model_gate(model: str, backend_url: str) -> Gate:
+    gate = _gates.get((backend_url, model))
+    if gate is None:
+        gate = _gates[(backend_url, model)] = Gate(MODEL_CONCURRENCY.get(model, MAX_CONCURRENCY))
+    return gate
+
+
+def track_cache() -> Counter:
+    """Start a per-request tally of cache outcomes; chat() fills it in."""
+    events: Counter = Counter()
+    _cache_events.set(events)
+    return events
+
+
+def _note_cache(status: str) -> None:
+    _cache_counts[status] += 1
+    events = _cache_events.get()
+    if events is not None:
+        events[status] += 1
+
+
+def cache_stats() -> dict:
+    return {
+        "enabled": CACHE_ENABLED, "any_temperature": CACHE_ANY_TEMPERATURE,
+        "memory": _memory_cache.stats(),
+        "disk": {"path": CACHE_PATH, "size": _disk_cache.size()} if _disk_cache is not None else None,
+        "inflight": len(_inflight),
+        **{k: _cache_counts[k] for k in ("hit", "hit_disk", "coalesced", "miss")},
+    }
+
+
+def concurrency_stats() -> Dict[str, dict]:
+    return {f"{m}@{url}": g.stats() for (url, m), g in _gates.items()}
+
+
+def backend_stats() -> dict:
+    return router.stats()
+
+
+def _payload(
     messages: List[Dict[str, str]],
-    model: Optional[str] = None,
-    temperature: float = 0.4,
-    response_format_json: bool = False,
-    max_tokens: Optional[int] = None,
-    stop: Optional[list[str]] = None
-) -> str:
+    model: Optional[str],
+    temperature: float,
+    response_format_json: bool,
+    max_tokens: Optional[int],
+    stop: Optional[list[str]],
+) -> Dict[str, Union[str, float, Dict, List]]:
     payload: Dict[str, Union[str, float, Dict, List]] = {
         "model": model or MODEL_GENERAL,
         "messages": messages,
@@ -28,14 +181,180 @@ async def chat(
     if max_tokens is not None:
         payload["max_tokens"] = max_tokens
     if stop: payload["stop"] = stop
-    # Use explicit httpx.Timeout object
-    timeout = httpx.Timeout(connect=10.0, read=TIMEOUT_S, write=60.0, pool=10.0)
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        r = await client.post(f"{BASE_URL}/chat/completions", headers=HEADERS, json=payload)
-        r.raise_for_status()
-        return r.json()["choices"][0]["message"]["content"]
+    return payload
+
+
+async def _complete(payload: Dict) -> str:
+    model = payload["model"]
+    tried = []
+    t_start = time.perf_counter()
+    while True:
+        backend = router.pick(model, exclude=tried)
+        tried.append(backend)
+        with backend.track():
+            t_queue = time.perf_counter()
+            # Queue here instead of on the LLM host, best priority class first
+            async with model_gate(model, backend.url).slot():
+                t0 = time.perf_counter()
+                metrics.observe("llm_queue", t0 - t_queue, model)
+                try:
+                    client = get_client()
+                    r = await client.send(client.build_request(
+                        "POST", f"{backend.url}/chat/completions", json=payload), stream=True)
+                    try:
+                        metrics.observe("llm_ttfb", time.perf_counter() - t0, model)
+                        await r.aread()
+                    finally:
+                        await r.aclose()
+                    r.raise_for_status()
+                    out = r.json()["choices"][0]["message"]["content"]
+                except Exception as e:
+                    if not retryable(e):
+                        raise
+                    router.record_failure(backend)
+                    # Completions have no side effects, so retrying elsewhere is safe
+                    if len(tried) > RETRIES or router.pick(model, exclude=tried) is None:
+                        raise
+                    metrics.fallback("llm_retry")
+                    continue
+                router.record_success(backend, time.perf_counter() - t0)
+                metrics.observe("llm_total", time.perf_counter() - t_start, model)
+                return out
+
+
+def _cache_key(payload: Dict) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+async def _cached_complete(payload: Dict) -> str:
+    key = _cache_key(payload)
+    while True:
+        hit = _memory_cache.get(key)
+        if hit is not None:
+            _note_cache("hit")
+            return hit
+        if _disk_cache is not None:
+            hit = await asyncio.to_thread(_disk_cache.get, key)
+            if hit is not None:
+                _memory_cache.put(key, hit)
+                _note_cache("hit_disk")
+                return hit
+        leader = _inflight.get(key)
+        if leader is None:
+            break
+        # Identical call already running: wait for it instead of stampeding the LLM
+        _note_cache("coalesced")
+        try:
+            return await asyncio.shield(leader)
+        except asyncio.CancelledError:
+            if not leader.cancelled() or asyncio.current_task().cancelling():
+                raise
+            # The leader was cancelled, not us: try again (maybe become the leader)
+
+    _note_cache("miss")
+    fut = asyncio.get_running_loop().create_future()
+    fut.add_done_callback(lambda f: f.cancelled() or f.exception())  # no "never retrieved" noise
+    _inflight[key] = fut
+    try:
+        out = await _complete(payload)
+    except asyncio.CancelledError:
+        fut.cancel()
+        raise
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    finally:
+        _inflight.pop(key, None)
+    _memory_cache.put(key, out)
+    if _disk_cache is not None:
+        await asyncio.to_thread(_disk_cache.put, key, out)
+    fut.set_result(out)
+    return out
+
+
+async def chat(
+    messages: List[Dict[str, str]],
+    model: Optional[str] = None,
+    temperature: float = 0.4,
+    response_format_json: bool = False,
+    max_tokens: Optional[int] = None,
+    stop: Optional[list[str]] = None,
+    cache: Optional[bool] = None,
+) -> str:
+    """`cache=None` follows LLM_CACHE_* (temperature 0 only by default); True/False forces it."""
+    payload = _payload(messages, model, temperature, response_format_json, max_tokens, stop)
+    use_cache = cache if cache is not None else (
+        CACHE_ENABLED and (CACHE_ANY_TEMPERATURE or temperature == 0))
+    if use_cache:
+        return await _cached_complete(payload)
+    return await _complete(payload)
+
+
+async def chat_stream(
+    messages: List[Dict[str, str]],
+    model: Optional[str] = None,
+    temperature: float = 0.4,
+    response_format_json: bool = False,
+    max_tokens: Optional[int] = None,
+    stop: Optional[list[str]] = None
+) -> AsyncIterator[str]:
+    """
+    Yield content deltas as they arrive (OpenAI-compatible `stream: true`).
+    Closing the generator early (e.g. via contextlib.aclosing) closes the upstream
+    connection, which makes Ollama stop generating.
+    """
+    payload = _payload(messages, model, temperature, response_format_json, max_tokens, stop)
+    payload["stream"] = True
+    model = payload["model"]
+    tried = []
+    t_start = time.perf_counter()
+    while True:
+        backend = router.pick(model, exclude=tried)
+        tried.append(backend)
+        started = False
+        with backend.track():
+            t_queue = time.perf_counter()
+            async with model_gate(model, backend.url).slot():
+                t0 = time.perf_counter()
+                metrics.observe("llm_queue", t0 - t_queue, model)
+                try:
+                    async with get_client().stream("POST", f"{backend.url}/chat/completions", json=payload) as r:
+                        if r.is_error:
+                            await r.aread()
+                            r.raise_for_status()
+                        async for line in r.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[5:].strip()
+                            if data == "[DONE]":
+                                break
+                            choices = json.loads(data).get("choices") or [{}]
+                            delta = (choices[0].get("delta") or {}).get("content")
+                            if delta:
+                                if not started:
+                                    # Time to first token is what the balancer should see for streams
+                                    ttfb = time.perf_counter() - t0
+                                    router.record_success(backend, ttfb)
+                                    metrics.observe("llm_ttfb", ttfb, model)
+                                    started = True
+                                yield delta
+                except Exception as e:
+                    if not retryable(e):
+                        raise
+                    router.record_failure(backend)
+                    # Only retry before anything reached the caller
+                    if started or len(tried) > RETRIES or router.pick(model, exclude=tried) is None:
+                        raise
+                    metrics.fallback("llm_retry")
+                    continue
+                finally:
+                    # Also runs when the caller stops early (hint cut-off)
+                    if started:
+                        metrics.observe("llm_total", time.perf_counter() - t_start, model)
+                return
+
 
 def pick_model(kind: str) -> str:
     if kind == "coding": return MODEL_CODER
     if kind == "reason": return MODEL_REASON
-    return MODEL_GENERAL
\ No newline at end of file
+    return MODEL_GENERAL
@@ -0,0 +1,145 @@
+import os, time, asyncio, logging
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+
+POLICY = os.getenv("LLM_LB_POLICY", "least_outstanding")  # least_outstanding | ewma
+EWMA_ALPHA = float(os.getenv("LLM_EWMA_ALPHA", "0.3"))
+EJECT_AFTER = int(os.getenv("LLM_EJECT_AFTER", "3"))       # consecutive failures before ejection
+EJECT_S = float(os.getenv("LLM_EJECT_S", "30"))             # first ejection; doubles while failing, max 10x
+HEALTH_INTERVAL_S = float(os.getenv("LLM_HEALTH_INTERVAL_S", "15"))  # 0 disables active checks
+HEALTH_TIMEOUT_S = float(os.getenv("LLM_HEALTH_TIMEOUT_S", "5"))
+
+KINDS = ("general", "coding", "reason")
+
+log = logging.getLogger("quizforge.router")
+
+
+def parse_urls(value: str) -> List[str]:
+    return [u.strip().rstrip("/") for u in value.split(",") if u.strip()]
+
+
+class Backend:
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0      # queued + running requests routed here
+        self.ewma_ms: Optional[float] = None
+        self.healthy = True       # last active check
+        self.fail_streak = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def available(self, now: float) -> bool:
+        return self.healthy and self.ejected_until <= now
+
+    def score(self) -> float:
+        if POLICY == "ewma":
+            # Peak-EWMA: unmeasured backends first, then latency weighted by load
+            return (self.ewma_ms or 0.0) * (self.outstanding + 1)
+        return float(self.outstanding)
+
+    @contextmanager
+    def track(self):
+        self.outstanding += 1
+        try:
+            yield
+        finally:
+            self.outstanding -= 1
+
+    def stats(self) -> dict:
+        return {
+            "healthy": self.healthy, "ejected": self.ejected_until > time.monotonic(),
+            "outstanding": self.outstanding, "requests": self.requests, "failures": self.failures,
+            "ewma_ms": round(self.ewma_ms, 1) if self.ewma_ms is not None else None,
+            "ejections": self.ejections,
+        }
+
+
+class Router:
+    """Spreads LLM calls for each model kind over a list of OpenAI-compatible backends."""
+
+    def __init__(self, urls_by_kind: Dict[str, List[str]], model_kinds: Dict[str, str]):
+        self.backends: Dict[str, Backend] = {}
+        self.by_kind: Dict[str, List[Backend]] = {}
+        for kind, urls in urls_by_kind.items():
+            self.by_kind[kind] = [self.backends.setdefault(u, Backend(u)) for u in urls]
+        self.model_kinds = model_kinds
+        self._health_task: Optional[asyncio.Task] = None
+
+    def candidates(self, model: str) -> List[Backend]:
+        kind = self.model_kinds.get(model, "general")
+        return self.by_kind.get(kind) or self.by_kind["general"]
+
+    def pick(self, model: str, exclude: Iterable[Backend] = ()) -> Optional[Backend]:
+        excluded = set(exclude)
+        pool = [b for b in self.candidates(model) if b not in excluded]
+        if not pool:
+            return None
+        now = time.monotonic()
+        live = [b for b in pool if b.available(now)]
+        # Everything ejected: still try the one that comes back soonest rather than fail outright
+        if not live:
+            return min(pool, key=lambda b: b.ejected_until)
+        return min(live, key=Backend.score)
+
+    def record_success(self, b: Backend, latency_s: float) -> None:
+        ms = latency_s * 1000.0
+        b.requests += 1
+        b.ewma_ms = ms if b.ewma_ms is None else EWMA_ALPHA * ms + (1 - EWMA_ALPHA) * b.ewma_ms
+        b.fail_streak = 0
+        b.ejected_until = 0.0  # a real completion is proof enough; ends a passive ejection early
+
+    def record_failure(self, b: Backend) -> None:
+        b.requests += 1
+        b.failures += 1
+        b.fail_streak += 1
+        if b.fail_streak >= EJECT_AFTER:
+            b.ejections += 1
+            factor = min(10, 2 ** (b.fail_streak - EJECT_AFTER))
+            b.ejected_until = time.monotonic() + EJECT_S * factor
+            log.warning("ejecting LLM backend %s for %.0fs", b.url, EJECT_S * factor)
+
+    # --- active health checks ------------------------------------------------
+    async def check(self, client: httpx.AsyncClient, b: Backend) -> None:
+        # Only sets `healthy`: /models can answer while completions fail, so a passing probe
+        # must not lift a passive ejection (that ends on its timer or with a real success)
+        try:
+            r = await client.get(f"{b.url}/models", timeout=HEALTH_TIMEOUT_S)
+            ok = r.status_code < 500
+        except httpx.HTTPError:
+            ok = False
+        if ok and not b.healthy:
+            log.info("LLM backend %s is healthy again", b.url)
+        b.healthy = ok
+
+    async def _health_loop(self, get_client) -> None:
+        while True:
+            await asyncio.gather(*(self.check(get_client(), b) for b in self.backends.values()))
+            await asyncio.sleep(HEALTH_INTERVAL_S)
+
+    def start(self, get_client) -> None:
+        if HEALTH_INTERVAL_S > 0 and self._health_task is None:
+            self._health_task = asyncio.create_task(self._health_loop(get_client))
+
+    async def stop(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+
+    def stats(self) -> dict:
+        return {
+            "policy": POLICY,
+            "kinds": {k: [b.url for b in bs] for k, bs in self.by_kind.items()},
+            "backends": {u: b.stats() for u, b in self.backends.items()},
+        }
+
+
+def retryable(e: BaseException) -> bool:
+    """Failures that say something about the backend (and are safe to retry elsewhere)."""
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code >= 500
+    return isinstance(e, httpx.TransportError)
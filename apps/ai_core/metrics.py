@@ -0,0 +1,86 @@
+import os, time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, List, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Always send Server-Timing; otherwise only when the request carries "X-Timing: 1"
+TIMING_HEADER = os.getenv("METRICS_TIMING_HEADER", "0") == "1"
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+STAGE_SECONDS = Histogram(
+    "quizforge_stage_seconds", "Time spent in each request stage.",
+    ["stage", "endpoint", "qtype", "model"], buckets=BUCKETS)
+REQUEST_SECONDS = Histogram(
+    "quizforge_request_seconds", "End-to-end HTTP request latency.",
+    ["endpoint", "status"], buckets=BUCKETS)
+PROMPT_TOKENS = Histogram(
+    "quizforge_prompt_tokens", "Prompt size (system + user) as assembled, in tokens.",
+    ["model"], buckets=(64, 128, 256, 512, 768, 1024, 1536, 2048, 3072, 4096, 8192))
+ADMISSION_WAIT = Histogram(
+    "quizforge_admission_wait_seconds", "Time LLM calls waited for a slot, by priority class.",
+    ["priority"], buckets=BUCKETS)
+ADMISSION_QUEUED = Gauge(
+    "quizforge_admission_queued", "LLM calls waiting for a slot, by priority class.", ["priority"])
+ADMISSION_SHED = Counter(
+    "quizforge_admission_shed_total", "LLM calls rejected before running (queue_full, deadline, expired).",
+    ["priority", "reason"])
+JOB_WAIT = Histogram(
+    "quizforge_job_wait_seconds", "Time async jobs spent queued before a worker took them.",
+    ["kind"], buckets=BUCKETS + (1800, 3600))
+JOB_SECONDS = Histogram(
+    "quizforge_job_seconds", "Async job run time, by final state.", ["kind", "state"], buckets=BUCKETS)
+FALLBACKS = Counter(
+    "quizforge_fallbacks_total", "Fallback paths taken.", ["kind", "endpoint"])
+SINGLEFLIGHT = Counter(
+    "quizforge_singleflight_total", "Coalescable calls: leader (ran the work) or coalesced (shared a leader's).",
+    ["name", "result"])
+
+# Set per request (middleware) and per generation (tasks get their own copy)
+endpoint_var: ContextVar[str] = ContextVar("metrics_endpoint", default="-")
+qtype_var: ContextVar[str] = ContextVar("metrics_qtype", default="-")
+_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("metrics_timings", default=None)
+
+
+def observe(stage: str, seconds: float, model: Optional[str] = None, qtype: Optional[str] = None) -> None:
+    STAGE_SECONDS.labels(stage, endpoint_var.get(), qtype or qtype_var.get(), model or "-").observe(seconds)
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def stage(name: str, model: Optional[str] = None, qtype: Optional[str] = None):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0, model, qtype)
+
+
+def fallback(kind: str) -> None:
+    FALLBACKS.labels(kind, endpoint_var.get()).inc()
+
+
+def begin_request(endpoint: str) -> List[Tuple[str, float]]:
+    endpoint_var.set(endpoint)
+    timings: List[Tuple[str, float]] = []
+    _timings.set(timings)
+    return timings
+
+
+def server_timing(timings: List[Tuple[str, float]]) -> str:
+    total = {}
+    for name, s in timings:
+        total[name] = total.get(name, 0.0) + s
+    return ", ".join(f"{name};dur={s * 1000:.1f}" for name, s in total.items())
+
+
+def gauge_from(name: str, doc: str, fn: Callable[[], float]) -> None:
+    Gauge(name, doc).set_function(fn)
+
+
+def render() -> Tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
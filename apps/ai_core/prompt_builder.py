@@ -0,0 +1,162 @@
+import os, re, logging
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+import metrics
+
+# Prompt (prefill) budget in tokens, system + user; overrides as "model=n,model=n"
+DEFAULT_BUDGET = int(os.getenv("PROMPT_MAX_TOKENS", "1536"))
+BUDGETS = {
+    k.strip(): int(v) for k, v in
+    (item.rsplit("=", 1) for item in os.getenv("PROMPT_BUDGETS", "").split(",") if "=" in item)
+}
+# Hugging Face tokenizer per served model; models without one use a conservative estimate
+TOKENIZERS = {
+    "qwen2.5:7b-instruct": "Qwen/Qwen2.5-7B-Instruct",
+    "qwen2.5-coder:7b": "Qwen/Qwen2.5-Coder-7B-Instruct",
+    "deepseek-r1:7b": "deepseek-ai/DeepSeek-R1-Distill-Qwen-7B",
+    **{
+        k.strip(): v.strip() for k, v in
+        (item.split("=", 1) for item in os.getenv("PROMPT_TOKENIZERS", "").split(",") if "=" in item)
+    },
+}
+LOAD_TOKENIZERS = os.getenv("PROMPT_LOAD_TOKENIZERS", "0") == "1"  # off: no Hugging Face downloads at startup
+DOWNLOAD_TOKENIZERS = os.getenv("PROMPT_DOWNLOAD_TOKENIZERS", "0") == "1"  # off: only tokenizers already in the HF cache
+
+CHUNK_SEP = "\n---\n"  # how RAGIndex joins retrieved chunks
+_SENTENCES = re.compile(r"(?<=[.!?])\s+")
+
+log = logging.getLogger("quizforge.prompts")
+_tokenizers: Dict[str, object] = {}
+_stats: Counter = Counter()
+
+
+def load_tokenizers() -> None:
+    """Blocking; run off the event loop at startup. Until then counts are estimated."""
+    global _tokenizers
+    if not LOAD_TOKENIZERS:
+        return
+    try:
+        from transformers import AutoTokenizer
+    except ImportError:
+        return
+    loaded = dict(_tokenizers)
+    for model, name in TOKENIZERS.items():
+        if model in loaded:
+            continue
+        try:
+            loaded[model] = AutoTokenizer.from_pretrained(name, local_files_only=not DOWNLOAD_TOKENIZERS)
+        except Exception as e:
+            log.warning("tokenizer %s for %s unavailable (%s); estimating token counts", name, model, e)
+    # One assignment while requests are in flight; counts are cached per tokenizer, so no cache to clear
+    _tokenizers = loaded
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    return _count(text, _tokenizers.get(model))
+
+
+@lru_cache(maxsize=4096)
+def _count(text: str, tok) -> int:
+    if tok is not None:
+        return len(tok.encode(text, add_special_tokens=False))
+    # ~3 chars/token over English, JSON and code; errs on the long side
+    return (len(text) + 2) // 3
+
+
+def budget(model: Optional[str]) -> int:
+    return BUDGETS.get(model, DEFAULT_BUDGET)
+
+
+def clip(text: str, model: Optional[str], max_tokens: int) -> str:
+    """Cut text to at most max_tokens, at a token boundary when a tokenizer is loaded."""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    tok = _tokenizers.get(model)
+    if tok is not None:
+        ids = tok.encode(text, add_special_tokens=False)[:max_tokens - 1]
+        return tok.decode(ids) + "…"
+    return text[:max(0, max_tokens * 3 - 3)] + "…"
+
+
+def dedup_chunks(chunks: Sequence[str]) -> List[str]:
+    """
+    Drop sentences already present in a higher-ranked chunk (adjacent chunks overlap by
+    design), and chunks left with nothing new. Keeps the "title: " prefix.
+    """
+    seen, out = set(), []
+    for chunk in chunks:
+        title, sep, body = chunk.partition(": ")
+        if not sep:
+            title, body = "", chunk
+        kept = []
+        for s in _SENTENCES.split(body.strip()):
+            key = " ".join(s.lower().split())
+            if len(key.split()) >= 4 and key in seen:
+                continue
+            seen.add(key)
+            kept.append(s)
+        if kept:
+            out.append(f"{title}: {' '.join(kept)}" if title else " ".join(kept))
+        else:
+            _stats["chunks_deduped"] += 1
+    return out
+
+
+def build(template: str, model: Optional[str], system: str = "", context="", clip_fields: Sequence[str] = (),
+          **fields) -> str:
+    """
+    Render a user prompt within the model's token budget.
+
+    Template text and fields are never cut, apart from the fields named in clip_fields
+    (free text such as a student answer), which shrink when the prompt alone is over
+    budget. {context} (a CHUNK_SEP-joined string or a list, best first) is deduplicated
+    and filled chunk by chunk while it fits. Keep variable parts at the end of templates
+    so the system prompt and the template prefix stay byte-identical across requests.
+    """
+    limit = budget(model)
+    fixed = count_tokens(system, model) + count_tokens(template.format(context="", **fields), model)
+    for name in clip_fields:
+        if fixed <= limit:
+            break
+        have = count_tokens(fields[name], model)
+        fields[name] = clip(fields[name], model, have - (fixed - limit))
+        fixed = count_tokens(system, model) + count_tokens(template.format(context="", **fields), model)
+    if fixed > limit:
+        _stats["over_budget"] += 1  # instructions are kept whole even so
+
+    chunks = context.split(CHUNK_SEP) if isinstance(context, str) else list(context)
+    room, picked = limit - fixed, []
+    for chunk in dedup_chunks([c for c in chunks if c.strip()]):
+        cost = count_tokens(chunk + CHUNK_SEP, model)
+        if cost <= room:
+            picked.append(chunk)
+            room -= cost
+        else:
+            _stats["chunks_over_budget"] += 1
+    user = template.format(context=CHUNK_SEP.join(picked), **fields)
+    _stats["prompts"] += 1
+    metrics.PROMPT_TOKENS.labels(model or "-").observe(limit - room)
+    return user
+
+
+def fit(text: str, model: Optional[str], system: str = "") -> str:
+    """Free-form prompt whose variable part comes last: clip the tail to the budget."""
+    room = budget(model) - count_tokens(system, model)
+    if count_tokens(text, model) > room:
+        _stats["clipped"] += 1
+        text = clip(text, model, room)
+    _stats["prompts"] += 1
+    metrics.PROMPT_TOKENS.labels(model or "-").observe(count_tokens(system, model) + count_tokens(text, model))
+    return text
+
+
+def stats() -> dict:
+    return {
+        "default_budget": DEFAULT_BUDGET, "budgets": BUDGETS,
+        "tokenizers": {m: m in _tokenizers for m in TOKENIZERS},
+        **{k: _stats[k] for k in ("prompts", "chunks_deduped", "chunks_over_budget", "over_budget", "clipped")},
+    }
@@ -3,8 +3,10 @@ GENERIC_SYSTEM = (
   "No code fences or commentary."
 )
 
-MCQ_USER_TMPL = """Create ONE multiple-choice question for topic: {topic}.
-Difficulty: {difficulty}. EXACTLY 4 options (A–D), ONE correct.
+# User templates keep every variable at the end: the system prompt plus the
+# instruction block is then byte-identical across requests (LLM prefix cache).
+MCQ_USER_TMPL = """Create ONE multiple-choice question for the topic and difficulty given at the end.
+EXACTLY 4 options (A–D), ONE correct.
 
 Return a SINGLE JSON object with EXACTLY these keys:
 - type: "mcq"            # literal string 'mcq'
@@ -27,12 +29,14 @@ STRICT RULES:
 - Set 'correct': true only on the correct choice AND make 'correct_id' match it.
 - No code fences, no extra commentary, JSON only.
 
+Topic: {topic}
+Difficulty: {difficulty}
+
 Context (may be empty):
 {context}
 """
 
-SHORT_USER_TMPL = """Create ONE short-answer question for topic: {topic}.
-Difficulty: {difficulty}.
+SHORT_USER_TMPL = """Create ONE short-answer question for the topic and difficulty given at the end.
 
 Return a SINGLE JSON object with EXACTLY these keys:
 - type: "short"          # literal 'short'
@@ -47,19 +51,30 @@ STRICT RULES:
 - rubric_points MUST be an array of 3–6 SHORT strings.
 - No code fences, no prose around the JSON, JSON only.
 
+Topic: {topic}
+Difficulty: {difficulty}
+
 Context (may be empty):
 {context}
 """
 
 CODING_USER_TMPL = """Create ONE original coding task (not from public sites).
-Language: {language}. Topic tags: {tags}. Difficulty: {difficulty}.
-Return JSON with keys: type,title,language,difficulty,tags,prompt,signature,starter_code,tests[],constraints,explanation.
+Return JSON with keys: type,title,language,difficulty,tags,prompt,signature,starter_code,tests[],constraints,explanation,reference_solution.
 Each test has name,input,expected. Deterministic only.
+input is the call's argument list and expected the return value, both as literals (e.g. "[3, 1, 2], 2" and "[1, 2]").
+reference_solution is a complete, correct implementation of signature; it is checked against the tests and never shown.
+
+Language: {language}. Topic tags: {tags}. Difficulty: {difficulty}.
 """
 
 SQL_USER_TMPL = """Create ONE SQL task grounded in the given dataset domain.
-Dataset: {dataset}. Difficulty: {difficulty}.
 Return JSON with keys: type,title,dataset,difficulty,prompt,canonical_query,expected_result_hash,hints.
+canonical_query is ONE SQLite SELECT over the schema below; expected_result_hash: null (computed by the server).
+
+Schema (SQLite):
+{schema}
+
+Dataset: {dataset}. Difficulty: {difficulty}.
 
 Context:
 {context}
@@ -70,10 +85,24 @@ GRADE_SHORT_SYSTEM = (
   "Return JSON {correct: bool, score: float (0..1), feedback: string}."
 )
 
-GRADE_SHORT_USER_TMPL = """Question JSON:
+GRADE_SHORT_USER_TMPL = """Score=1.0 if all rubric_points satisfied; partial otherwise. Be terse; list missing points.
+
+Question JSON:
 {question_json}
 
 Student answer:
-{answer}
+{answer}"""
+
+GRADE_SHORT_BATCH_SYSTEM = (
+  "You grade several short answers to the same question strictly by rubric. "
+  "Return JSON {results: [{id: int, correct: bool, score: float (0..1), feedback: string}]}, "
+  "one entry per answer id."
+)
+
+GRADE_SHORT_BATCH_USER_TMPL = """For each id: score=1.0 if all rubric_points satisfied; partial otherwise. Be terse; list missing points.
+
+Question JSON:
+{question_json}
 
-Score=1.0 if all rubric_points satisfied; partial otherwise. Be terse; list missing points."""
+Student answers (JSON array of {{id, answer}}):
+{answers_json}"""
@@ -0,0 +1,174 @@
+import os, json, time, asyncio, sqlite3, threading, logging
+from typing import Awaitable, Callable, Dict, Optional
+
+from schemas import GenerateRequest
+import admission
+
+ENABLED = os.getenv("QPOOL_ENABLED", "0") == "1"
+PATH = os.getenv("QPOOL_PATH", "./qpool.sqlite3")
+LOW = int(os.getenv("QPOOL_LOW", "2"))      # refill starts below this depth...
+HIGH = int(os.getenv("QPOOL_HIGH", "5"))    # ...and tops up to this depth
+WORKERS = int(os.getenv("QPOOL_WORKERS", "1"))
+IDLE_S = float(os.getenv("QPOOL_IDLE_S", "5"))
+MAX_AGE_S = float(os.getenv("QPOOL_MAX_AGE_S", "0"))  # 0 = pooled items never expire
+MAX_KEYS = int(os.getenv("QPOOL_MAX_KEYS", "200"))
+LEARN = os.getenv("QPOOL_LEARN", "1") == "1"  # start pooling keys seen on /generate misses
+# Optional JSON file: [{"qtype", "topic", "difficulty", "language"?, "low"?, "high"?}, ...]
+CONFIG = os.getenv("QPOOL_CONFIG", "")
+
+log = logging.getLogger("quizforge.qpool")
+
+
+def pool_key(req: GenerateRequest) -> str:
+    lang = req.language if req.qtype == "coding" else None
+    return json.dumps([req.qtype, " ".join(req.topic.lower().split()), req.difficulty, lang])
+
+
+def eligible(req: GenerateRequest) -> bool:
+    # Explicit tags change the coding prompt; keep those on the live path
+    return not req.tags
+
+
+class QuestionPool:
+    """
+    Pre-generated items keyed by (qtype, topic, difficulty, language), persisted in SQLite.
+    Background workers refill a key once it drops below its low watermark, up to its high
+    watermark, through the same generate function /generate uses.
+    """
+
+    def __init__(self, generate: Callable[[GenerateRequest], Awaitable], path: str = PATH):
+        self.generate = generate
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS keys (key TEXT PRIMARY KEY, request TEXT NOT NULL, "
+                "low INTEGER NOT NULL, high INTEGER NOT NULL)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS items (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "key TEXT NOT NULL, payload TEXT NOT NULL, created REAL NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS items_key ON items(key, id)")
+        if CONFIG:
+            with open(CONFIG, encoding="utf-8") as f:
+                for entry in json.load(f):
+                    low, high = entry.pop("low", LOW), entry.pop("high", HIGH)
+                    self.register(GenerateRequest(**entry), low, high, replace=True)
+        self._filling: set = set()
+        self._claimed: set = set()
+        self._backoff: Dict[str, float] = {}
+        self._streak: Dict[str, int] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._tasks: list = []
+        self.hits = self.misses = self.generated = self.failures = 0
+
+    # --- storage -----------------------------------------------------------
+    def register(self, req: GenerateRequest, low: int = LOW, high: int = HIGH, replace: bool = False) -> bool:
+        if not eligible(req):
+            return False
+        request = req.dict(include={"qtype", "topic", "difficulty", "language", "use_rag"})
+        with self._lock, self._db:
+            if not replace:
+                n = self._db.execute("SELECT COUNT(*) FROM keys").fetchone()[0]
+                if n >= MAX_KEYS:
+                    return False
+            verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+            self._db.execute(f"{verb} INTO keys (key, request, low, high) VALUES (?, ?, ?, ?)",
+                             (pool_key(req), json.dumps(request), low, max(low, high)))
+        return True
+
+    def _depths(self) -> Dict[str, tuple]:
+        min_created = time.time() - MAX_AGE_S if MAX_AGE_S > 0 else 0.0
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT k.key, k.request, k.low, k.high, "
+                "(SELECT COUNT(*) FROM items i WHERE i.key = k.key AND i.created >= ?) "
+                "FROM keys k", (min_created,)).fetchall()
+        return {key: (json.loads(request), low, high, depth) for key, request, low, high, depth in rows}
+
+    def push(self, key: str, item: dict) -> None:
+        with self._lock, self._db:
+            self._db.execute("INSERT INTO items (key, payload, created) VALUES (?, ?, ?)",
+                             (key, json.dumps(item, ensure_ascii=False), time.time()))
+
+    def pop(self, req: GenerateRequest) -> Optional[dict]:
+        if not eligible(req):
+            return None
+        key = pool_key(req)
+        with self._lock, self._db:
+            if MAX_AGE_S > 0:
+                self._db.execute("DELETE FROM items WHERE created < ?", (time.time() - MAX_AGE_S,))
+            row = self._db.execute(
+                "SELECT id, payload FROM items WHERE key = ? ORDER BY id LIMIT 1", (key,)).fetchone()
+            if row is not None:
+                self._db.execute("DELETE FROM items WHERE id = ?", (row[0],))
+        if row is None:
+            self.misses += 1
+            if LEARN:
+                self.register(req)
+        else:
+            self.hits += 1
+        if self._wake is not None:
+            self._wake.set()
+        return json.loads(row[1]) if row is not None else None
+
+    # --- refill ------------------------------------------------------------
+    def _next_key(self):
+        now = time.monotonic()
+        best = None
+        for key, (request, low, high, depth) in self._depths().items():
+            if depth < low:
+                self._filling.add(key)
+            elif depth >= high:
+                self._filling.discard(key)
+            if key not in self._filling or key in self._claimed or self._backoff.get(key, 0) > now:
+                continue
+            if best is None or depth < best[2]:
+                best = (key, request, depth)
+        return best
+
+    async def _worker(self):
+        admission.priority_var.set("batch")  # refills never delay user-facing LLM calls
+        admission.deadline_var.set(None)
+        while True:
+            nxt = self._next_key()
+            if nxt is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), IDLE_S)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            key, request, _ = nxt
+            self._claimed.add(key)
+            try:
+                item = await self.generate(GenerateRequest(**request, use_pool=False))
+                self.push(key, item.dict())
+                self.generated += 1
+                self._backoff.pop(key, None)
+                self._streak.pop(key, None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                log.warning("question pool refill failed for %s: %s", key, e)
+                streak = self._streak[key] = self._streak.get(key, 0) + 1
+                self._backoff[key] = time.monotonic() + min(300.0, IDLE_S * 2 ** min(6, streak))
+            finally:
+                self._claimed.discard(key)
+
+    def start(self) -> None:
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(max(1, WORKERS))]
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "enabled": True, "hits": self.hits, "misses": self.misses,
+            "generated": self.generated, "failures": self.failures,
+            "keys": {k: {"depth": d, "low": lo, "high": hi} for k, (_, lo, hi, d) in self._depths().items()},
+        }
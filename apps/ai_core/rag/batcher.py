@@ -0,0 +1,71 @@
+import os, asyncio
+from typing import Callable, List, Optional
+from .executor import run_in_rag_pool
+
+BATCH_WINDOW_MS = float(os.getenv("RAG_BATCH_WINDOW_MS", "5"))
+BATCH_MAX = int(os.getenv("RAG_BATCH_MAX", "32"))
+
+
+class QueryBatcher:
+    """
+    Collects retrieve() calls that arrive within a short window and hands them to
+    `fn(queries, top_ks) -> results` in one go, so the encoder sees a real batch.
+    """
+
+    def __init__(self, fn: Callable[[List[str], List[int]], list],
+                 max_batch: int = BATCH_MAX, window_ms: float = BATCH_WINDOW_MS):
+        self.fn = fn
+        self.max_batch = max(1, max_batch)
+        self.window_s = max(0.0, window_ms) / 1000.0
+        self._pending: list = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+        self.batches = 0
+        self.queries = 0
+        self.max_seen = 0
+
+    async def submit(self, query: str, top_k: int):
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((query, top_k, fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_s, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        live = [b for b in batch if not b[2].done()]  # drop cancelled callers
+        if not live:
+            return
+        self.batches += 1
+        self.queries += len(live)
+        self.max_seen = max(self.max_seen, len(live))
+        try:
+            results = await run_in_rag_pool(self.fn, [q for q, _, _ in live], [k for _, k, _ in live])
+        except Exception as e:
+            for _, _, fut in live:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, _, fut), res in zip(live, results):
+            if not fut.done():
+                fut.set_result(res)
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": self.window_s * 1000.0, "max_batch": self.max_batch,
+            "batches": self.batches, "queries": self.queries, "max_seen": self.max_seen,
+            "avg_batch": round(self.queries / self.batches, 2) if self.batches else 0.0,
+        }
@@ -0,0 +1,53 @@
+import os, re
+from typing import Callable, List
+
+CHUNK_TOKENS = int(os.getenv("RAG_CHUNK_TOKENS", "200"))   # MiniLM truncates at 256
+CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "30"))
+
+_UNITS = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+
+def approx_tokens(s: str) -> int:
+    return max(1, int(len(s.split()) * 1.3))
+
+
+def _split_long(unit: str, n_tokens: int, max_tokens: int) -> List[str]:
+    words = unit.split()
+    per = max(1, int(len(words) * max_tokens / n_tokens))
+    return [" ".join(words[i:i + per]) for i in range(0, len(words), per)]
+
+
+def chunk_text(
+    text: str,
+    count_tokens: Callable[[str], int] = approx_tokens,
+    max_tokens: int = CHUNK_TOKENS,
+    overlap: int = CHUNK_OVERLAP,
+) -> List[str]:
+    """Greedy sentence packing up to max_tokens, carrying ~overlap tokens into the next chunk."""
+    units = []
+    for u in _UNITS.split(text or ""):
+        u = u.strip()
+        if not u:
+            continue
+        t = count_tokens(u)
+        if t > max_tokens:
+            units.extend((p, count_tokens(p)) for p in _split_long(u, t, max_tokens))
+        else:
+            units.append((u, t))
+
+    chunks, cur, cur_tok = [], [], 0
+    for u, t in units:
+        if cur and cur_tok + t > max_tokens:
+            chunks.append(" ".join(x for x, _ in cur))
+            carry, ct = [], 0
+            for pu, pt in reversed(cur):
+                if ct + pt > overlap or ct + pt + t > max_tokens:
+                    break
+                carry.insert(0, (pu, pt))
+                ct += pt
+            cur, cur_tok = carry, ct
+        cur.append((u, t))
+        cur_tok += t
+    if cur:
+        chunks.append(" ".join(x for x, _ in cur))
+    return chunks
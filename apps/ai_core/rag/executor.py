@@ -0,0 +1,49 @@
+import os, asyncio, threading, contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+# Embedding (torch) and Chroma release the GIL for the heavy parts, so a small
+# thread pool is enough and keeps the model shared instead of copied per process.
+RAG_WORKERS = int(os.getenv("RAG_WORKERS", "2"))
+
+_executor = ThreadPoolExecutor(max_workers=RAG_WORKERS, thread_name_prefix="rag")
+_lock = threading.Lock()
+_stats = {"queued": 0, "running": 0, "completed": 0, "failed": 0, "max_queued": 0}
+
+
+async def run_in_rag_pool(fn, *args, **kwargs):
+    """Run a blocking RAG call on the bounded pool, tracking queue depth."""
+    state = {"started": False, "abandoned": False}
+
+    def call():
+        with _lock:
+            state["started"] = True
+            if not state["abandoned"]:
+                _stats["queued"] -= 1
+            _stats["running"] += 1
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            with _lock:
+                _stats["running"] -= 1
+                _stats["completed" if ok else "failed"] += 1
+
+    with _lock:
+        _stats["queued"] += 1
+        _stats["max_queued"] = max(_stats["max_queued"], _stats["queued"])
+    try:
+        # Copy the context so stage metrics recorded on the pool keep the request's endpoint label
+        return await asyncio.get_running_loop().run_in_executor(_executor, contextvars.copy_context().run, call)
+    finally:
+        # Caller cancelled before a worker picked the job up
+        with _lock:
+            if not state["started"]:
+                state["abandoned"] = True
+                _stats["queued"] -= 1
+
+
+def stats() -> dict:
+    with _lock:
+        return {"workers": RAG_WORKERS, **_stats}
@@ -1,33 +1,196 @@
-import os, uuid
-import chromadb
-from chromadb.config import Settings
+import os, hashlib
+import numpy as np
 from sentence_transformers import SentenceTransformer
+from .executor import run_in_rag_pool
+from .stores import make_store, BACKEND
+from .lexical import BM25Index, rrf
+from .batcher import QueryBatcher
+from .chunker import chunk_text, approx_tokens
+from cache import TTLCache
+import metrics
 
 MODEL_NAME = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 PERSIST = os.getenv("RAG_PERSIST", "./rag_store")
+CACHE_SIZE = int(os.getenv("RAG_CACHE_SIZE", "1024"))
+EMBED_CACHE_SIZE = int(os.getenv("RAG_EMBED_CACHE_SIZE", "4096"))
+CACHE_TTL_S = float(os.getenv("RAG_CACHE_TTL_S", "600"))
+EMBED_BATCH = int(os.getenv("RAG_EMBED_BATCH", "64"))
+
+# Retrieval: dense (vectors only) | lexical (BM25 only) | hybrid (reciprocal-rank fusion of both)
+MODE = os.getenv("RAG_MODE", "hybrid")
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+CANDIDATES = int(os.getenv("RAG_CANDIDATES", "4"))  # hybrid: each retriever returns top_k * this
+# Relevance floors (0 = off): fewer, better chunks instead of always top_k
+MIN_SIM = float(os.getenv("RAG_MIN_SIM", "0"))            # dense cosine similarity
+MIN_BM25 = float(os.getenv("RAG_MIN_BM25", "0"))          # raw BM25 score
+REL_CUTOFF = float(os.getenv("RAG_REL_CUTOFF", "0"))      # drop results scoring < this fraction of the best
+
+def normalize_query(q: str) -> str:
+    return " ".join(q.lower().split())
+
+def content_id(title: str, source: str, text: str) -> str:
+    return hashlib.sha256(f"{title}\0{source}\0{text}".encode("utf-8")).hexdigest()[:32]
 
 class RAGIndex:
-    def __init__(self, collection_name="docs"):
-        self.client = chromadb.Client(Settings(persist_directory=PERSIST))
-        self.collection = self.client.get_or_create_collection(name=collection_name, metadata={"hnsw:space":"cosine"})
+    def __init__(self, collection_name="docs", backend=BACKEND):
+        self.collection_name = collection_name
+        # Vector store: Chroma (default) or the in-process NumPy index (RAG_BACKEND=numpy)
+        self.store = make_store(collection_name, PERSIST, backend)
+        # Inverted index kept next to the vectors; catches up on chunks stored before it existed
+        self.lexical = BM25Index(collection_name, PERSIST) if MODE != "dense" else None
+        if self.lexical is not None and len(self.lexical) < self.store.count():
+            docs = [(i, f'{m.get("title", "")} {d}') for i, d, m in self.store.documents()]
+            self.lexical.add([i for i, _ in docs], [t for _, t in docs])
         self.embedder = SentenceTransformer(MODEL_NAME)
+        self.batcher = QueryBatcher(self.retrieve_many)
+        # Query embeddings only depend on the model; results depend on the collection
+        self.embed_cache = TTLCache(EMBED_CACHE_SIZE, CACHE_TTL_S)
+        self.result_cache = TTLCache(CACHE_SIZE, CACHE_TTL_S)
+
+    def count_tokens(self, text: str) -> int:
+        tok = getattr(self.embedder, "tokenizer", None)
+        return len(tok.tokenize(text)) if tok is not None else approx_tokens(text)
 
     def add_documents(self, docs):
-        # docs: [{id?, title, text, source}]
-        ids, texts, metadatas = [], [], []
+        """
+        docs: [{id?, title, text, source}]. Each doc is split into token-bounded chunks;
+        chunk ids are content hashes, so re-ingesting unchanged text is a no-op.
+        One embed call and one persist per call.
+        """
+        chunks = {}
         for d in docs:
-            did = d.get("id") or str(uuid.uuid4())
-            ids.append(did)
-            texts.append(d["text"])
-            metadatas.append({"title": d.get("title",""), "source": d.get("source","")})
-        embs = self.embedder.encode(texts, convert_to_numpy=True).tolist()
-        self.collection.add(ids=ids, embeddings=embs, documents=texts, metadatas=metadatas)
-        self.client.persist()
+            title, source = d.get("title", "") or "", d.get("source", "") or ""
+            for n, piece in enumerate(chunk_text(d["text"], self.count_tokens)):
+                cid = content_id(title, source, piece)
+                meta = {"title": title, "source": source, "chunk": n}
+                if d.get("id"):
+                    meta["doc_id"] = d["id"]
+                chunks[cid] = (piece, meta)
+        stats = {"docs": len(docs), "chunks": len(chunks), "added": 0, "skipped": 0}
+        if not chunks:
+            return stats
+        ids = list(chunks)
+        existing = self.store.existing(ids)
+        new_ids = [i for i in ids if i not in existing]
+        stats["skipped"] = len(ids) - len(new_ids)
+        if new_ids:
+            texts = [chunks[i][0] for i in new_ids]
+            with metrics.stage("ingest_encode"):
+                embs = self.embedder.encode(texts, batch_size=EMBED_BATCH, convert_to_numpy=True)
+            self.store.add(new_ids, embs, texts, [chunks[i][1] for i in new_ids])
+            if self.lexical is not None:
+                self.lexical.add(new_ids, [f'{chunks[i][1]["title"]} {chunks[i][0]}' for i in new_ids])
+            self.result_cache.clear()
+            stats["added"] = len(new_ids)
+        return stats
+
+    def _cache_key(self, query: str, top_k: int):
+        return (normalize_query(query), top_k, self.collection_name)
 
     def retrieve(self, query: str, top_k=6):
-        qemb = self.embedder.encode([query], convert_to_numpy=True).tolist()[0]
-        res = self.collection.query(query_embeddings=[qemb], n_results=top_k)
-        chunks = []
-        for doc, meta in zip(res["documents"][0], res["metadatas"][0]):
-            chunks.append(f'{meta.get("title","")}: {doc[:1200]}')
-        return "\n---\n".join(chunks) if chunks else ""
+        key = self._cache_key(query, top_k)
+        hit = self.result_cache.get(key)
+        if hit is not None:
+            return hit
+        return self.retrieve_many([query], [top_k])[0]
+
+    def _encode_queries(self, queries):
+        embs, todo = {}, []
+        for q in queries:
+            e = self.embed_cache.get(q)
+            if e is None:
+                todo.append(q)
+            else:
+                embs[q] = e
+        if todo:
+            with metrics.stage("rag_encode"):
+                encoded = self.embedder.encode(todo, convert_to_numpy=True)
+            for q, e in zip(todo, encoded):
+                embs[q] = e
+                self.embed_cache.put(q, e)
+        return [embs[q] for q in queries]
+
+    def search_many(self, queries, top_ks, mode=None):
+        """
+        Scored hits per query, best first: [(id, score, doc, meta)]. Scores are cosine
+        (dense), BM25 (lexical) or RRF (hybrid); floors and the relative cutoff apply.
+        One encoder call and one store query for the whole batch; repeated queries
+        in the batch are handled once.
+        """
+        mode = mode or MODE
+        if self.lexical is None:
+            mode = "dense"
+        uniq = list(dict.fromkeys(normalize_query(q) for q in queries))
+        n = max(top_ks) * (CANDIDATES if mode == "hybrid" else 1)
+        dense = {q: [] for q in uniq}
+        lexical = {q: [] for q in uniq}
+        if mode != "lexical":
+            embs = np.asarray(self._encode_queries(uniq), dtype=np.float32)
+            with metrics.stage("rag_query"):
+                for q, hits in zip(uniq, self.store.query(embs, n)):
+                    dense[q] = [h for h in hits if h[1] >= MIN_SIM]
+        if mode != "dense":
+            with metrics.stage("rag_lexical"):
+                for q in uniq:
+                    lexical[q] = [h for h in self.lexical.search(q, n) if h[1] >= MIN_BM25]
+
+        if mode == "dense":
+            ranked = {q: [(h[0], h[1]) for h in dense[q]] for q in uniq}
+        elif mode == "lexical":
+            ranked = lexical
+        else:
+            ranked = {q: rrf([[h[0] for h in dense[q]], [i for i, _ in lexical[q]]], RRF_K) for q in uniq}
+        # Lexical-only hits still need their text
+        known = {h[0]: (h[2], h[3]) for hits in dense.values() for h in hits}
+        missing = {i for r in ranked.values() for i, _ in r if i not in known}
+        if missing:
+            known.update(self.store.get(list(missing)))
+
+        out = []
+        for q, k in zip(queries, top_ks):
+            hits = [(i, sc, *known[i]) for i, sc in ranked[normalize_query(q)][:k] if i in known]
+            if hits and REL_CUTOFF > 0:
+                hits = [h for h in hits if h[1] >= REL_CUTOFF * hits[0][1]]
+            out.append(hits)
+        return out
+
+    def retrieve_many(self, queries, top_ks):
+        generation = self.result_cache.generation
+        out = []
+        for q, k, hits in zip(queries, top_ks, self.search_many(queries, top_ks)):
+            chunks = [f'{meta.get("title","")}: {doc[:1200]}' for _, _, doc, meta in hits]
+            out.append("\n---\n".join(chunks) if chunks else "")
+            self.result_cache.put(self._cache_key(q, k), out[-1], generation)
+        return out
+
+    def embed(self, texts):
+        """Unit-normalized embeddings (numpy), e.g. for near-duplicate checks."""
+        return self.embedder.encode(list(texts), batch_size=EMBED_BATCH, convert_to_numpy=True,
+                                    normalize_embeddings=True)
+
+    # Async wrappers: encode + Chroma run on the bounded RAG pool, not the event loop
+    async def aembed(self, texts):
+        return await run_in_rag_pool(self.embed, texts)
+
+    async def aadd_documents(self, docs):
+        return await run_in_rag_pool(self.add_documents, docs)
+
+    async def aretrieve(self, query: str, top_k=6):
+        with metrics.stage("rag_retrieve"):
+            hit = self.result_cache.get(self._cache_key(query, top_k))
+            if hit is not None:
+                return hit
+            return await self.batcher.submit(query, top_k)
+
+    def count(self) -> int:
+        return self.store.count()
+
+    def health(self) -> dict:
+        return {"batcher": self.batcher.stats(), "cache": self.cache_stats(), "store": self.store_stats()}
+
+    def store_stats(self) -> dict:
+        return {**self.store.stats(), "mode": MODE,
+                "lexical": self.lexical.stats() if self.lexical is not None else None}
+
+    def cache_stats(self) -> dict:
+        return {"results": self.result_cache.stats(), "embeddings": self.embed_cache.stats()}
@@ -0,0 +1,148 @@
+import os, re, json, math, fcntl, threading
+from array import array
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+BM25_K1 = float(os.getenv("RAG_BM25_K1", "1.2"))
+BM25_B = float(os.getenv("RAG_BM25_B", "0.75"))
+
+# Keep technical tokens whole: "c#", "c++", ".net", "s3", "group_concat", "2nf"
+_TOKEN = re.compile(r"\.?[a-z0-9][a-z0-9_#+]*")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the this to was were "
+    "what when which who why will with how do does can you your".split()
+)
+# Second words that turn the previous word into a term: "group by", "left join", "primary key"
+_PAIR_TAILS = frozenset({"by", "join", "key", "case", "as"})
+
+
+def tokenize(text: str) -> List[str]:
+    words = _TOKEN.findall(text.lower())
+    pairs = [f"{a}_{b}" for a, b in zip(words, words[1:]) if a not in STOPWORDS and b in _PAIR_TAILS]
+    return [w for w in words if w not in STOPWORDS] + pairs
+
+
+class BM25Index:
+    """
+    Incremental inverted index with Okapi BM25 scoring.
+
+    Postings live in memory; every added chunk is appended to <persist>/<name>.bm25.jsonl
+    as {"id", "tf", "len"}, so a restart (or another worker process) rebuilds or
+    catches up by reading only the lines it has not seen.
+    """
+
+    def __init__(self, name: str, persist: str):
+        os.makedirs(persist, exist_ok=True)
+        self.path = os.path.join(persist, f"{name}.bm25.jsonl")
+        self.ids: List[str] = []
+        self.lens = array("i")
+        self.total_len = 0
+        # term -> (rows, term frequencies); compact arrays, ~8 bytes per posting
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self._known: set = set()
+        self._offset = 0
+        self._lock = threading.RLock()
+        self._refresh()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _index(self, cid: str, tf: Dict[str, int], length: int) -> None:
+        if cid in self._known:
+            return
+        row = len(self.ids)
+        self.ids.append(cid)
+        self.lens.append(length)
+        self.total_len += length
+        self._known.add(cid)
+        for term, n in tf.items():
+            plist = self.postings.get(term)
+            if plist is None:
+                plist = self.postings[term] = (array("i"), array("i"))
+            plist[0].append(row)
+            plist[1].append(n)
+
+    def _refresh(self) -> None:
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return
+        if size <= self._offset:
+            return
+        with self._lock, open(self.path, "rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partial write in progress (or crashed); retried next time
+                rec = json.loads(line)
+                self._index(rec["id"], rec["tf"], rec["len"])
+                self._offset += len(line)
+
+    def contains(self, ids: Iterable[str]) -> set:
+        self._refresh()
+        return {i for i in ids if i in self._known}
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]) -> int:
+        """Index new chunks (already-known ids are skipped); returns how many were added."""
+        with self._lock, open(self.path, "ab") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            self._refresh()
+            lines, added = [], 0
+            for cid, text in zip(ids, texts):
+                if cid in self._known:
+                    continue
+                toks = tokenize(text)
+                tf = dict(Counter(toks))
+                lines.append(json.dumps({"id": cid, "tf": tf, "len": len(toks)}, ensure_ascii=False).encode("utf-8") + b"\n")
+                added += 1
+            if lines:
+                f.seek(0, os.SEEK_END)
+                if f.tell() != self._offset:
+                    f.truncate(self._offset)  # drop a crashed writer's partial line
+                f.write(b"".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+            self._refresh()
+            return added
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        self._refresh()
+        terms = set(tokenize(query))
+        with self._lock:
+            # Copy what we need so adds can keep appending while we score
+            n = len(self.ids)
+            if not n or k <= 0:
+                return []
+            lens = np.array(self.lens, dtype=np.float32)
+            plists = [(np.array(self.postings[t][0]), np.array(self.postings[t][1], dtype=np.float32))
+                      for t in terms if t in self.postings]
+            avgdl = self.total_len / n or 1.0
+        if not plists:
+            return []
+        scores = np.zeros(n, dtype=np.float32)
+        for rows, tf in plists:
+            df = len(rows)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lens[rows] / avgdl)
+            scores[rows] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        with self._lock:
+            return [(self.ids[r], float(scores[r])) for r in hits]
+
+    def stats(self) -> dict:
+        n = len(self.ids)
+        return {"chunks": n, "terms": len(self.postings), "avg_len": round(self.total_len / n, 1) if n else 0}
+
+
+def rrf(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Reciprocal-rank fusion: sum of 1 / (k + rank) over every list an id appears in."""
+    fused: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, cid in enumerate(ranking, 1):
+            fused[cid] += 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda x: -x[1])
@@ -0,0 +1,169 @@
+"""
+Client side of the shared embedding service (rag.server), used when RAG_SERVER_SOCKET
+is set: API workers keep no model or index of their own.
+
+Frames are b"!II" (header length, payload length) + JSON header + raw payload; numpy
+arrays travel as their raw buffer (dtype/shape in the header), never pickled or
+JSON-encoded. The sender hands the array's own memory to the socket, and the client
+receives a reply straight into the bytearray np.frombuffer wraps, so neither side
+copies an embedding matrix. (The asyncio server still copies on read and, for a
+send the socket does not take at once, into its write buffer.)
+"""
+import os, sys, json, time, fcntl, queue, socket, struct, logging, threading, subprocess
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from .executor import run_in_rag_pool
+
+SOCKET = os.getenv("RAG_SERVER_SOCKET", "")              # empty = load the index in-process
+SPAWN = os.getenv("RAG_SERVER_SPAWN", "1") == "1"        # first worker starts the server if none runs
+START_S = float(os.getenv("RAG_SERVER_START_S", "180"))  # wait for the server to load the model
+CONNECTIONS = int(os.getenv("RAG_SERVER_CONNECTIONS", "4"))  # per API worker
+TIMEOUT_S = float(os.getenv("RAG_SERVER_TIMEOUT_S", "120"))
+
+_HEAD = struct.Struct("!II")
+log = logging.getLogger("quizforge.rag")
+
+
+class RemoteError(RuntimeError):
+    pass
+
+
+def pack(header: dict, array: Optional[np.ndarray] = None) -> List[memoryview]:
+    payload = memoryview(b"")
+    if array is not None:
+        array = np.ascontiguousarray(array)
+        header = {**header, "array": {"dtype": array.dtype.str, "shape": list(array.shape)}}
+        payload = memoryview(array).cast("B")
+    head = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    return [memoryview(_HEAD.pack(len(head), len(payload))), memoryview(head), payload]
+
+
+def unpack(head: bytes, payload) -> Tuple[dict, Optional[np.ndarray]]:
+    header = json.loads(head)
+    spec = header.pop("array", None)
+    if spec is None:
+        return header, None
+    return header, np.frombuffer(payload, dtype=np.dtype(spec["dtype"])).reshape(spec["shape"])
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytearray:
+    buf = bytearray(n)
+    view, got = memoryview(buf), 0
+    while got < n:
+        k = sock.recv_into(view[got:])
+        if not k:
+            raise ConnectionError("RAG server closed the connection")
+        got += k
+    return buf  # unpack wraps it as is
+
+
+def lock_path(path: str) -> str:
+    return path + ".lock"
+
+
+def _spawn(path: str) -> None:
+    # The server holds an flock on <socket>.lock while it lives: if we can take it, none is running
+    with open(lock_path(path), "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return  # starting or running; just wait for the socket
+        fcntl.flock(f, fcntl.LOCK_UN)
+    app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    log.info("starting RAG server on %s", path)
+    subprocess.Popen([sys.executable, "-m", "rag.server", "--socket", path], cwd=app_dir,
+                     start_new_session=True, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+
+
+class RemoteIndex:
+    """RAGIndex look-alike (the parts the service uses) backed by rag.server."""
+
+    def __init__(self, path: str = SOCKET):
+        self.path = path
+        self._idle: "queue.LifoQueue[socket.socket]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(1, CONNECTIONS))
+        self.calls = 0
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(TIMEOUT_S)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def wait_ready(self) -> None:
+        """Connect, starting the server first if allowed; blocks until it serves or START_S passes."""
+        deadline, spawned = time.monotonic() + START_S, False
+        while True:
+            try:
+                self._idle.put(self._connect())
+                return
+            except OSError as e:
+                if SPAWN and not spawned:
+                    _spawn(self.path)
+                    spawned = True
+                if time.monotonic() > deadline:
+                    raise RemoteError(f"RAG server at {self.path} unavailable: {e}")
+                time.sleep(0.2)
+
+    def call(self, op: str, array: Optional[np.ndarray] = None, **args):
+        with self._slots:
+            try:
+                sock = self._idle.get_nowait()
+            except queue.Empty:
+                sock = self._connect()
+            try:
+                for part in pack({"op": op, "args": args}, array):
+                    sock.sendall(part)
+                hlen, plen = _HEAD.unpack(_recv_exact(sock, _HEAD.size))
+                header, out = unpack(_recv_exact(sock, hlen), _recv_exact(sock, plen))
+            except BaseException:
+                sock.close()  # mid-frame state is unknown; never reuse
+                raise
+            self._idle.put(sock)
+        self.calls += 1
+        if not header.get("ok"):
+            raise RemoteError(header.get("error", "RAG server error"))
+        return out if out is not None else header.get("result")
+
+    # --- RAGIndex surface -------------------------------------------------
+    def embed(self, texts):
+        return self.call("embed", texts=list(texts))
+
+    def add_documents(self, docs):
+        return self.call("add_documents", docs=list(docs))
+
+    def retrieve(self, query: str, top_k=6):
+        return self.call("retrieve", query=query, top_k=top_k)
+
+    def retrieve_many(self, queries, top_ks):
+        return self.call("retrieve_many", queries=list(queries), top_ks=list(top_ks))
+
+    def search_many(self, queries, top_ks, mode=None):
+        hits = self.call("search_many", queries=list(queries), top_ks=list(top_ks), mode=mode)
+        return [[tuple(h) for h in hs] for hs in hits]
+
+    def count(self) -> int:
+        return self.call("count")
+
+    def health(self) -> dict:
+        try:
+            out = self.call("health")
+        except Exception as e:
+            out = {"error": repr(e)[:300]}
+        return {**out, "remote": {"socket": self.path, "calls": self.calls}}
+
+    # Same wrappers as RAGIndex: the blocking socket round trip runs on the RAG pool
+    async def aembed(self, texts):
+        return await run_in_rag_pool(self.embed, texts)
+
+    async def aadd_documents(self, docs):
+        return await run_in_rag_pool(self.add_documents, docs)
+
+    async def aretrieve(self, query: str, top_k=6):
+        return await run_in_rag_pool(self.retrieve, query, top_k)
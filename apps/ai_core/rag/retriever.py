@@ -1,12 +1,74 @@
-from .indexer import RAGIndex
+import os, asyncio, threading, time, logging
+from .executor import run_in_rag_pool
+from . import remote
+
+PRELOAD = os.getenv("RAG_PRELOAD", "1") == "1"      # load embedder + Chroma in the background at startup
+BOOTSTRAP = os.getenv("RAG_BOOTSTRAP", "0") == "1"  # seed demo chunks into an empty store
+RETRY_S = float(os.getenv("RAG_LOAD_RETRY_S", "30"))  # after a failed load, fail fast for this long
+REMOTE = remote.SOCKET  # set: use the shared rag.server instead of loading a model per worker
+
+log = logging.getLogger("quizforge.rag")
 _index = None
+_lock = threading.Lock()
+_alock = asyncio.Lock()
+_status = {"state": "cold", "error": None, "load_s": None, "failed_at": None}
+
+def _load():
+    if _status["failed_at"] is not None and time.monotonic() - _status["failed_at"] < RETRY_S:
+        raise RuntimeError(f"RAG index unavailable: {_status['error']}")
+    _status.update(state="loading", error=None)
+    t0 = time.perf_counter()
+    try:
+        if REMOTE:
+            idx = remote.RemoteIndex(REMOTE)
+            idx.wait_ready()  # spawns the server if none runs; it loads and warms the model
+        else:
+            # chromadb / sentence_transformers (torch) are imported here, not at process start
+            from .indexer import RAGIndex
+            idx = RAGIndex()
+            idx.embed(["warm-up"])  # first encode pays tokenizer/kernel init
+    except Exception as e:
+        _status.update(state="failed", error=repr(e)[:300], failed_at=time.monotonic())
+        log.exception("RAG index failed to load")
+        raise
+    _status.update(state="ready", load_s=round(time.perf_counter() - t0, 3), failed_at=None)
+    return idx
 
 def get_index():
     global _index
     if _index is None:
-        _index = RAGIndex()
+        # Concurrent first callers must not each load the embedder
+        with _lock:
+            if _index is None:
+                _index = _load()
     return _index
 
+async def aget_index():
+    """Like get_index(), but loads the model off the event loop."""
+    if _index is None:
+        async with _alock:
+            if _index is None:
+                await run_in_rag_pool(get_index)
+    return _index
+
+async def preload():
+    """Startup task: load the index (and seed demo docs if RAG_BOOTSTRAP=1) while the app already serves."""
+    if not (PRELOAD or BOOTSTRAP):
+        return
+    try:
+        idx = await aget_index()
+        if BOOTSTRAP and not REMOTE and idx.count() == 0:
+            await run_in_rag_pool(ingest_example_docs)
+    except Exception:
+        pass  # recorded in status(); requests fall back to no context
+
+def ready() -> bool:
+    """Preload finished (a failed load counts: RAG callers degrade to no context, see status())."""
+    return _status["state"] in ("ready", "failed") or not PRELOAD
+
+def status() -> dict:
+    return {"preload": PRELOAD, "remote": REMOTE or None, **{k: v for k, v in _status.items() if k != "failed_at"}}
+
 def ingest_example_docs():
     """Call once to seed with a few pages (replace with your own)."""
     idx = get_index()
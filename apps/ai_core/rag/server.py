@@ -0,0 +1,111 @@
+"""
+Shared embedding service: one process owns the SentenceTransformer, the vector store
+and the BM25 index; API workers reach it over a Unix socket (rag.remote).
+
+    RAG_SERVER_SOCKET=/tmp/quizforge-rag.sock uvicorn service:app --workers 4
+    python -m rag.server --socket /tmp/quizforge-rag.sock   # or let the first worker spawn it
+
+Requests from all workers meet in the same micro-batchers, so concurrent retrievals
+and embeddings become one encoder call.
+"""
+import os, sys, fcntl, signal, asyncio, argparse, logging
+
+import numpy as np
+
+from .executor import run_in_rag_pool
+from .batcher import QueryBatcher
+from .remote import SOCKET, lock_path, pack, unpack, _HEAD
+
+log = logging.getLogger("quizforge.rag.server")
+
+
+class Server:
+    def __init__(self, idx):
+        self.idx = idx
+        # One text per submit: embeddings from different workers share an encode batch
+        self.embedder = QueryBatcher(lambda texts, _: list(idx.embed(texts)))
+        self.connections = 0
+        self.requests = 0
+
+    async def dispatch(self, op: str, args: dict):
+        idx = self.idx
+        if op == "embed":
+            rows = await asyncio.gather(*(self.embedder.submit(t, 0) for t in args["texts"]))
+            return np.stack(rows).astype(np.float32, copy=False) if rows else np.zeros((0, 0), np.float32)
+        if op == "retrieve":
+            return await idx.aretrieve(args["query"], args["top_k"])
+        if op == "retrieve_many":
+            return await run_in_rag_pool(idx.retrieve_many, args["queries"], args["top_ks"])
+        if op == "search_many":
+            hits = await run_in_rag_pool(idx.search_many, args["queries"], args["top_ks"], args.get("mode"))
+            return [[list(h) for h in hs] for hs in hits]
+        if op == "add_documents":
+            return await idx.aadd_documents(args["docs"])
+        if op == "count":
+            return await run_in_rag_pool(idx.count)
+        if op == "health":
+            return {**idx.health(), "server": {"pid": os.getpid(), "connections": self.connections,
+                                               "requests": self.requests, "embed_batcher": self.embedder.stats()}}
+        raise ValueError(f"unknown op {op!r}")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    hlen, plen = _HEAD.unpack(await reader.readexactly(_HEAD.size))
+                    req, array = unpack(await reader.readexactly(hlen), await reader.readexactly(plen))
+                except asyncio.IncompleteReadError:
+                    return  # client went away between requests
+                self.requests += 1
+                try:
+                    out = await self.dispatch(req["op"], req.get("args") or {})
+                    parts = pack({"ok": True}, out) if isinstance(out, np.ndarray) else pack({"ok": True, "result": out})
+                except Exception as e:
+                    log.exception("RAG server %s failed", req.get("op"))
+                    parts = pack({"ok": False, "error": repr(e)[:500]})
+                for part in parts:  # not writelines: before 3.12 it joins the parts into one copy
+                    writer.write(part)
+                await writer.drain()
+        finally:
+            self.connections -= 1
+            writer.close()
+
+
+async def serve(path: str) -> None:
+    lock = open(lock_path(path), "a")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        log.info("another RAG server owns %s; exiting", path)
+        return
+    from . import retriever
+    retriever.REMOTE = ""  # this process is the one that loads the model
+    idx = await run_in_rag_pool(retriever.get_index)  # the socket only appears once the model is loaded
+    if retriever.BOOTSTRAP and idx.count() == 0:
+        await run_in_rag_pool(retriever.ingest_example_docs)
+    if os.path.exists(path):
+        os.unlink(path)  # stale socket of a dead server; we hold the lock
+    srv = Server(idx)
+    server = await asyncio.start_unix_server(srv.handle, path=path)
+    os.chmod(path, 0o660)
+    log.info("RAG server ready on %s (pid %d)", path, os.getpid())
+    stop = asyncio.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        asyncio.get_running_loop().add_signal_handler(sig, stop.set)
+    async with server:
+        await stop.wait()
+    os.unlink(path)
+    lock.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--socket", default=SOCKET or "/tmp/quizforge-rag.sock")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    asyncio.run(serve(args.socket))
+
+
+if __name__ == "__main__":
+    main()
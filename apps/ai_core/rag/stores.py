@@ -0,0 +1,262 @@
+import os, json, fcntl, threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BACKEND = os.getenv("RAG_BACKEND", "chroma")          # chroma | numpy
+VECTOR_DTYPE = os.getenv("RAG_VECTOR_DTYPE", "float32")  # numpy backend: float32 | float16 (1/2 size) | int8 (1/4)
+SCAN_BLOCK = int(os.getenv("RAG_SCAN_BLOCK", "1024"))    # rows upcast per matmul block (cache-sized)
+
+# (id, cosine similarity, document, metadata)
+Hit = Tuple[str, float, str, dict]
+
+
+class ChromaStore:
+    """Chroma collection (cosine HNSW) behind the store interface."""
+
+    def __init__(self, name: str, persist: str):
+        import chromadb
+        from chromadb.config import Settings
+        self.name = name
+        self.client = chromadb.Client(Settings(persist_directory=persist))
+        self.collection = self.client.get_or_create_collection(name=name, metadata={"hnsw:space": "cosine"})
+
+    def existing(self, ids: Sequence[str]) -> set:
+        return set(self.collection.get(ids=list(ids), include=[])["ids"])
+
+    def add(self, ids: List[str], embs: np.ndarray, docs: List[str], metas: List[dict]) -> None:
+        self.collection.upsert(ids=ids, embeddings=np.asarray(embs).tolist(), documents=docs, metadatas=metas)
+        self.client.persist()
+
+    def query(self, embs: np.ndarray, k: int) -> List[List[Hit]]:
+        if k <= 0:
+            return [[] for _ in range(len(embs))]
+        res = self.collection.query(query_embeddings=np.asarray(embs).tolist(), n_results=k,
+                                    include=["documents", "metadatas", "distances"])
+        dists = res.get("distances") or [[0.0] * len(ids) for ids in res["ids"]]
+        return [
+            [(i, 1.0 - float(d), doc, meta or {}) for i, d, doc, meta in zip(ids, ds, docs, metas)]
+            for ids, ds, docs, metas in zip(res["ids"], dists, res["documents"], res["metadatas"])
+        ]
+
+    def get(self, ids: Sequence[str]) -> Dict[str, Tuple[str, dict]]:
+        res = self.collection.get(ids=list(ids), include=["documents", "metadatas"])
+        return {i: (doc, meta or {}) for i, doc, meta in zip(res["ids"], res["documents"], res["metadatas"])}
+
+    def documents(self):
+        """Yield (id, document, metadata) for every stored chunk."""
+        res = self.collection.get(include=["documents", "metadatas"])
+        yield from zip(res["ids"], res["documents"], (m or {} for m in res["metadatas"]))
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def stats(self) -> dict:
+        return {"backend": "chroma", "count": self.count()}
+
+
+class NumpyStore:
+    """
+    Exact cosine search over normalized embeddings in one contiguous, memory-mapped array.
+
+    Layout under <persist>/<name>.vec/:
+      vectors.bin  row-major (n, dim) in float32/float16/int8
+      scales.bin   float32 per-row scale (int8 only: v ~= q * scale)
+      meta.jsonl   one {"id", "doc", "meta"} per row (read lazily by offset)
+      header.json  {"dim", "dtype", "count"}, replaced atomically after each append
+
+    Readers only trust `count` from the header, so other worker processes can map
+    the same files read-only and pick up appends on their next query.
+    """
+
+    def __init__(self, name: str, persist: str, dtype: str = VECTOR_DTYPE):
+        if dtype not in ("float32", "float16", "int8"):
+            raise ValueError(f"Unsupported RAG_VECTOR_DTYPE: {dtype}")
+        self.name = name
+        self.dir = os.path.join(persist, f"{name}.vec")
+        os.makedirs(self.dir, exist_ok=True)
+        self.dtype = dtype
+        self.dim: Optional[int] = None
+        self.n = 0
+        self._ids: Dict[str, int] = {}
+        self._offsets: List[int] = []
+        self._meta_end = 0
+        self._vecs: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._header_mtime = None
+        self._lock = threading.RLock()
+        self._refresh()
+
+    def _path(self, fname: str) -> str:
+        return os.path.join(self.dir, fname)
+
+    def _refresh(self) -> None:
+        """(Re)map files if another process (or this one) appended since the last look."""
+        try:
+            st = os.stat(self._path("header.json"))
+            mtime = (st.st_ino, st.st_mtime_ns)  # os.replace() gives every header a new inode
+        except FileNotFoundError:
+            return
+        if mtime == self._header_mtime:
+            return
+        with self._lock:
+            with open(self._path("header.json"), encoding="utf-8") as f:
+                header = json.load(f)
+            if header["dtype"] != self.dtype and self.n == 0:
+                self.dtype = header["dtype"]  # files decide; the env only applies to new stores
+            self.dim, count = header["dim"], header["count"]
+            if count > self.n:
+                offsets = list(self._offsets)  # readers may hold the old list
+                with open(self._path("meta.jsonl"), "rb") as f:
+                    f.seek(self._meta_end)
+                    for _ in range(count - self.n):
+                        offsets.append(f.tell())
+                        self._ids[json.loads(f.readline())["id"]] = len(offsets) - 1
+                    self._meta_end = f.tell()
+                self._offsets = offsets
+            self.n = count
+            if count:
+                self._vecs = np.memmap(self._path("vectors.bin"), dtype=self.dtype, mode="r", shape=(count, self.dim))
+                if self.dtype == "int8":
+                    self._scales = np.memmap(self._path("scales.bin"), dtype=np.float32, mode="r", shape=(count,))
+            self._header_mtime = mtime
+
+    def existing(self, ids: Sequence[str]) -> set:
+        self._refresh()
+        return {i for i in ids if i in self._ids}
+
+    def _encode(self, embs: np.ndarray):
+        if self.dtype == "int8":
+            scales = np.abs(embs).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            return np.round(embs / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+        return embs.astype(self.dtype), None
+
+    def add(self, ids: List[str], embs: np.ndarray, docs: List[str], metas: List[dict]) -> None:
+        embs = _normalize(np.asarray(embs, dtype=np.float32))
+        with self._lock, open(self._path(".lock"), "w") as lockf:
+            # One writer across processes; re-check ids under the lock
+            fcntl.flock(lockf, fcntl.LOCK_EX)
+            self._refresh()
+            if self.dim is None:
+                self.dim = embs.shape[1]
+            elif embs.shape[1] != self.dim:
+                raise ValueError(f"Embedding dim {embs.shape[1]} != index dim {self.dim}")
+            keep = [n for n, i in enumerate(ids) if i not in self._ids]
+            if not keep:
+                return
+            vecs, scales = self._encode(embs[keep])
+            # Drop any tail a crashed writer left past the committed header
+            files = [("vectors.bin", self.n * self.dim * np.dtype(self.dtype).itemsize, vecs)]
+            if scales is not None:
+                files.append(("scales.bin", self.n * 4, scales))
+            for fname, size, arr in files:
+                with open(self._path(fname), "ab") as f:
+                    f.truncate(size)
+                    f.write(arr.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            with open(self._path("meta.jsonl"), "ab") as f:
+                f.truncate(self._meta_end)
+                for n in keep:
+                    f.write(json.dumps({"id": ids[n], "doc": docs[n], "meta": metas[n]}, ensure_ascii=False).encode("utf-8") + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+            tmp = self._path("header.json.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"dim": self.dim, "dtype": self.dtype, "count": self.n + len(keep)}, f)
+            os.replace(tmp, self._path("header.json"))
+            self._header_mtime = None
+            self._refresh()
+
+    def _snapshot(self):
+        with self._lock:
+            return self._vecs, self._scales, self.n, self._offsets
+
+    def search(self, q: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Exact top-k for m normalized queries: (rows, sims), each (m, k) best first.
+        Quantized rows are upcast and multiplied SCAN_BLOCK at a time, keeping each
+        block's top-k, so the float32 copy stays O(block * m) however large the index is.
+        """
+        vecs, scales, n, _ = self._snapshot()
+        qt = np.ascontiguousarray(q.T, dtype=np.float32)
+        # float32 rows need no upcast: one matmul over the whole map
+        block = n if vecs.dtype == np.float32 else SCAN_BLOCK
+        cand_rows, cand_sims = [], []
+        for s in range(0, n, block):
+            sims = vecs[s:s + block].astype(np.float32, copy=False) @ qt  # (b, m)
+            if scales is not None:
+                sims *= scales[s:s + block, None]
+            kb = min(k, sims.shape[0])
+            part = np.argpartition(-sims, kb - 1, axis=0)[:kb]
+            cand_rows.append(part + s)
+            cand_sims.append(np.take_along_axis(sims, part, axis=0))
+        rows, sims = np.concatenate(cand_rows).T, np.concatenate(cand_sims).T  # (m, candidates)
+        order = np.argsort(-sims, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(rows, order, axis=1), np.take_along_axis(sims, order, axis=1)
+
+    def query(self, embs: np.ndarray, k: int) -> List[List[Hit]]:
+        self._refresh()
+        q = _normalize(np.atleast_2d(np.asarray(embs, dtype=np.float32)))
+        k = min(k, self.n)
+        if k <= 0:
+            return [[] for _ in range(len(q))]
+        rows, sims = self.search(q, k)
+        offsets = self._snapshot()[3]
+        out = []
+        with open(self._path("meta.jsonl"), "rb") as f:
+            for rs, ss in zip(rows, sims):
+                hits = []
+                for r, sim in zip(rs, ss):
+                    f.seek(offsets[int(r)])
+                    rec = json.loads(f.readline())
+                    hits.append((rec["id"], float(sim), rec["doc"], rec["meta"]))
+                out.append(hits)
+        return out
+
+    def get(self, ids: Sequence[str]) -> Dict[str, Tuple[str, dict]]:
+        self._refresh()
+        offsets, out = self._snapshot()[3], {}
+        with open(self._path("meta.jsonl"), "rb") as f:
+            for i in ids:
+                row = self._ids.get(i)
+                if row is not None and row < len(offsets):
+                    f.seek(offsets[row])
+                    rec = json.loads(f.readline())
+                    out[i] = (rec["doc"], rec["meta"])
+        return out
+
+    def documents(self):
+        self._refresh()
+        n = self._snapshot()[2]
+        if not n:
+            return
+        with open(self._path("meta.jsonl"), "rb") as f:
+            for _ in range(n):
+                rec = json.loads(f.readline())
+                yield rec["id"], rec["doc"], rec["meta"]
+
+    def count(self) -> int:
+        self._refresh()
+        return self.n
+
+    def stats(self) -> dict:
+        self._refresh()
+        itemsize = np.dtype(self.dtype).itemsize
+        return {"backend": "numpy", "dtype": self.dtype, "count": self.n, "dim": self.dim,
+                "vector_bytes": self.n * (self.dim or 0) * itemsize}
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def make_store(name: str, persist: str, backend: str = BACKEND):
+    if backend == "numpy":
+        return NumpyStore(name, persist)
+    if backend == "chroma":
+        return ChromaStore(name, persist)
+    raise ValueError(f"Unknown RAG_BACKEND: {backend}")
@@ -0,0 +1,149 @@
+"""
+Compact, deterministic Sakila (DVD rental) dataset for SQLite.
+
+Same tables, columns and keys as the sakila-sqlite3 port, with seeded synthetic rows
+at roughly the original cardinalities, so generated SQL tasks and result hashes are
+reproducible without shipping the dump. Point SAKILA_DB at a real sakila.db to use
+the original data instead.
+"""
+import random, sqlite3
+from datetime import datetime, timedelta
+
+SCHEMA = """
+CREATE TABLE language (language_id INTEGER PRIMARY KEY, name TEXT NOT NULL, last_update TEXT NOT NULL);
+CREATE TABLE category (category_id INTEGER PRIMARY KEY, name TEXT NOT NULL, last_update TEXT NOT NULL);
+CREATE TABLE actor (actor_id INTEGER PRIMARY KEY, first_name TEXT NOT NULL, last_name TEXT NOT NULL, last_update TEXT NOT NULL);
+CREATE TABLE country (country_id INTEGER PRIMARY KEY, country TEXT NOT NULL, last_update TEXT NOT NULL);
+CREATE TABLE city (city_id INTEGER PRIMARY KEY, city TEXT NOT NULL, country_id INTEGER NOT NULL REFERENCES country, last_update TEXT NOT NULL);
+CREATE TABLE address (address_id INTEGER PRIMARY KEY, address TEXT NOT NULL, address2 TEXT, district TEXT NOT NULL,
+  city_id INTEGER NOT NULL REFERENCES city, postal_code TEXT, phone TEXT NOT NULL, last_update TEXT NOT NULL);
+CREATE TABLE film (film_id INTEGER PRIMARY KEY, title TEXT NOT NULL, description TEXT, release_year TEXT,
+  language_id INTEGER NOT NULL REFERENCES language, original_language_id INTEGER REFERENCES language,
+  rental_duration INTEGER NOT NULL, rental_rate DECIMAL(4,2) NOT NULL, length INTEGER,
+  replacement_cost DECIMAL(5,2) NOT NULL, rating TEXT, special_features TEXT, last_update TEXT NOT NULL);
+CREATE TABLE film_actor (actor_id INTEGER NOT NULL REFERENCES actor, film_id INTEGER NOT NULL REFERENCES film,
+  last_update TEXT NOT NULL, PRIMARY KEY (actor_id, film_id));
+CREATE TABLE film_category (film_id INTEGER NOT NULL REFERENCES film, category_id INTEGER NOT NULL REFERENCES category,
+  last_update TEXT NOT NULL, PRIMARY KEY (film_id, category_id));
+CREATE TABLE staff (staff_id INTEGER PRIMARY KEY, first_name TEXT NOT NULL, last_name TEXT NOT NULL,
+  address_id INTEGER NOT NULL REFERENCES address, email TEXT, store_id INTEGER NOT NULL, active INTEGER NOT NULL,
+  username TEXT NOT NULL, last_update TEXT NOT NULL);
+CREATE TABLE store (store_id INTEGER PRIMARY KEY, manager_staff_id INTEGER NOT NULL REFERENCES staff,
+  address_id INTEGER NOT NULL REFERENCES address, last_update TEXT NOT NULL);
+CREATE TABLE customer (customer_id INTEGER PRIMARY KEY, store_id INTEGER NOT NULL REFERENCES store,
+  first_name TEXT NOT NULL, last_name TEXT NOT NULL, email TEXT, address_id INTEGER NOT NULL REFERENCES address,
+  active TEXT NOT NULL, create_date TEXT NOT NULL, last_update TEXT NOT NULL);
+CREATE TABLE inventory (inventory_id INTEGER PRIMARY KEY, film_id INTEGER NOT NULL REFERENCES film,
+  store_id INTEGER NOT NULL REFERENCES store, last_update TEXT NOT NULL);
+CREATE TABLE rental (rental_id INTEGER PRIMARY KEY, rental_date TEXT NOT NULL, inventory_id INTEGER NOT NULL REFERENCES inventory,
+  customer_id INTEGER NOT NULL REFERENCES customer, return_date TEXT, staff_id INTEGER NOT NULL REFERENCES staff,
+  last_update TEXT NOT NULL);
+CREATE TABLE payment (payment_id INTEGER PRIMARY KEY, customer_id INTEGER NOT NULL REFERENCES customer,
+  staff_id INTEGER NOT NULL REFERENCES staff, rental_id INTEGER REFERENCES rental, amount DECIMAL(5,2) NOT NULL,
+  payment_date TEXT NOT NULL, last_update TEXT NOT NULL);
+CREATE INDEX idx_film_actor_film ON film_actor (film_id);
+CREATE INDEX idx_inventory_film ON inventory (film_id);
+CREATE INDEX idx_rental_customer ON rental (customer_id);
+CREATE INDEX idx_rental_inventory ON rental (inventory_id);
+CREATE INDEX idx_payment_customer ON payment (customer_id);
+CREATE INDEX idx_payment_rental ON payment (rental_id);
+"""
+
+LANGUAGES = ["English", "Italian", "Japanese", "Mandarin", "French", "German"]
+CATEGORIES = ["Action", "Animation", "Children", "Classics", "Comedy", "Documentary", "Drama", "Family",
+              "Foreign", "Games", "Horror", "Music", "New", "Sci-Fi", "Sports", "Travel"]
+RATINGS = ["G", "PG", "PG-13", "R", "NC-17"]
+FEATURES = ["Trailers", "Commentaries", "Deleted Scenes", "Behind the Scenes"]
+FIRST = ["PENELOPE", "NICK", "ED", "JENNIFER", "JOHNNY", "BETTE", "GRACE", "MATTHEW", "JOE", "CHRISTIAN", "ZERO",
+         "KARL", "UMA", "VIVIEN", "CUBA", "FRED", "HELEN", "DAN", "BOB", "LUCILLE", "KIRSTEN", "ELVIS", "SANDRA",
+         "CAMERON", "KEVIN", "RIP", "JULIA", "WOODY", "ALEC", "SISSY", "TIM", "MILLA", "AUDREY", "JUDY", "BURT",
+         "VAL", "TOM", "GOLDIE", "JODIE", "SCARLETT", "MARY", "PATRICIA", "LINDA", "BARBARA", "ELIZABETH", "SUSAN"]
+LAST = ["GUINESS", "WAHLBERG", "CHASE", "DAVIS", "LOLLOBRIGIDA", "NICHOLSON", "MOSTEL", "JOHANSSON", "SWANK",
+        "GABLE", "CAGE", "BERRY", "WOOD", "BERGEN", "OLIVIER", "COSTNER", "VOIGHT", "TORN", "FAWCETT", "TRACY",
+        "PALTROW", "MARX", "KILMER", "STREEP", "BLOOM", "CRAWFORD", "MCQUEEN", "HOFFMAN", "WRAY", "JOHANSSON",
+        "SMITH", "JOHNSON", "WILLIAMS", "JONES", "BROWN", "MILLER", "WILSON", "MOORE", "TAYLOR", "ANDERSON"]
+WORDS = ["ACADEMY", "DINOSAUR", "ACE", "GOLDFINGER", "ADAPTATION", "HOLES", "AFFAIR", "PREJUDICE", "AFRICAN",
+         "EGG", "AGENT", "TRUMAN", "AIRPLANE", "SIERRA", "AIRPORT", "POLLOCK", "ALABAMA", "DEVIL", "ALADDIN",
+         "CALENDAR", "ALAMO", "VIDEOTAPE", "ALASKA", "PHANTOM", "ALI", "FOREVER", "ALICE", "FANTASIA", "ALIEN",
+         "CENTER", "ALLEY", "EVOLUTION", "ALONE", "TRIP", "ALTER", "VICTORY", "AMADEUS", "HOLY", "AMELIE", "HELLFIGHTERS"]
+ADJ = ["Epic", "Astounding", "Fateful", "Thoughtful", "Brilliant", "Emotional", "Touching", "Unbelievable", "Taut", "Lacklusture"]
+NOUN = ["Drama", "Story", "Saga", "Documentary", "Reflection", "Yarn", "Tale", "Panorama", "Character Study", "Display"]
+COUNTRIES = ["Argentina", "Australia", "Brazil", "Canada", "China", "France", "Germany", "India", "Italy", "Japan",
+             "Mexico", "Nigeria", "Poland", "Russian Federation", "South Africa", "Spain", "Turkey", "United Kingdom",
+             "United States", "Vietnam"]
+
+STAMP = "2006-02-15 04:34:33"
+
+
+def build(conn: sqlite3.Connection, seed: int = 2006) -> None:
+    rng = random.Random(seed)
+    conn.executescript(SCHEMA)
+    ins = lambda table, rows: conn.executemany(
+        f"INSERT INTO {table} VALUES ({','.join('?' * len(rows[0]))})", rows) if rows else None
+
+    ins("language", [(i, n, STAMP) for i, n in enumerate(LANGUAGES, 1)])
+    ins("category", [(i, n, STAMP) for i, n in enumerate(CATEGORIES, 1)])
+    ins("actor", [(i, rng.choice(FIRST), rng.choice(LAST), STAMP) for i in range(1, 201)])
+    ins("country", [(i, n, STAMP) for i, n in enumerate(COUNTRIES, 1)])
+    ins("city", [(i, f"{rng.choice(WORDS).title()} {rng.choice(['City', 'Town', 'Port', 'Springs', 'Hills'])}",
+                  rng.randint(1, len(COUNTRIES)), STAMP) for i in range(1, 201)])
+    ins("address", [(i, f"{rng.randint(1, 1999)} {rng.choice(WORDS).title()} Street", None,
+                     rng.choice(["Alberta", "QLD", "Texas", "Buenos Aires", "Nordrhein-Westfalen", "Kanagawa"]),
+                     rng.randint(1, 200), f"{rng.randint(10000, 99999)}", f"{rng.randint(10**9, 10**10 - 1)}", STAMP)
+                    for i in range(1, 606)])
+
+    titles = set()
+    films = []
+    for i in range(1, 1001):
+        while True:
+            t = f"{rng.choice(WORDS)} {rng.choice(WORDS)}"
+            if t not in titles:
+                titles.add(t)
+                break
+        feats = ",".join(sorted(rng.sample(FEATURES, rng.randint(1, 3)), key=FEATURES.index))
+        films.append((i, t, f"A {rng.choice(ADJ)} {rng.choice(NOUN)} of a {rng.choice(WORDS).title()} "
+                            f"And a {rng.choice(WORDS).title()} who must {rng.choice(['Chase', 'Meet', 'Fight', 'Find'])} "
+                            f"a {rng.choice(WORDS).title()}", "2006", 1, None,
+                      rng.randint(3, 7), rng.choice([0.99, 2.99, 4.99]), rng.randint(46, 185),
+                      round(rng.randint(9, 29) + 0.99, 2), rng.choice(RATINGS), feats, STAMP))
+    ins("film", films)
+    ins("film_actor", sorted({(rng.randint(1, 200), f, STAMP) for f in range(1, 1001) for _ in range(rng.randint(1, 10))}))
+    ins("film_category", [(f, rng.randint(1, len(CATEGORIES)), STAMP) for f in range(1, 1001)])
+
+    ins("staff", [(1, "Mike", "Hillyer", 3, "Mike.Hillyer@sakilastaff.com", 1, 1, "Mike", STAMP),
+                  (2, "Jon", "Stephens", 4, "Jon.Stephens@sakilastaff.com", 2, 1, "Jon", STAMP)])
+    ins("store", [(1, 1, 1, STAMP), (2, 2, 2, STAMP)])
+    customers = []
+    for i in range(1, 600):
+        fn, ln = rng.choice(FIRST), rng.choice(LAST)
+        customers.append((i, rng.choice([1, 2]), fn, ln, f"{fn}.{ln}@sakilacustomer.org", 5 + i,
+                          "1" if rng.random() < 0.97 else "0", "2006-02-14 22:04:36", STAMP))
+    ins("customer", customers)
+
+    inventory, inv_id = [], 0
+    for f in range(1, 1001):
+        for _ in range(rng.choice([0, 2, 4, 4, 6, 8])):
+            inv_id += 1
+            inventory.append((inv_id, f, rng.choice([1, 2]), STAMP))
+    ins("inventory", inventory)
+
+    rate = {f[0]: f[7] for f in films}
+    duration = {f[0]: f[6] for f in films}
+    film_of = {i[0]: i[1] for i in inventory}
+    start = datetime(2005, 5, 24, 22, 53, 30)
+    rentals, payments = [], []
+    for r in range(1, 16045):
+        when = start + timedelta(seconds=int(r * 1800 * rng.uniform(0.5, 1.5)))
+        inv = rng.randint(1, inv_id)
+        cust = rng.randint(1, 599)
+        staff = rng.choice([1, 2])
+        kept = rng.randint(1, 9)
+        returned = None if rng.random() < 0.01 else (when + timedelta(days=kept, hours=rng.randint(0, 23)))
+        rentals.append((r, when.strftime("%Y-%m-%d %H:%M:%S"), inv, cust,
+                        returned.strftime("%Y-%m-%d %H:%M:%S") if returned else None, staff, STAMP))
+        f = film_of[inv]
+        late = max(0, kept - duration[f])
+        payments.append((r, cust, staff, r, round(rate[f] + late, 2), when.strftime("%Y-%m-%d %H:%M:%S"), STAMP))
+    ins("rental", rentals)
+    ins("payment", payments)
+    conn.commit()
@@ -0,0 +1,149 @@
+"""
+OS-level confinement for one forked test process (code_runner): no network, no new
+programs or processes, no filesystem writes, no view of the host filesystem.
+
+    confine(jail(), keep_fd)   # in the child, after rlimits, before running student code
+
+Layers, strongest first: a seccomp filter (socket/execve/fork/... return EPERM, opens for
+writing are refused), a chroot into an empty directory plus setuid/setgid to an
+unprivileged uid, and a private network namespace where the kernel allows it.
+Audit hooks in code_runner are defence in depth only: C-level entry points
+(e.g. _posixsubprocess.fork_exec) never raise audit events.
+"""
+import os, ctypes, struct, platform, tempfile
+from typing import Optional
+
+UID = int(os.getenv("CODE_SANDBOX_UID", "65534"))  # tests run as this uid/gid (nobody)
+GID = int(os.getenv("CODE_SANDBOX_GID", "65534"))
+REQUIRE_JAIL = os.getenv("CODE_REQUIRE_JAIL", "1") == "1"  # refuse to run without chroot + uid drop (needs root)
+
+# seccomp_data: nr @0, arch @4, args[i] @16 + 8i (low word on little-endian)
+_LD, _JEQ, _JGE, _JSET, _RET = 0x20, 0x15, 0x35, 0x45, 0x06
+_ALLOW, _ERRNO, _KILL = 0x7FFF0000, 0x00050000, 0x80000000
+_EPERM, _ENOSYS = 1, 38
+_CLONE_THREAD, _CLONE_NEWNET = 0x00010000, 0x40000000
+_PR_SET_NO_NEW_PRIVS, _PR_SET_SECCOMP, _SECCOMP_MODE_FILTER = 38, 22, 2
+_WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_TRUNC | os.O_APPEND
+
+_ARCHES = {
+    "x86_64": (0xC000003E, {
+        "open": 2, "socket": 41, "connect": 42, "accept": 43, "bind": 49, "listen": 50, "socketpair": 53,
+        "clone": 56, "fork": 57, "vfork": 58, "execve": 59, "truncate": 76, "rename": 82, "mkdir": 83,
+        "rmdir": 84, "creat": 85, "link": 86, "unlink": 87, "symlink": 88, "chmod": 90, "fchmod": 91,
+        "chown": 92, "fchown": 93, "lchown": 94, "ptrace": 101, "mknod": 133, "pivot_root": 155,
+        "chroot": 161, "mount": 165, "umount2": 166, "openat": 257, "mkdirat": 258, "mknodat": 259,
+        "fchownat": 260, "unlinkat": 263, "renameat": 264, "linkat": 265, "symlinkat": 266, "fchmodat": 268,
+        "unshare": 272, "accept4": 288, "setns": 308, "process_vm_writev": 311, "renameat2": 316, "bpf": 321,
+        "execveat": 322, "io_uring_setup": 425, "clone3": 435, "openat2": 437,
+    }),
+    "aarch64": (0xC00000B7, {
+        "mknodat": 33, "mkdirat": 34, "unlinkat": 35, "symlinkat": 36, "linkat": 37, "renameat": 38,
+        "umount2": 39, "mount": 40, "pivot_root": 41, "truncate": 45, "chroot": 51, "fchmod": 52,
+        "fchmodat": 53, "fchownat": 54, "fchown": 55, "openat": 56, "unshare": 97, "ptrace": 117,
+        "socket": 198, "socketpair": 199, "bind": 200, "listen": 201, "accept": 202, "connect": 203,
+        "clone": 220, "execve": 221, "accept4": 242, "setns": 268, "process_vm_writev": 271,
+        "renameat2": 276, "bpf": 280, "execveat": 281, "io_uring_setup": 425, "clone3": 435, "openat2": 437,
+    }),
+}
+DENY = (
+    "socket", "socketpair", "connect", "bind", "listen", "accept", "accept4",
+    "execve", "execveat", "fork", "vfork", "ptrace", "process_vm_writev",
+    "unshare", "setns", "mount", "umount2", "chroot", "pivot_root", "bpf", "io_uring_setup",
+    "creat", "truncate", "rename", "renameat", "renameat2", "mkdir", "mkdirat", "rmdir", "unlink", "unlinkat",
+    "link", "linkat", "symlink", "symlinkat", "mknod", "mknodat",
+    "chmod", "fchmod", "fchmodat", "chown", "fchown", "lchown", "fchownat",
+)
+
+
+def _filter(arch: str) -> Optional[bytes]:
+    if arch not in _ARCHES:
+        return None
+    audit, nr = _ARCHES[arch]
+    prog, labels = [], {}
+
+    def op(code, k=0, jt=0, jf=0):
+        prog.append([code, jt, jf, k])
+
+    op(_LD, 4)
+    op(_JEQ, audit, 1, 0)
+    op(_RET, _KILL)  # foreign syscall ABI
+    op(_LD, 0)
+    if arch == "x86_64":
+        op(_JGE, 0x40000000, "deny")  # x32 ABI numbers
+    for name in DENY:
+        if name in nr:
+            op(_JEQ, nr[name], "deny")
+    for name in ("clone3", "openat2"):  # arguments live in a struct the filter cannot read
+        op(_JEQ, nr[name], "nosys")     # ENOSYS: libc falls back to clone / openat
+    op(_JEQ, nr["clone"], 0, 2)         # threads yes, processes no
+    op(_LD, 16)
+    op(_JSET, _CLONE_THREAD, "allow", "deny")
+    for name, arg in (("open", 1), ("openat", 2)):
+        if name in nr:
+            op(_JEQ, nr[name], 0, 2)
+            op(_LD, 16 + 8 * arg)
+            op(_JSET, _WRITE_FLAGS, "deny", "allow")
+    labels["allow"] = len(prog)
+    op(_RET, _ALLOW)
+    labels["deny"] = len(prog)
+    op(_RET, _ERRNO | _EPERM)
+    labels["nosys"] = len(prog)
+    op(_RET, _ERRNO | _ENOSYS)
+    for i, ins in enumerate(prog):
+        for j in (1, 2):
+            if isinstance(ins[j], str):
+                ins[j] = labels[ins[j]] - i - 1
+    return b"".join(struct.pack("=HBBI", *ins) for ins in prog)
+
+
+class _SockFprog(ctypes.Structure):
+    _fields_ = [("len", ctypes.c_ushort), ("filter", ctypes.c_void_p)]
+
+
+# Built once per runner process, before any child forks (ctypes is off limits afterwards)
+_libc = ctypes.CDLL(None, use_errno=True)
+_FILTER = _filter(platform.machine())
+_buf = ctypes.create_string_buffer(_FILTER) if _FILTER else None
+_prog = _SockFprog(len(_FILTER) // 8, ctypes.addressof(_buf)) if _FILTER else None
+_jail: Optional[str] = None
+
+
+def jail() -> str:
+    """Empty, root-owned, read-only directory tests are chrooted into (one per runner process)."""
+    global _jail
+    if _jail is None:
+        _jail = tempfile.mkdtemp(prefix="qf_jail_")
+        os.chmod(_jail, 0o555)
+    return _jail
+
+
+def available() -> bool:
+    return _FILTER is not None and (os.geteuid() == 0 or not REQUIRE_JAIL)
+
+
+def confine(root: str, keep_fd: int) -> None:
+    """Child side, irreversible. Raises if any mandatory layer cannot be applied."""
+    if _FILTER is None:
+        raise PermissionError(f"No seccomp filter for {platform.machine()}; refusing to run untrusted code.")
+    # Only the result pipe survives: no pool/forkserver pipes to write into
+    null = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(null, fd)
+    os.closerange(3, keep_fd)
+    os.closerange(keep_fd + 1, os.sysconf("SC_OPEN_MAX"))
+    if os.geteuid() == 0:
+        # Best effort: needs CAP_SYS_ADMIN (absent under Docker's default profile); seccomp blocks sockets anyway
+        _libc.unshare(_CLONE_NEWNET)
+        os.chroot(root)
+        os.chdir("/")
+        os.setgroups([])
+        os.setgid(GID)
+        os.setuid(UID)
+        if os.getuid() == 0 or os.geteuid() == 0:
+            raise PermissionError("Could not drop root.")
+    elif REQUIRE_JAIL:
+        raise PermissionError("The code sandbox needs root to chroot and drop privileges (or CODE_REQUIRE_JAIL=0).")
+    if _libc.prctl(_PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0) != 0:
+        raise OSError(ctypes.get_errno(), "prctl(NO_NEW_PRIVS) failed")
+    if _libc.prctl(_PR_SET_SECCOMP, _SECCOMP_MODE_FILTER, ctypes.byref(_prog), 0, 0) != 0:
+        raise OSError(ctypes.get_errno(), "seccomp filter could not be installed")
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from typing import List, Literal, Optional, Dict
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator
 
 Difficulty = Literal["easy", "medium", "hard"]
 QType = Literal["mcq", "coding", "sql", "short"]
@@ -43,6 +43,7 @@ class CodingQuestion(BaseModel):
     tests: List[Dict[str, str]]  # [{name, input, expected}]
     constraints: Optional[List[str]] = None
     explanation: Optional[str] = None
+    reference_solution: Optional[str] = Field(None, exclude=True)  # checked against tests at generation; never serialized
 
 
 class SQLQuestion(BaseModel):
@@ -72,6 +73,29 @@ class GenerateRequest(BaseModel):
     language: Optional[Lang] = None  # <-- no introspection; clean & explicit
     use_rag: bool = True
     tags: Optional[List[str]] = None
+    use_pool: bool = True  # serve a pre-generated item when available
+    distinct: bool = False  # True: never share a result with identical in-flight requests
+    speculative_k: Optional[int] = Field(None, ge=1, le=5)  # parallel attempts; None = server default
+    hedge_delay_s: Optional[float] = Field(None, ge=0)      # stagger between attempts
+    validate_tests: Optional[bool] = None  # coding: run tests on a reference solution; None = server default
+
+
+class QuizSpecEntry(BaseModel):
+    qtype: QType
+    topic: str
+    difficulty: Difficulty = "easy"
+    language: Optional[Lang] = None
+    tags: Optional[List[str]] = None
+    count: int = Field(1, ge=1, le=50)
+
+
+class BatchGenerateRequest(BaseModel):
+    items: List[QuizSpecEntry]
+    use_rag: bool = True
+    use_pool: bool = True
+    dedup: bool = True
+    dedup_threshold: float = Field(0.92, ge=0.0, le=1.0)  # cosine similarity
+    max_retries: int = Field(2, ge=0, le=5)  # extra attempts per slot after failures/duplicates
 
 
 class GradeMCQRequest(BaseModel):
@@ -88,3 +112,58 @@ class GradeResult(BaseModel):
     correct: bool
     score: float
     feedback: str
+
+
+class GradeShortBatchRequest(BaseModel):
+    question: ShortQuestion
+    answers: List[str] = Field(..., max_length=500)
+    use_llm: bool = True  # False: deterministic pass + keyword fallback only
+
+
+class GradeShortBatchResult(BaseModel):
+    results: List[GradeResult]  # same order as the request's answers
+    decided_without_llm: int
+    llm_calls: int
+
+
+class GradeSQLRequest(BaseModel):
+    question: SQLQuestion
+    query: str
+
+
+class GradeSQLBatchRequest(BaseModel):
+    question: SQLQuestion
+    queries: List[str] = Field(..., max_length=500)
+
+
+class GradeSQLBatchResult(BaseModel):
+    results: List[GradeResult]  # same order as the request's queries
+
+
+class GradeCodingRequest(BaseModel):
+    question: CodingQuestion
+    code: str = Field(..., max_length=100_000)
+    early_exit: bool = False  # stop at the first failing test
+
+
+class CodingTestResult(BaseModel):
+    name: str
+    passed: bool
+    skipped: bool = False
+    got: Optional[str] = None
+    stdout: Optional[str] = None
+    error: Optional[str] = None
+    duration_ms: Optional[float] = None
+
+
+class GradeCodingResult(GradeResult):
+    tests: List[CodingTestResult]
+
+
+JobKind = Literal["generate", "generate_batch", "grade_short", "grade_short_batch",
+                  "grade_sql", "grade_sql_batch", "grade_coding"]
+
+
+class JobRequest(BaseModel):
+    kind: JobKind
+    payload: Dict  # the body the matching endpoint takes, e.g. a GenerateRequest for "generate"
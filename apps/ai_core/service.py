@@ -1,40 +1,164 @@
 import os
 import json
-from typing import Optional
-from utils import normalize_mcq, normalize_short, strip_cot, first_sentence
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import time
+import asyncio
+from contextlib import asynccontextmanager, aclosing
+from functools import lru_cache
+from typing import Literal, Optional
+from utils import (
+    normalize_mcq, normalize_short,
+    FirstSentenceStream, IncrementalJSONObject,
+)
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Match
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from fastapi.encoders import jsonable_encoder
 from dotenv import load_dotenv
 import httpx 
 
 from schemas import (
-    GenerateRequest, MCQQuestion, CodingQuestion, SQLQuestion, ShortQuestion,
-    GradeMCQRequest, GradeShortRequest, GradeResult
+    GenerateRequest, BatchGenerateRequest, MCQQuestion, CodingQuestion, SQLQuestion, ShortQuestion,
+    GradeMCQRequest, GradeShortRequest, GradeResult,
+    GradeShortBatchRequest, GradeShortBatchResult,
+    GradeSQLRequest, GradeSQLBatchRequest, GradeSQLBatchResult,
+    GradeCodingRequest, GradeCodingResult, JobRequest,
 )
-from llm_client import chat, pick_model
+import llm_client
+from llm_client import chat, chat_stream, pick_model
 from prompts import (
     GENERIC_SYSTEM, MCQ_USER_TMPL, CODING_USER_TMPL, SQL_USER_TMPL,
-    SHORT_USER_TMPL, GRADE_SHORT_SYSTEM, GRADE_SHORT_USER_TMPL
+    SHORT_USER_TMPL, GRADE_SHORT_SYSTEM, GRADE_SHORT_USER_TMPL,
+    GRADE_SHORT_BATCH_SYSTEM, GRADE_SHORT_BATCH_USER_TMPL,
 )
-from rag.retriever import get_index, ingest_example_docs
-from utils import ensure_json, truncate
+from rag.retriever import aget_index
+from rag import executor as rag_executor, retriever as rag_retriever
+from utils import ensure_json
+import prompt_builder
+import question_pool
+from grading import keyword_fallback, decide, answer_units, sql_result, coding_result
+from singleflight import SingleFlight
+import speculation
+import sql_engine
+import code_runner
+import metrics
+import admission
+import jobs
 
 # ------------------------------------------------------------------------------
 # Setup
 # ------------------------------------------------------------------------------
 load_dotenv()
-app = FastAPI(title="QuizForge AI Core", version="0.2.0")
+INGEST_BATCH_DOCS = int(os.getenv("RAG_INGEST_BATCH_DOCS", "64"))
+GEN_BATCH_CONCURRENCY = int(os.getenv("GEN_BATCH_CONCURRENCY", "4"))
+GEN_BATCH_MAX_ITEMS = int(os.getenv("GEN_BATCH_MAX_ITEMS", "100"))
+GRADE_PACK_SIZE = int(os.getenv("GRADE_PACK_SIZE", "5"))
+GRADE_PACK_MAX_CHARS = int(os.getenv("GRADE_PACK_MAX_CHARS", "6000"))
+GRADE_BATCH_CONCURRENCY = int(os.getenv("GRADE_BATCH_CONCURRENCY", "2"))
+COALESCE = os.getenv("COALESCE_ENABLED", "1") == "1"
+HINT_HEDGE_DELAY_S = float(os.getenv("HINT_HEDGE_DELAY_S", "3"))  # <0 disables hedging
 
-# Fast startup: do NOT bootstrap RAG unless explicitly requested.
-# If you want to seed demo chunks, set RAG_BOOTSTRAP=1 in .env.
-if os.getenv("RAG_BOOTSTRAP", "0") == "1":
-    persist = os.getenv("RAG_PERSIST", "./rag_store")
-    if not os.path.exists(persist) or (os.path.isdir(persist) and not os.listdir(persist)):
-        try:
-            ingest_example_docs()
-        except Exception:
-            # Seeding is optional; ignore failures to keep startup resilient
-            pass
+
+_started = time.monotonic()
+_preload_task: Optional[asyncio.Task] = None
+_startup_info: dict = {"serving_after_s": None, "preload_s": None}
+
+
+async def _preload():
+    # Embedder/Chroma load and model warm-up run while the app already serves
+    t0 = time.perf_counter()
+    await asyncio.gather(rag_retriever.preload(), llm_client.warmup(),
+                         asyncio.to_thread(prompt_builder.load_tokenizers), asyncio.to_thread(sql_engine.engine),
+                         asyncio.to_thread(code_runner.start))
+    _startup_info["preload_s"] = round(time.perf_counter() - t0, 3)
+
+
+def ready() -> bool:
+    return _preload_task is not None and _preload_task.done() and rag_retriever.ready()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _preload_task
+    # One pooled LLM client for the whole process (keep-alive across requests)
+    await llm_client.startup()
+    _preload_task = asyncio.create_task(_preload())
+    _startup_info["serving_after_s"] = round(time.monotonic() - _started, 3)
+    if qpool is not None:
+        qpool.start()
+    jobq.start()
+    try:
+        yield
+    finally:
+        _preload_task.cancel()
+        await asyncio.gather(_preload_task, return_exceptions=True)
+        if qpool is not None:
+            await qpool.stop()
+        await jobq.stop()  # running jobs go back to the queue for the next start
+        sql_engine.shutdown()
+        code_runner.shutdown()
+        await llm_client.shutdown()
+
+
+# Identical in-flight requests share one underlying call
+sf_generate = SingleFlight("generate")
+sf_grade_short = SingleFlight("grade_short")
+sf_grade_short_batch = SingleFlight("grade_short_batch")
+
+
+def _coalesce_key(payload: dict) -> str:
+    return json.dumps(payload, sort_keys=True, ensure_ascii=False)
+
+
+app = FastAPI(title="QuizForge AI Core", version="0.2.0", lifespan=lifespan)
+
+
+def _route_template(scope) -> str:
+    # Label by route template (/jobs/{job_id}), never the raw path: unknown paths must not add series
+    route = scope.get("route")
+    if route is None:
+        route = next((r for r in app.router.routes if r.matches(scope)[0] == Match.FULL), None)
+    return route.path if route is not None else "unmatched"
+
+
+@app.middleware("http")
+async def request_metrics(request: Request, call_next):
+    # Per-request stage timings; exposed as Server-Timing when enabled or asked for.
+    # Middleware runs before routing, so stage/fallback labels come from matching the routes here
+    timings = metrics.begin_request(_route_template(request.scope))
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    endpoint = _route_template(request.scope)
+    metrics.REQUEST_SECONDS.labels(endpoint, str(response.status_code)).observe(time.perf_counter() - t0)
+    if timings and (metrics.TIMING_HEADER or request.headers.get("x-timing") == "1"):
+        response.headers["Server-Timing"] = metrics.server_timing(timings)
+    return response
+
+
+@app.middleware("http")
+async def admission_context(request: Request, call_next):
+    # Priority class from the endpoint; optional X-Deadline-Ms budget for queued LLM work
+    admission.begin_request(request.url.path, request.headers.get("x-deadline-ms"))
+    return await call_next(request)
+
+
+@app.exception_handler(admission.Rejected)
+async def admission_rejected(request: Request, exc: admission.Rejected):
+    return JSONResponse({"detail": exc.detail}, status_code=exc.status,
+                        headers={"Retry-After": str(exc.retry_after)})
+
+
+@app.middleware("http")
+async def llm_cache_header(request: Request, call_next):
+    # X-LLM-Cache: hit=1,miss=0,... for requests that touched the LLM response cache
+    events = llm_client.track_cache()
+    response = await call_next(request)
+    if events:
+        response.headers["X-LLM-Cache"] = ",".join(f"{k}={v}" for k, v in sorted(events.items()))
+    return response
+
+# Fast startup: the RAG index (and demo seeding when RAG_BOOTSTRAP=1) loads in the
+# background from lifespan; see rag.retriever.preload.
 
 
 # ------------------------------------------------------------------------------
@@ -51,92 +175,449 @@ class IngestDoc(BaseModel):
 # ------------------------------------------------------------------------------
 @app.get("/health")
 def health():
+    # Liveness: always 200 once the app serves; "ready" says whether preload/warm-up finished
+    rag_index = rag_retriever._index
     return {
         "status": "ok",
+        "ready": ready(),
+        "startup": {
+            **_startup_info,
+            "uptime_s": round(time.monotonic() - _started, 3),
+            "rag": rag_retriever.status(),
+            "llm_warmup": llm_client.warmup_stats(),
+        },
         "llm_base": os.getenv("LLM_BASE_URL"),
         "models": {
             "general": os.getenv("MODEL_GENERAL"),
             "coder": os.getenv("MODEL_CODER"),
             "reasoner": os.getenv("MODEL_REASONER"),
         },
+        "llm_concurrency": llm_client.concurrency_stats(),
+        "admission": admission.stats(),
+        "llm_backends": llm_client.backend_stats(),
+        "llm_cache": llm_client.cache_stats(),
+        "speculation": validity.stats(),
+        "prompts": prompt_builder.stats(),
+        "sql": sql_engine.stats(),
+        "coding": code_runner.stats(),
+        "coalescing": {
+            "enabled": COALESCE,
+            **{sf.name: sf.stats() for sf in (sf_generate, sf_grade_short, sf_grade_short_batch)},
+        },
         "rag": {
             "persist": os.getenv("RAG_PERSIST", "./rag_store"),
-            "bootstrap_on_start": os.getenv("RAG_BOOTSTRAP", "0") == "1",
+            "bootstrap_on_start": rag_retriever.BOOTSTRAP,
+            "executor": rag_executor.stats(),
+            **(rag_index.health() if rag_index else {"batcher": None, "cache": None, "store": None}),
         },
+        "question_pool": qpool.stats() if qpool is not None else {"enabled": False},
+        "jobs": jobq.stats(),
     }
 
 
+@app.get("/ready")
+def readiness():
+    """Readiness probe: 503 until the embedder is loaded and models are warmed."""
+    body = {"ready": ready(), "rag": rag_retriever.status()["state"]}
+    if not body["ready"]:
+        raise HTTPException(503, body)
+    return body
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+
+metrics.gauge_from("quizforge_rag_executor_queued", "RAG jobs waiting for a worker.",
+                   lambda: rag_executor.stats()["queued"])
+metrics.gauge_from("quizforge_rag_executor_running", "RAG jobs running.",
+                   lambda: rag_executor.stats()["running"])
+metrics.gauge_from("quizforge_llm_outstanding", "LLM requests queued or running, all backends.",
+                   lambda: sum(b.outstanding for b in llm_client.router.backends.values()))
+
+
 # ------------------------------------------------------------------------------
 # RAG ingestion (manual; lazy by design)
 # ------------------------------------------------------------------------------
 @app.post("/rag/ingest")
-def rag_ingest(doc: IngestDoc):
+async def rag_ingest(doc: IngestDoc):
     try:
-        get_index().add_documents([doc.dict()])
-        return {"ok": True}
+        stats = await (await aget_index()).aadd_documents([doc.dict()])
+        return {"ok": True, **stats}
     except Exception as e:
         raise HTTPException(500, f"RAG ingest failed: {e}")
 
 
+async def _iter_lines(request: Request):
+    """Yield NDJSON lines from a raw body or from the 'file' field of a multipart upload."""
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(400, "Multipart upload must carry a 'file' field.")
+        async def source():
+            while chunk := await upload.read(1 << 16):
+                yield chunk
+        stream = source()
+    else:
+        stream = request.stream()
+    buf = b""
+    async for chunk in stream:
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            yield line
+    if buf:
+        yield buf
+
+
+@app.post("/rag/ingest/bulk")
+async def rag_ingest_bulk(request: Request):
+    """
+    Bulk ingestion: NDJSON body (one IngestDoc per line) or a multipart file upload.
+    Docs are chunked, embedded and persisted in batches of RAG_INGEST_BATCH_DOCS;
+    unchanged chunks are skipped by content hash.
+    """
+    try:
+        idx = await aget_index()
+    except Exception as e:
+        raise HTTPException(500, f"RAG ingest failed: {e}")
+    totals = {"docs": 0, "chunks": 0, "added": 0, "skipped": 0}
+    errors, batch, lineno, failed = [], [], 0, 0
+
+    async def flush():
+        if not batch:
+            return
+        try:
+            stats = await idx.aadd_documents(list(batch))
+        except Exception as e:
+            raise HTTPException(500, f"RAG ingest failed after {totals['docs']} docs: {e}")
+        for k in totals:
+            totals[k] += stats.get(k, 0)
+        batch.clear()
+
+    async for line in _iter_lines(request):
+        lineno += 1
+        if not line.strip():
+            continue
+        try:
+            batch.append(IngestDoc(**json.loads(line)).dict())
+        except Exception as e:
+            failed += 1
+            if len(errors) < 20:
+                errors.append({"line": lineno, "error": str(e)[:200]})
+            continue
+        if len(batch) >= INGEST_BATCH_DOCS:
+            await flush()
+    await flush()
+    return {"ok": not failed, **totals, "failed_lines": failed, "errors": errors}
+
+
+@app.get("/rag/search")
+async def rag_search(q: str, top_k: int = 6, mode: Optional[Literal["dense", "lexical", "hybrid"]] = None):
+    """Scored chunks for a query (uncached); for tuning RAG_MODE and the relevance floors."""
+    try:
+        idx = await aget_index()
+        hits = (await rag_executor.run_in_rag_pool(idx.search_many, [q], [top_k], mode))[0]
+    except Exception as e:
+        raise HTTPException(500, f"RAG search failed: {e}")
+    return {"hits": [
+        {"id": i, "score": round(score, 4), "title": meta.get("title"), "source": meta.get("source"),
+         "text": doc[:300]}
+        for i, score, doc, meta in hits
+    ]}
+
+
 # ------------------------------------------------------------------------------
 # Generation
 # ------------------------------------------------------------------------------
-@app.post("/generate")
-async def generate(req: GenerateRequest):
-    """
-    Generate a single item (mcq | short | coding | sql).
-    If req.use_rag is True, we lazily initialize embeddings on first retrieval.
-    """
+QTYPE_MODELS = {"mcq": MCQQuestion, "short": ShortQuestion, "coding": CodingQuestion, "sql": SQLQuestion}
+
+
+async def retrieve_context(req: GenerateRequest) -> str:
+    if not req.use_rag:
+        return ""
     try:
-        context = get_index().retrieve(req.topic, top_k=6) if req.use_rag else ""
+        return await (await aget_index()).aretrieve(req.topic, top_k=6)
     except Exception:
         # If embedding init fails (e.g., first-run downloads), fall back to no context
-        context = ""
+        metrics.fallback("rag_unavailable")
+        return ""
 
+
+def build_prompt(req: GenerateRequest, context: str) -> tuple[str, str]:
+    """Return (user prompt, model) for a generation request; context is fitted to the model's token budget."""
     if req.qtype == "mcq":
-        user = MCQ_USER_TMPL.format(topic=req.topic, difficulty=req.difficulty, context=context)
         model = pick_model("general")
+        user = prompt_builder.build(MCQ_USER_TMPL, model, GENERIC_SYSTEM, context,
+                                    topic=req.topic, difficulty=req.difficulty)
     elif req.qtype == "short":
-        user = SHORT_USER_TMPL.format(topic=req.topic, difficulty=req.difficulty, context=context)
         model = pick_model("general")
+        user = prompt_builder.build(SHORT_USER_TMPL, model, GENERIC_SYSTEM, context,
+                                    topic=req.topic, difficulty=req.difficulty)
     elif req.qtype == "coding":
         lang = req.language or "python"
         tags = req.tags or [req.topic]
-        user = CODING_USER_TMPL.format(language=lang, tags=tags, difficulty=req.difficulty)
         model = pick_model("coding")
+        user = prompt_builder.build(CODING_USER_TMPL, model, GENERIC_SYSTEM,
+                                    language=lang, tags=tags, difficulty=req.difficulty)
     elif req.qtype == "sql":
-        user = SQL_USER_TMPL.format(dataset="sakila", difficulty=req.difficulty, context=context)
         model = pick_model("general")
+        user = prompt_builder.build(SQL_USER_TMPL, model, GENERIC_SYSTEM, context, schema=sql_engine.schema(),
+                                    dataset=sql_engine.DATASET, difficulty=req.difficulty)
     else:
         raise HTTPException(400, "Unsupported qtype")
+    return user, model
+
+
+def parse_item(qtype: str, out: str):
+    """ensure_json -> normalize -> pydantic model; raises on schema mismatch."""
+    with metrics.stage("ensure_json", qtype=qtype):
+        data = ensure_json(out)
+    with metrics.stage("normalize", qtype=qtype):
+        if qtype == "mcq":
+            data = normalize_mcq(data)
+        elif qtype == "short":
+            data = normalize_short(data)
+    model_cls = QTYPE_MODELS.get(qtype)
+    if model_cls is None:
+        raise HTTPException(500, "Unexpected qtype after generation.")
+    with metrics.stage("validate", qtype=qtype):
+        return model_cls(**data)
+
+
+async def verify_sql(item: SQLQuestion) -> SQLQuestion:
+    """Run canonical_query on the dataset; expected_result_hash is computed here, never taken from the model."""
+    res = await sql_engine.aexecute(item.canonical_query)
+    if res.error:
+        raise ValueError(f"canonical_query failed: {res.error}")
+    item.dataset = sql_engine.DATASET
+    item.expected_result_hash = res.hash
+    return item
+
+
+async def verify_coding(item: CodingQuestion, req: GenerateRequest) -> CodingQuestion:
+    """Reject tasks whose tests the model's own reference solution fails; the solution is never served."""
+    check = req.validate_tests if req.validate_tests is not None else code_runner.VALIDATE
+    ref, item.reference_solution = item.reference_solution, None
+    if not check or item.language not in code_runner.LANGUAGES:
+        return item
+    if not ref or not item.tests:
+        raise ValueError("reference_solution and tests are required to validate the task")
+    results = await code_runner.run_tests(ref, item.signature, item.tests, early_exit=True)
+    bad = next((r for r in results if not r["passed"] and not r.get("skipped")), None)
+    if bad is not None:
+        raise ValueError(f"reference solution fails test {bad['name']}: {bad.get('error') or 'got ' + str(bad.get('got'))}")
+    return item
+
+
+async def finalize_item(req: GenerateRequest, item):
+    """Server-side checks after schema validation; raises ValueError to reject the item."""
+    if req.qtype == "sql":
+        return await verify_sql(item)
+    if req.qtype == "coding":
+        return await verify_coding(item, req)
+    return item
+
+
+# Filled in server-side by finalize_item; the model's values are never streamed
+SERVER_FIELDS = {"expected_result_hash", "reference_solution"}
+
+
+validity = speculation.ValidityTracker()
+
+
+async def generate_item(req: GenerateRequest, context: Optional[str] = None, cache: Optional[bool] = None):
+    """Full live generation path: RAG context, LLM call, normalization and validation."""
+    metrics.qtype_var.set(req.qtype)
+    if context is None:
+        context = await retrieve_context(req)
+    user, model = build_prompt(req, context)
 
     try:
         out = await chat(
             messages=[{"role": "system", "content": GENERIC_SYSTEM},
-                      {"role": "user", "content": truncate(user)}],
+                      {"role": "user", "content": user}],
             model=model,
             temperature=0.5,
             response_format_json=True,
+            cache=cache,
         )
+    except admission.Rejected:
+        raise
     except Exception as e:
         raise HTTPException(502, f"LLM call failed: {e}")
 
     try:
-        data = ensure_json(out)
-        
-        if req.qtype == "mcq":    
-            data = normalize_mcq(data)
-            return MCQQuestion(**data)
-        if req.qtype == "coding": return CodingQuestion(**data)
-        if req.qtype == "sql":    return SQLQuestion(**data)
-        if req.qtype == "short":  
-            data = normalize_short(data)
-            return ShortQuestion(**data)
-        raise HTTPException(500, "Unexpected qtype after generation.")
+        item = await finalize_item(req, parse_item(req.qtype, out))
     except Exception as ve:
+        validity.record(req.qtype, False)
         # Surface the model output snippet to help debug schema issues
         snippet = (out[:400] + "…") if isinstance(out, str) and len(out) > 400 else out
         raise HTTPException(422, f"Model output did not match schema: {ve}. Output snippet: {snippet}")
+    validity.record(req.qtype, True)
+    return item
+
+
+async def generate_speculative(req: GenerateRequest, context: Optional[str] = None):
+    """
+    Run up to K generations (staggered by the hedge delay); the first schema-valid item
+    wins and the rest are cancelled. K comes from the request or the per-qtype validity rate.
+    """
+    k = validity.choose_k(req.qtype, req.speculative_k)
+    if k <= 1:
+        return await generate_item(req, context)
+    if context is None:
+        context = await retrieve_context(req)
+    delay = req.hedge_delay_s if req.hedge_delay_s is not None else speculation.HEDGE_DELAY_S
+
+    pending, started, errors = set(), [], {}
+
+    def winner(done):
+        for t in done:
+            if t.exception() is None:
+                return t.result()
+            errors[t] = t.exception()
+        return None
+
+    try:
+        for n in range(k):
+            # Attempts must not share a cached/coalesced completion; hedges queue as batch work
+            attempt = generate_item(req, context, cache=False)
+            started.append(asyncio.create_task(admission.run_as("batch", attempt) if n else attempt))
+            pending.add(started[-1])
+            if n < k - 1 and delay > 0:
+                # Hedge: the next attempt starts after `delay`, or as soon as one fails
+                done, pending = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                item = winner(done)
+                if item is not None:
+                    return item
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            item = winner(done)
+            if item is not None:
+                return item
+        # The primary's own failure wins; shed hedges only surface when every attempt was shed
+        failures = [errors[t] for t in started]
+        raise next((e for e in failures if not isinstance(e, admission.Rejected)), failures[0])
+    finally:
+        for t in pending:
+            t.cancel()
+
+
+qpool = question_pool.QuestionPool(generate_item) if question_pool.ENABLED else None
+
+
+@app.post("/generate")
+async def generate(req: GenerateRequest):
+    """
+    Generate a single item (mcq | short | coding | sql).
+    If req.use_rag is True, we lazily initialize embeddings on first retrieval.
+    With QPOOL_ENABLED=1, a pre-generated item is served when one is ready.
+    Identical concurrent requests share one generation unless req.distinct is set.
+    """
+    if qpool is not None and req.use_pool:
+        item = qpool.pop(req)
+        if item is not None:
+            return QTYPE_MODELS[req.qtype](**item)
+    if COALESCE and not req.distinct:
+        payload = req.dict(exclude={"distinct", "use_pool"})
+        payload["topic"] = " ".join(req.topic.lower().split())
+        return await sf_generate.do(_coalesce_key(payload), lambda: generate_speculative(req))
+    return await generate_speculative(req)
+
+
+def _item_stem(item) -> str:
+    if isinstance(item, MCQQuestion):
+        return item.question
+    if isinstance(item, CodingQuestion):
+        return f"{item.title}\n{item.prompt}"
+    return item.prompt
+
+
+@app.post("/generate/batch")
+async def generate_batch(spec: BatchGenerateRequest):
+    """
+    Generate a whole quiz. One retrieval per topic, LLM calls fanned out under
+    GEN_BATCH_CONCURRENCY, near-duplicates (embedding cosine >= dedup_threshold)
+    rejected and retried. Streams NDJSON lines as items complete, then a summary line.
+    """
+    slots = [
+        GenerateRequest(qtype=e.qtype, topic=e.topic, difficulty=e.difficulty, language=e.language,
+                        tags=e.tags, use_rag=spec.use_rag, use_pool=spec.use_pool)
+        for e in spec.items for _ in range(e.count)
+    ]
+    entry_of = [i for i, e in enumerate(spec.items) for _ in range(e.count)]
+    if len(slots) > GEN_BATCH_MAX_ITEMS:
+        raise HTTPException(400, f"Batch too large: {len(slots)} items (max {GEN_BATCH_MAX_ITEMS}).")
+
+    by_topic = {r.topic: r for r in slots if r.use_rag}
+    contexts = dict(zip(by_topic, await asyncio.gather(*(retrieve_context(r) for r in by_topic.values()))))
+
+    index = None
+    if spec.dedup:
+        try:
+            index = await aget_index()
+        except Exception:
+            index = None  # fall back to exact-text dedup
+    accepted_embs, accepted_stems = [], set()
+    counts = {"generated": 0, "failed": 0, "duplicates_rejected": 0}
+    sem = asyncio.Semaphore(max(1, GEN_BATCH_CONCURRENCY))
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def is_duplicate(item) -> bool:
+        stem = " ".join(_item_stem(item).lower().split())
+        if stem in accepted_stems:
+            return True
+        emb = None
+        if index is not None:
+            emb = (await index.aembed([stem]))[0]
+            # No await between check and append: concurrent slots can't both pass
+            if any(float(emb @ other) >= spec.dedup_threshold for other in accepted_embs):
+                return True
+        accepted_stems.add(stem)
+        if emb is not None:
+            accepted_embs.append(emb)
+        return False
+
+    async def run_slot(n: int, req: GenerateRequest):
+        err = None
+        for _ in range(1 + spec.max_retries):
+            try:
+                item = None
+                if qpool is not None and req.use_pool:
+                    pooled = qpool.pop(req)
+                    item = QTYPE_MODELS[req.qtype](**pooled) if pooled is not None else None
+                if item is None:
+                    async with sem:
+                        item = await generate_item(req, context=contexts.get(req.topic, ""))
+                if spec.dedup and await is_duplicate(item):
+                    counts["duplicates_rejected"] += 1
+                    err = "near-duplicate"
+                    continue
+                counts["generated"] += 1
+                await results.put({"slot": n, "entry": entry_of[n], "item": item.dict()})
+                return
+            except HTTPException as e:
+                err = e.detail
+            except Exception as e:
+                err = repr(e)
+        counts["failed"] += 1
+        await results.put({"slot": n, "entry": entry_of[n], "error": str(err)[:500]})
+
+    async def stream():
+        tasks = [asyncio.create_task(run_slot(n, r)) for n, r in enumerate(slots)]
+        try:
+            for _ in tasks:
+                yield json.dumps(await results.get(), ensure_ascii=False) + "\n"
+            yield json.dumps({"done": True, "requested": len(slots), **counts}) + "\n"
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 
 # ------------------------------------------------------------------------------
@@ -152,20 +633,18 @@ def grade_mcq(req: GradeMCQRequest):
     )
 
 
-@app.post("/grade/short", response_model=GradeResult)
-async def grade_short(req: GradeShortRequest):
-    """
-    Grade short-answer strictly by rubric using a reasoning model; fallback to keyword proportion.
-    """
+async def grade_short_one(question: ShortQuestion, answer_text: str) -> GradeResult:
     try:
-        user = GRADE_SHORT_USER_TMPL.format(
-            question_json=json.dumps(req.question.dict(), ensure_ascii=False),
-            answer=req.answer_text
+        model = pick_model("reason")
+        user = prompt_builder.build(
+            GRADE_SHORT_USER_TMPL, model, GRADE_SHORT_SYSTEM, clip_fields=("answer",),
+            question_json=json.dumps(question.dict(), ensure_ascii=False),
+            answer=answer_text,
         )
         out = await chat(
             messages=[{"role": "system", "content": GRADE_SHORT_SYSTEM},
-                      {"role": "user", "content": truncate(user)}],
-            model=pick_model("reason"),
+                      {"role": "user", "content": user}],
+            model=model,
             temperature=0.0,
             response_format_json=True,
         )
@@ -173,24 +652,190 @@ async def grade_short(req: GradeShortRequest):
         # Validate expected keys exist
         _ = data["correct"]; _ = data["score"]; _ = data["feedback"]
         return GradeResult(**data)
+    except admission.Rejected:
+        raise  # shed: the client gets 429/503 + Retry-After, not a silent keyword grade
     except Exception:
-        # Deterministic fallback: simple rubric keyword coverage
-        pts = req.question.rubric_points
-        hits = sum(int(p.lower() in req.answer_text.lower()) for p in pts)
-        score = hits / max(1, len(pts))
-        missing = [p for p in pts if p.lower() not in req.answer_text.lower()]
-        return GradeResult(
-            correct=score >= 0.8,
-            score=score,
-            feedback=("Good coverage." if score >= 0.8 else f"Missing: {', '.join(missing[:4])}…"),
-        )
+        metrics.fallback("grade_keyword")
+        return keyword_fallback(question, answer_text)
+
+
+@app.post("/grade/short", response_model=GradeResult)
+async def grade_short(req: GradeShortRequest):
+    """
+    Grade short-answer strictly by rubric using a reasoning model; fallback to keyword proportion.
+    """
+    if COALESCE:
+        key = _coalesce_key({"question": req.question.dict(), "answer": req.answer_text.strip()})
+        return await sf_grade_short.do(key, lambda: grade_short_one(req.question, req.answer_text))
+    return await grade_short_one(req.question, req.answer_text)
+
+
+async def _rubric_similarities(question: ShortQuestion, answers: list[str]):
+    """Per answer, best cosine of any of its sentences to each rubric point (None if no embedder)."""
+    try:
+        index = await aget_index()
+        units = [answer_units(a) for a in answers]
+        flat = [u for us in units for u in us]
+        embs = await index.aembed(list(question.rubric_points) + flat)
+    except Exception:
+        return [None] * len(answers)
+    n = len(question.rubric_points)
+    points, rest = embs[:n], embs[n:]
+    out, k = [], 0
+    for us in units:
+        block = rest[k:k + len(us)]
+        k += len(us)
+        out.append((block @ points.T).max(axis=0).tolist())
+    return out
+
+
+@app.post("/grade/short/batch", response_model=GradeShortBatchResult)
+async def grade_short_batch(req: GradeShortBatchRequest):
+    """
+    Grade N answers to one ShortQuestion. Clear cases are decided deterministically
+    (rubric keyword matchers + embedding similarity per rubric point); the rest are
+    packed GRADE_PACK_SIZE per reasoner prompt under GRADE_BATCH_CONCURRENCY.
+    """
+    if COALESCE:
+        return await sf_grade_short_batch.do(_coalesce_key(req.dict()), lambda: _grade_short_batch(req))
+    return await _grade_short_batch(req)
+
+
+async def _grade_short_batch(req: GradeShortBatchRequest) -> GradeShortBatchResult:
+    q = req.question
+    results: list = [None] * len(req.answers)
+    sims = await _rubric_similarities(q, req.answers)
+    for i, (answer, s) in enumerate(zip(req.answers, sims)):
+        results[i] = decide(q, answer, s)
+    decided = sum(r is not None for r in results)
+    todo = [i for i, r in enumerate(results) if r is None]
+
+    if not req.use_llm:
+        for i in todo:
+            results[i] = keyword_fallback(q, req.answers[i])
+        return GradeShortBatchResult(results=results, decided_without_llm=decided, llm_calls=0)
+
+    packs, cur, size = [], [], 0
+    for i in todo:
+        n = len(req.answers[i])
+        if cur and (len(cur) >= GRADE_PACK_SIZE or size + n > GRADE_PACK_MAX_CHARS):
+            packs.append(cur)
+            cur, size = [], 0
+        cur.append(i)
+        size += n
+    if cur:
+        packs.append(cur)
+
+    sem = asyncio.Semaphore(max(1, GRADE_BATCH_CONCURRENCY))
+    calls = 0
+    question_json = json.dumps(q.dict(), ensure_ascii=False)
+
+    async def grade_pack(pack: list[int]):
+        nonlocal calls
+        async with sem:
+            if len(pack) == 1:
+                calls += 1
+                results[pack[0]] = await grade_short_one(q, req.answers[pack[0]])
+                return
+            got = {}
+            try:
+                model = pick_model("reason")
+                # Packs are sized by GRADE_PACK_MAX_CHARS; the JSON itself is never cut
+                user = prompt_builder.build(
+                    GRADE_SHORT_BATCH_USER_TMPL, model, GRADE_SHORT_BATCH_SYSTEM,
+                    question_json=question_json,
+                    answers_json=json.dumps([{"id": i, "answer": req.answers[i]} for i in pack], ensure_ascii=False),
+                )
+                calls += 1
+                out = await chat(
+                    messages=[{"role": "system", "content": GRADE_SHORT_BATCH_SYSTEM},
+                              {"role": "user", "content": user}],
+                    model=model,
+                    temperature=0.0,
+                    response_format_json=True,
+                )
+                for r in ensure_json(out).get("results", []):
+                    try:
+                        got[int(r["id"])] = GradeResult(correct=r["correct"], score=r["score"], feedback=r["feedback"])
+                    except Exception:
+                        continue
+            except admission.Rejected:
+                raise  # retrying the pack one answer at a time would only be shed again
+            except Exception:
+                pass
+            for i in pack:
+                if i in got:
+                    results[i] = got[i]
+        # Answers the packed reply missed go through the single-answer path
+        for i in pack:
+            if results[i] is None:
+                async with sem:
+                    calls += 1
+                    results[i] = await grade_short_one(q, req.answers[i])
+
+    tasks = [asyncio.create_task(grade_pack(p)) for p in packs]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for t in tasks:
+            t.cancel()  # one shed pack fails the request; stop the others
+    return GradeShortBatchResult(results=results, decided_without_llm=decided, llm_calls=calls)
+
+
+async def _expected_sql(question: SQLQuestion) -> sql_engine.QueryResult:
+    # The canonical query is authoritative; a stored hash only covers queries that no longer run
+    res = await sql_engine.aexecute(question.canonical_query)
+    if res.error is None:
+        return res
+    if question.expected_result_hash:
+        return sql_engine.QueryResult(question.expected_result_hash)
+    raise HTTPException(422, f"Question has no usable canonical_query: {res.error}")
+
+
+@app.post("/grade/sql", response_model=GradeResult)
+async def grade_sql(req: GradeSQLRequest):
+    """Run the student query on the read-only dataset and compare order-insensitive result hashes."""
+    expected = await _expected_sql(req.question)
+    return sql_result(expected, await sql_engine.aexecute(req.query))
+
+
+@app.post("/grade/sql/batch", response_model=GradeSQLBatchResult)
+async def grade_sql_batch(req: GradeSQLBatchRequest):
+    """Grade N queries for one SQLQuestion; distinct uncached queries run across SQL_BATCH_PROCESSES workers."""
+    expected = await _expected_sql(req.question)
+    got = await sql_engine.aexecute_many(req.queries)
+    return GradeSQLBatchResult(results=[sql_result(expected, g) for g in got])
+
+
+@app.post("/grade/coding", response_model=GradeCodingResult)
+async def grade_coding(req: GradeCodingRequest):
+    """
+    Run a submission against question.tests, concurrently across the pre-forked runner
+    pool; each test gets a forked child with rlimits, a wall timeout and no network.
+    """
+    q = req.question
+    if q.language not in code_runner.LANGUAGES:
+        raise HTTPException(400, f"Running {q.language} submissions is not supported yet.")
+    if not q.tests:
+        raise HTTPException(422, "Question has no tests.")
+    try:
+        results = await code_runner.run_tests(req.code, q.signature, q.tests, early_exit=req.early_exit)
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    except Exception as e:
+        raise HTTPException(503, f"Test runner unavailable: {e!r}")
+    return coding_result(results)
 
 
 # ------------------------------------------------------------------------------
 # Hints (no separate prompt constants required)
 # ------------------------------------------------------------------------------
-@app.post("/hint")
-async def hint(body: dict):
+HINT_SYSTEM = "Reply with ONE actionable hint, ≤25 words. No preamble, no examples, no lists, no reasoning tags."
+HINT_FALLBACK_SYSTEM = "ONE concise hint, ≤25 words."
+HINT_DEFAULT = "Allocate count[max(nums)+1], increment for each value, return the count array."
+
+
+def _hint_prompt(body: dict) -> str:
     q = body.get("question", {}) or {}
     failed = body.get("failed_tests", [])[:5]
     partial = (body.get("partial_answer", "") or "")[:1200]
@@ -201,40 +846,294 @@ async def hint(body: dict):
         "prompt": q.get("prompt"), "constraints": (q.get("constraints") or [])[:4],
         "failed_tests": failed,
     }
-    prompt = (
+    return (
         "Provide ONE concise, actionable hint (no solutions, no reasoning dumps).\n"
         "Reply with the hint sentence only.\n\n"
         f"{json.dumps(brief, ensure_ascii=False)}\n\n"
         f"Partial answer: {partial}"
     )
 
+
+async def _hint_deltas(prompt: str, system: str, model: str, stop, fs: FirstSentenceStream):
+    """Yield visible hint text; the upstream request is closed once the first sentence is complete."""
+    async with aclosing(chat_stream(
+        messages=[{"role": "system", "content": system},
+                  {"role": "user", "content": prompt_builder.fit(prompt, model, system)}],
+        model=model, temperature=0.1, max_tokens=80, stop=stop,
+    )) as deltas:
+        async for delta in deltas:
+            text = fs.feed(delta)
+            if text:
+                yield text
+            if fs.done:
+                break
+    text = fs.finish()
+    if text:
+        yield text
+
+
+async def _first_sentence_from(prompt: str, system: str, model: str, stop) -> str:
+    fs = FirstSentenceStream()
+    async for _ in _hint_deltas(prompt, system, model, stop, fs):
+        pass
+    return fs.sentence
+
+
+def _hint_attempts():
+    # No stop sequences for the reasoner: "</think>" / "\n\n" would end it before the hint
+    return [
+        (HINT_SYSTEM, pick_model("reason"), None),
+        (HINT_FALLBACK_SYSTEM, pick_model("general"), ["\n\n"]),
+    ]
+
+
+async def _hedged_hint(prompt: str) -> str:
+    """
+    Reasoner first; the general model is started after HINT_HEDGE_DELAY_S (or as soon as
+    the reasoner comes back empty). The first non-empty sentence wins, the other is cancelled.
+    """
+    (sys1, model1, stop1), (sys2, model2, stop2) = _hint_attempts()
+    primary = asyncio.create_task(_first_sentence_from(prompt, sys1, model1, stop1))
+    pending = {primary}
+    errors = []
     try:
-        out = await chat(
-            messages=[
-                {"role":"system","content":"Reply with ONE actionable hint, ≤25 words. No preamble, no examples, no lists, no reasoning tags."},
-                {"role":"user","content":truncate(prompt)}
-            ],
-            model=pick_model("reason"),
-            temperature=0.1,
-            max_tokens=80,
-            stop=["</think>", "\n\n"]   
-        )
+        if HINT_HEDGE_DELAY_S >= 0:
+            await asyncio.wait(pending, timeout=HINT_HEDGE_DELAY_S)
+        else:
+            await asyncio.wait(pending)
+        if primary.done():
+            pending.clear()
+            if primary.exception() is None and primary.result():
+                return primary.result()
+            if primary.exception() is not None:
+                errors.append(primary.exception())
+        pending.add(asyncio.create_task(_first_sentence_from(prompt, sys2, model2, stop2)))
+        metrics.fallback("hint_second_model")
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is not None:
+                    errors.append(t.exception())
+                elif t.result():
+                    return t.result()
+        if errors:
+            raise errors[0]
+        metrics.fallback("hint_default")
+        return HINT_DEFAULT
+    finally:
+        for t in pending:
+            t.cancel()
+
+
+@app.post("/hint")
+async def hint(body: dict):
+    prompt = _hint_prompt(body)
 
-        clean = first_sentence(strip_cot(out))
-        if not clean:  # fallback to general model if empty
-            out2 = await chat(
-                messages=[{"role":"system","content":"ONE concise hint, ≤25 words."},
-                          {"role":"user","content":truncate(prompt)}],
-                model=pick_model("general"),
-                temperature=0.1, max_tokens=80, stop=["\n\n"]
-            )
-            clean = first_sentence(strip_cot(out2)) or "Allocate count[max(nums)+1], increment for each value, return the count array."
-        return {"hint": clean}
+    try:
+        return {"hint": await _hedged_hint(prompt)}
 
+    except admission.Rejected:
+        raise
     except httpx.HTTPStatusError as e:
         detail = f"{e.response.status_code} {e.response.reason_phrase} - {e.response.text[:300]}"
         raise HTTPException(502, f"LLM hint failed: {detail}")
     except httpx.TimeoutException:
         raise HTTPException(502, "LLM hint failed: timeout (try smaller model or raise LLM_TIMEOUT).")
     except Exception as e:
-        raise HTTPException(502, f"LLM hint failed: {repr(e)}")
\ No newline at end of file
+        raise HTTPException(502, f"LLM hint failed: {repr(e)}")
+
+
+# ------------------------------------------------------------------------------
+# Streaming (server-sent events)
+# ------------------------------------------------------------------------------
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _sse_response(gen) -> StreamingResponse:
+    return StreamingResponse(gen, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.post("/hint/stream")
+async def hint_stream(body: dict):
+    """
+    Stream the hint as it is generated ('delta' events), stopping upstream generation
+    as soon as the first sentence outside any <think> block is complete.
+    Ends with a 'done' event carrying the full hint, or an 'error' event.
+    """
+    prompt = _hint_prompt(body)
+
+    async def events():
+        try:
+            for system, model, stop in _hint_attempts():
+                fs = FirstSentenceStream()
+                async for text in _hint_deltas(prompt, system, model, stop, fs):
+                    yield _sse("delta", {"text": text})
+                if fs.sentence:
+                    yield _sse("done", {"hint": fs.sentence, "model": model})
+                    return
+            yield _sse("done", {"hint": HINT_DEFAULT, "model": None})
+        except admission.Rejected as e:
+            yield _sse("error", {"status": e.status, "retry_after": e.retry_after, "detail": e.detail})
+        except Exception as e:
+            yield _sse("error", {"detail": f"LLM hint failed: {e!r}"[:500]})
+
+    return _sse_response(events())
+
+
+@lru_cache(maxsize=None)
+def _field_validator(model_cls, key: str):
+    field = model_cls.model_fields.get(key)
+    return TypeAdapter(field.annotation) if field is not None else None
+
+
+@app.post("/generate/stream")
+async def generate_stream(req: GenerateRequest):
+    """
+    Streaming /generate. Emits a 'field' event for each top-level field as soon as it
+    is complete and type-valid on its own (e.g. the question stem before the choices),
+    then one 'item' event with the fully normalized and validated item, or 'error'.
+    """
+    model_cls = QTYPE_MODELS.get(req.qtype)
+    if model_cls is None:
+        raise HTTPException(400, "Unsupported qtype")
+
+    async def events():
+        if qpool is not None and req.use_pool:
+            pooled = qpool.pop(req)
+            if pooled is not None:
+                item = model_cls(**pooled)
+                for key, value in item.dict().items():
+                    yield _sse("field", {"key": key, "value": value})
+                yield _sse("item", item.dict())
+                return
+
+        context = await retrieve_context(req)
+        user, model = build_prompt(req, context)
+        parser, out = IncrementalJSONObject(), []
+        try:
+            async with aclosing(chat_stream(
+                messages=[{"role": "system", "content": GENERIC_SYSTEM},
+                          {"role": "user", "content": user}],
+                model=model, temperature=0.5, response_format_json=True,
+            )) as deltas:
+                async for delta in deltas:
+                    out.append(delta)
+                    for key, value in parser.feed(delta):
+                        adapter = _field_validator(model_cls, key)
+                        if adapter is None or key in SERVER_FIELDS:
+                            continue
+                        try:
+                            value = adapter.dump_python(adapter.validate_python(value), mode="json")
+                        except Exception:
+                            continue  # left for normalization; arrives with the final item
+                        yield _sse("field", {"key": key, "value": value})
+        except admission.Rejected as e:
+            yield _sse("error", {"status": e.status, "retry_after": e.retry_after, "detail": e.detail})
+            return
+        except Exception as e:
+            yield _sse("error", {"status": 502, "detail": f"LLM call failed: {e}"[:500]})
+            return
+
+        text = "".join(out)
+        try:
+            item = await finalize_item(req, parse_item(req.qtype, text))
+            yield _sse("item", item.dict())
+        except Exception as ve:
+            snippet = (text[:400] + "…") if len(text) > 400 else text
+            yield _sse("error", {"status": 422,
+                                 "detail": f"Model output did not match schema: {ve}. Output snippet: {snippet}"})
+
+    return _sse_response(events())
+
+
+# ------------------------------------------------------------------------------
+# Jobs (async: submit, then poll / long-poll / SSE)
+# ------------------------------------------------------------------------------
+async def _job_generate_batch(spec: BatchGenerateRequest, progress):
+    resp = await generate_batch(spec)
+    total = sum(e.count for e in spec.items)
+    items, summary = [], {}
+    async for line in resp.body_iterator:
+        rec = json.loads(line)
+        if rec.get("done"):
+            summary = rec
+            continue
+        items.append(rec)
+        progress({"done": len(items), "total": total})
+    return {"items": sorted(items, key=lambda r: r["slot"]), **summary}
+
+
+# kind -> (payload model, handler(req, progress)); handlers are the endpoint functions themselves
+JOB_KINDS = {
+    "generate": (GenerateRequest, lambda req, _: generate(req)),
+    "generate_batch": (BatchGenerateRequest, _job_generate_batch),
+    "grade_short": (GradeShortRequest, lambda req, _: grade_short(req)),
+    "grade_short_batch": (GradeShortBatchRequest, lambda req, _: grade_short_batch(req)),
+    "grade_sql": (GradeSQLRequest, lambda req, _: grade_sql(req)),
+    "grade_sql_batch": (GradeSQLBatchRequest, lambda req, _: grade_sql_batch(req)),
+    "grade_coding": (GradeCodingRequest, lambda req, _: grade_coding(req)),
+}
+
+
+def _job_handler(model_cls, fn):
+    async def run(payload: dict, progress):
+        return jsonable_encoder(await fn(model_cls(**payload), progress))
+    return run
+
+
+jobq = jobs.JobQueue({kind: _job_handler(m, fn) for kind, (m, fn) in JOB_KINDS.items()})
+
+
+def _job_or_404(job_id: str) -> dict:
+    job = jobq.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Unknown job (finished jobs expire after JOBS_TTL_S).")
+    return job
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(req: JobRequest, response: Response):
+    """
+    Run a generate / batch-generate / grade request in the background and return its id at once.
+    The work is bounded by JOBS_WORKERS per process and queued behind interactive LLM calls.
+    """
+    model_cls, _ = JOB_KINDS[req.kind]
+    try:
+        payload = model_cls(**req.payload).dict()
+    except ValidationError as e:
+        raise HTTPException(422, json.loads(e.json(include_url=False)))
+    job = jobq.submit(req.kind, payload)
+    if job is None:
+        raise HTTPException(429, "Job queue is full.", headers={"Retry-After": "30"})
+    response.headers["Location"] = f"/jobs/{job['id']}"
+    return job
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    """Job state and, once finished, its result. wait=N long-polls up to N seconds for completion."""
+    _job_or_404(job_id)
+    return await jobq.wait(job_id, min(max(0.0, wait), jobs.MAX_WAIT_S)) or _job_or_404(job_id)
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """SSE: a 'state' event on every state/progress change, then one 'result' event with the finished job."""
+    _job_or_404(job_id)
+
+    async def events():
+        async for job in jobq.watch(job_id):
+            if job["state"] in jobs.DONE:
+                yield _sse("result", job)
+            else:
+                yield _sse("state", {k: job[k] for k in ("id", "state", "attempts", "progress")})
+
+    return _sse_response(events())
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    _job_or_404(job_id)
+    return jobq.cancel(job_id)
@@ -0,0 +1,47 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable
+
+import metrics
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one underlying task. The task runs on its
+    own, so one caller disconnecting does not cancel it for the others; it is cancelled
+    only when every caller has gone.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, list] = {}  # key -> [task, waiters]
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        call = self._calls.get(key)
+        if call is None:
+            task = asyncio.create_task(fn())
+            call = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda t, key=key: self._forget(key, t))
+            self.leaders += 1
+            metrics.SINGLEFLIGHT.labels(self.name, "leader").inc()
+        else:
+            self.coalesced += 1
+            metrics.SINGLEFLIGHT.labels(self.name, "coalesced").inc()
+        call[1] += 1
+        try:
+            return await asyncio.shield(call[0])
+        finally:
+            call[1] -= 1
+            if call[1] == 0 and not call[0].done():
+                call[0].cancel()
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if not task.cancelled():
+            task.exception()  # retrieved by the waiters; avoid "never retrieved" noise
+        call = self._calls.get(key)
+        if call is not None and call[0] is task:
+            del self._calls[key]
+
+    def stats(self) -> dict:
+        return {"leaders": self.leaders, "coalesced": self.coalesced, "inflight": len(self._calls)}
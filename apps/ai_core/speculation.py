@@ -0,0 +1,52 @@
+import os, math
+from typing import Dict, Optional
+
+SPEC_K = int(os.getenv("GEN_SPECULATIVE_K", "1"))        # parallel attempts for /generate; 1 = off
+SPEC_MAX_K = int(os.getenv("GEN_SPECULATIVE_MAX_K", "3"))
+SPEC_ADAPTIVE = os.getenv("GEN_SPECULATIVE_ADAPTIVE", "0") == "1"
+SPEC_TARGET = float(os.getenv("GEN_SPECULATIVE_TARGET", "0.95"))  # wanted P(at least one valid)
+SPEC_MIN_SAMPLES = int(os.getenv("GEN_SPECULATIVE_MIN_SAMPLES", "20"))
+HEDGE_DELAY_S = float(os.getenv("GEN_HEDGE_DELAY_S", "0"))  # stagger between attempts; 0 = all at once
+EWMA_ALPHA = 0.05
+
+
+class ValidityTracker:
+    """Per-qtype rate of LLM outputs that survive ensure_json -> normalize -> pydantic."""
+
+    def __init__(self):
+        self.valid: Dict[str, int] = {}
+        self.invalid: Dict[str, int] = {}
+        self.rate: Dict[str, float] = {}
+
+    def record(self, qtype: str, ok: bool) -> None:
+        counts = self.valid if ok else self.invalid
+        counts[qtype] = counts.get(qtype, 0) + 1
+        prev = self.rate.get(qtype)
+        self.rate[qtype] = float(ok) if prev is None else EWMA_ALPHA * float(ok) + (1 - EWMA_ALPHA) * prev
+
+    def samples(self, qtype: str) -> int:
+        return self.valid.get(qtype, 0) + self.invalid.get(qtype, 0)
+
+    def choose_k(self, qtype: str, requested: Optional[int] = None) -> int:
+        if requested is not None:
+            return max(1, min(SPEC_MAX_K, requested))
+        if not SPEC_ADAPTIVE or self.samples(qtype) < SPEC_MIN_SAMPLES:
+            return max(1, min(SPEC_MAX_K, SPEC_K))
+        p = self.rate[qtype]
+        if p >= SPEC_TARGET:
+            return 1
+        if p <= 0.0:
+            return SPEC_MAX_K
+        # smallest k with 1 - (1 - p)^k >= target
+        k = math.ceil(math.log(1 - SPEC_TARGET) / math.log(1 - p))
+        return max(1, min(SPEC_MAX_K, k))
+
+    def stats(self) -> dict:
+        return {
+            "adaptive": SPEC_ADAPTIVE, "default_k": SPEC_K, "max_k": SPEC_MAX_K, "hedge_delay_s": HEDGE_DELAY_S,
+            "qtypes": {
+                q: {"valid": self.valid.get(q, 0), "invalid": self.invalid.get(q, 0),
+                    "rate": round(self.rate[q], 4), "k": self.choose_k(q)}
+                for q in self.rate
+            },
+        }
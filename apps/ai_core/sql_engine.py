@@ -0,0 +1,240 @@
+import os, re, json, time, queue, asyncio, sqlite3, hashlib, logging, threading, multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, NamedTuple, Optional, Sequence
+
+from cache import TTLCache
+import sakila
+
+SAKILA_DB = os.getenv("SAKILA_DB", "")  # path to a real sakila.db; empty = built-in synthetic dataset
+DATASET = "sakila"
+MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "5000"))      # larger results are rejected, not truncated
+TIMEOUT_S = float(os.getenv("SQL_TIMEOUT_S", "2"))     # wall time per query
+POOL_SIZE = int(os.getenv("SQL_POOL_SIZE", "4"))       # read-only in-memory connections per process
+BATCH_PROCESSES = int(os.getenv("SQL_BATCH_PROCESSES", "2"))  # 0 = batches run on the connection pool
+HASH_CACHE_SIZE = int(os.getenv("SQL_HASH_CACHE_SIZE", "4096"))
+HASH_CACHE_TTL_S = float(os.getenv("SQL_HASH_CACHE_TTL_S", "86400"))
+
+log = logging.getLogger("quizforge.sql")
+
+# Only reads: no writes, PRAGMA, ATTACH or transactions, whatever the student sends
+_ALLOWED = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+
+
+class QueryResult(NamedTuple):
+    hash: Optional[str]
+    rows: Optional[int] = None
+    columns: Optional[int] = None
+    error: Optional[str] = None
+
+
+def normalize(sql: str) -> str:
+    """Cache key: case and whitespace folded outside quoted literals, trailing ';' dropped."""
+    parts = _QUOTED.split(sql.strip().rstrip(";").strip())
+    return "".join(p if i % 2 else " ".join(p.lower().split()) for i, p in enumerate(parts))
+
+
+def _value(v):
+    if isinstance(v, float):
+        return int(v) if v.is_integer() else round(v, 6)  # 3.0 == 3; SUM/AVG rounding noise
+    if isinstance(v, bytes):
+        return v.hex()
+    return v
+
+
+def result_hash(rows: Sequence[tuple], columns: int) -> str:
+    """Order-insensitive: sha256 over the sorted rows; column names are ignored, column order is not."""
+    lines = sorted(json.dumps([_value(v) for v in r], ensure_ascii=False, separators=(",", ":")) for r in rows)
+    h = hashlib.sha256(f"{columns}\n".encode())
+    for line in lines:
+        h.update(line.encode("utf-8") + b"\n")
+    return h.hexdigest()
+
+
+def _authorize(action, *args):
+    return sqlite3.SQLITE_OK if action in _ALLOWED else sqlite3.SQLITE_DENY
+
+
+def load_image() -> tuple[bytes, str]:
+    """Serialized database and a one-line-per-table schema summary for prompts."""
+    if SAKILA_DB:
+        src = sqlite3.connect(f"file:{SAKILA_DB}?mode=ro", uri=True)
+    else:
+        src = sqlite3.connect(":memory:")
+        sakila.build(src)
+    try:
+        tables = [r[0] for r in src.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+        cols = {t: [c[0] for c in src.execute("SELECT name FROM pragma_table_info(?)", (t,))] for t in tables}
+        schema = "\n".join(f"{t}({', '.join(c)})" for t, c in cols.items())
+        return src.serialize(), schema
+    finally:
+        src.close()
+
+
+class SQLEngine:
+    """Per-process pool of private, read-only in-memory copies of one database image."""
+
+    def __init__(self, image: bytes, schema: str = "", size: int = POOL_SIZE):
+        self.image = image
+        self.schema = schema
+        self.size = max(1, size)
+        self._idle: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self.counts = {"queries": 0, "errors": 0, "timeouts": 0, "too_many_rows": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        conn.deserialize(self.image)
+        conn.execute("PRAGMA query_only = 1")
+        conn.set_authorizer(_authorize)
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return self._connect()
+        return self._idle.get()
+
+    def run(self, sql: str) -> QueryResult:
+        """Execute one SELECT under the row and time limits (blocking; sqlite releases the GIL)."""
+        sql = sql.strip().rstrip(";").strip()
+        if not sql:
+            return QueryResult(None, error="Empty query.")
+        self.counts["queries"] += 1
+        conn = self._acquire()
+        deadline = time.monotonic() + TIMEOUT_S
+        conn.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+        cur = None
+        try:
+            cur = conn.execute(sql)
+            if cur.description is None:
+                return QueryResult(None, error="Only SELECT queries are allowed.")
+            rows = cur.fetchmany(MAX_ROWS + 1)
+            if len(rows) > MAX_ROWS:
+                self.counts["too_many_rows"] += 1
+                return QueryResult(None, error=f"Result exceeds {MAX_ROWS} rows.")
+            ncols = len(cur.description)
+            return QueryResult(result_hash(rows, ncols), len(rows), ncols)
+        except (sqlite3.Error, sqlite3.Warning) as e:
+            if time.monotonic() > deadline:
+                self.counts["timeouts"] += 1
+                return QueryResult(None, error=f"Query exceeded {TIMEOUT_S:g}s.")
+            self.counts["errors"] += 1
+            msg = str(e)
+            if "not authorized" in msg:
+                msg = "Only read-only SELECT queries are allowed."
+            return QueryResult(None, error=msg[:300])
+        finally:
+            if cur is not None:
+                cur.close()
+            conn.set_progress_handler(None, 0)
+            self._idle.put(conn)
+
+    def stats(self) -> dict:
+        return {"connections": self._created, "pool_size": self.size, **self.counts}
+
+
+_engine: Optional[SQLEngine] = None
+_engine_lock = threading.Lock()
+_threads = ThreadPoolExecutor(max_workers=max(1, POOL_SIZE), thread_name_prefix="sql")
+_procs: Optional[ProcessPoolExecutor] = None
+_hashes = TTLCache(maxsize=HASH_CACHE_SIZE, ttl_s=HASH_CACHE_TTL_S)
+
+
+def engine() -> SQLEngine:
+    """Load the dataset once per process (blocking; preloaded at startup)."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                t0 = time.perf_counter()
+                image, schema = load_image()
+                _engine = SQLEngine(image, schema)
+                log.info("sql dataset %s loaded: %d KiB in %.2fs", SAKILA_DB or "synthetic sakila",
+                         len(image) >> 10, time.perf_counter() - t0)
+    return _engine
+
+
+def schema() -> str:
+    return engine().schema
+
+
+def execute(sql: str) -> QueryResult:
+    """Run with the result cached per normalized query; failures (timeouts included) are not cached."""
+    key = normalize(sql)
+    hit = _hashes.get(key)
+    if hit is not None:
+        return hit
+    res = engine().run(sql)
+    if res.error is None:
+        _hashes.put(key, res)
+    return res
+
+
+async def aexecute(sql: str) -> QueryResult:
+    return await asyncio.get_running_loop().run_in_executor(_threads, execute, sql)
+
+
+def _init_worker(image: bytes) -> None:
+    global _engine
+    _engine = SQLEngine(image, size=1)
+
+
+def _run_in_worker(sql: str) -> QueryResult:
+    return _engine.run(sql)
+
+
+def _process_pool() -> ProcessPoolExecutor:
+    global _procs
+    if _procs is None:
+        # spawn: forking a process that runs an event loop and worker threads is unsafe
+        _procs = ProcessPoolExecutor(max_workers=BATCH_PROCESSES, mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_init_worker, initargs=(engine().image,))
+    return _procs
+
+
+async def aexecute_many(sqls: Sequence[str]) -> List[QueryResult]:
+    """Batch grading: cache first, then distinct misses fanned out across worker processes."""
+    out: List[Optional[QueryResult]] = [_hashes.get(normalize(s)) for s in sqls]
+    todo = {}
+    for i, s in enumerate(sqls):
+        if out[i] is None:
+            todo.setdefault(normalize(s), []).append(i)
+    if not todo:
+        return out
+    if BATCH_PROCESSES <= 0 or len(todo) == 1:
+        got = await asyncio.gather(*(aexecute(sqls[idx[0]]) for idx in todo.values()))
+    else:
+        pool = await asyncio.get_running_loop().run_in_executor(_threads, _process_pool)
+        got = await asyncio.gather(*(asyncio.wrap_future(pool.submit(_run_in_worker, sqls[idx[0]]))
+                                     for idx in todo.values()))
+    for (key, idx), res in zip(todo.items(), got):
+        if res.error is None:
+            _hashes.put(key, res)
+        for i in idx:
+            out[i] = res
+    return out
+
+
+def shutdown() -> None:
+    global _procs
+    if _procs is not None:
+        _procs.shutdown(wait=False, cancel_futures=True)
+        _procs = None
+
+
+def stats() -> dict:
+    return {
+        "dataset": SAKILA_DB or "synthetic",
+        "loaded": _engine is not None,
+        "max_rows": MAX_ROWS, "timeout_s": TIMEOUT_S, "batch_processes": BATCH_PROCESSES,
+        "engine": _engine.stats() if _engine is not None else None,
+        "hash_cache": _hashes.stats(),
+    }
@@ -0,0 +1,99 @@
+"""
+Failover and ejection against bench/fake_llm: one live fake backend, one dead port.
+
+    cd apps/ai_core && python -m pytest -q tests
+"""
+import os, sys, time, socket, asyncio, subprocess
+from pathlib import Path
+
+import httpx
+import pytest
+
+APP_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(APP_DIR))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def llm():
+    port, dead = _free_port(), _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "bench.fake_llm", "--port", str(port), "--latency", "fixed:0",
+         "--tokens-per-s", "100000"], cwd=APP_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    live = f"http://127.0.0.1:{port}/v1"
+    deadline = time.monotonic() + 20
+    while True:
+        try:
+            httpx.get(f"{live}/models", timeout=1).raise_for_status()
+            break
+        except httpx.HTTPError:
+            if time.monotonic() > deadline or proc.poll() is not None:
+                proc.kill()
+                pytest.fail("fake LLM did not start")
+            time.sleep(0.1)
+    # Dead backend first: with equal load the router tries it first
+    os.environ.update(LLM_BACKENDS=f"http://127.0.0.1:{dead}/v1,{live}", LLM_HEALTH_INTERVAL_S="0",
+                      LLM_RETRIES="1", LLM_WARMUP="0", LLM_CACHE_ENABLED="0")
+    import llm_client
+    yield llm_client, f"http://127.0.0.1:{dead}/v1", live
+    proc.terminate()
+    proc.wait(10)
+
+
+def _backends(llm_client, dead, live):
+    return llm_client.router.backends[dead], llm_client.router.backends[live]
+
+
+def test_failover_then_ejection(llm):
+    import llm_router
+    llm_client, dead, live = llm
+    bad, good = _backends(llm_client, dead, live)
+
+    async def run():
+        for i in range(llm_router.EJECT_AFTER + 2):
+            out = await llm_client.chat([{"role": "user", "content": f"Reply with OK. {i}"}],
+                                        model=llm_client.MODEL_GENERAL)
+            assert out
+        await llm_client.shutdown()
+
+    asyncio.run(run())
+    # Each call failed over to the live backend until the dead one was ejected
+    assert bad.failures == llm_router.EJECT_AFTER
+    assert bad.requests == llm_router.EJECT_AFTER
+    assert bad.ejected_until > time.monotonic()
+    assert good.requests == llm_router.EJECT_AFTER + 2 and good.failures == 0
+
+
+def test_probe_does_not_lift_passive_ejection(llm):
+    import llm_router
+    llm_client, dead, live = llm
+    router = llm_client.router
+    bad, good = _backends(llm_client, dead, live)
+    for _ in range(llm_router.EJECT_AFTER):
+        router.record_failure(good)  # completions failing while /models still answers
+    until, streak = good.ejected_until, good.fail_streak
+    assert not good.available(time.monotonic())
+
+    async def probe():
+        async with httpx.AsyncClient() as client:
+            await router.check(client, good)
+            await router.check(client, bad)
+
+    asyncio.run(probe())
+    assert good.healthy and not bad.healthy
+    assert (good.ejected_until, good.fail_streak) == (until, streak)
+    assert not good.available(time.monotonic())
+
+    # The ejection ends on its own timer...
+    good.ejected_until = time.monotonic() - 0.001
+    assert good.available(time.monotonic())
+    # ...or as soon as a real request succeeds
+    router.record_failure(good)
+    assert not good.available(time.monotonic())
+    router.record_success(good, 0.01)
+    assert good.available(time.monotonic()) and good.fail_streak == 0
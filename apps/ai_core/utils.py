@@ -94,9 +94,6 @@ def ensure_json(s: str) -> dict:
         data = yaml.safe_load(s)
         return data
 
-def truncate(text: str, n: int = 4000) -> str:
-    return text if len(text) <= n else text[:n] + "…"
-
 def strip_cot(text: str) -> str:
     if not isinstance(text, str): return text
     text = re.sub(r"(?is)<think>.*?</think>\s*", "", text)
@@ -127,3 +124,153 @@ def sanitize_hint(text: str, max_words: int = 25) -> str:
     if len(words) > max_words:
         t = " ".join(words[:max_words]) + "..."
     return t
+
+
+class StreamingThinkFilter:
+    """Incrementally drops <think>…</think> blocks (and stray tags) from streamed text."""
+    OPEN, CLOSE = "<think>", "</think>"
+
+    def __init__(self):
+        self.buf = ""
+        self.in_think = False
+
+    def feed(self, chunk: str) -> str:
+        self.buf += chunk
+        out = []
+        while self.buf:
+            low = self.buf.lower()
+            if self.in_think:
+                i = low.find(self.CLOSE)
+                if i < 0:
+                    self.buf = self.buf[-(len(self.CLOSE) - 1):]
+                    break
+                self.buf = self.buf[i + len(self.CLOSE):]
+                self.in_think = False
+                continue
+            i_open, i_close = low.find(self.OPEN), low.find(self.CLOSE)
+            hits = [(i, t) for i, t in ((i_open, self.OPEN), (i_close, self.CLOSE)) if i >= 0]
+            if hits:
+                i, tag = min(hits)
+                out.append(self.buf[:i])
+                self.buf = self.buf[i + len(tag):]
+                self.in_think = tag == self.OPEN
+                continue
+            # hold back a possible partial tag at the end
+            k = self.buf.rfind("<")
+            if k >= 0 and (self.OPEN.startswith(low[k:]) or self.CLOSE.startswith(low[k:])):
+                out.append(self.buf[:k])
+                self.buf = self.buf[k:]
+            else:
+                out.append(self.buf)
+                self.buf = ""
+            break
+        return "".join(out)
+
+    def flush(self) -> str:
+        rest = "" if self.in_think else self.buf
+        self.buf = ""
+        return rest
+
+
+_SENTENCE_END = re.compile(r"[.!?](\s)|\n\s*\n")
+
+class FirstSentenceStream:
+    """
+    Feed streamed LLM text; get back the visible part of the first sentence as it
+    grows. `done` flips once a sentence end (outside any think block) has been seen.
+    """
+
+    def __init__(self, max_chars: int = 160):
+        self.think = StreamingThinkFilter()
+        self.text = ""
+        self.emitted = 0
+        self.done = False
+        self.max_chars = max_chars
+
+    def _take(self, visible: str, final: bool) -> str:
+        self.text += visible
+        body = self.text.lstrip()
+        m = _SENTENCE_END.search(body)
+        if m:
+            body = body[: m.start() + 1] if m.group(1) is not None else body[: m.start()]
+            self.done = True
+        elif len(body) >= self.max_chars:
+            body = body[: self.max_chars]
+            self.done = True
+        elif final:
+            self.done = True
+        new = body[self.emitted:]
+        self.emitted = len(body)
+        return new
+
+    def feed(self, chunk: str) -> str:
+        if self.done:
+            return ""
+        return self._take(self.think.feed(chunk), final=False)
+
+    def finish(self) -> str:
+        if self.done:
+            return ""
+        return self._take(self.think.flush(), final=True)
+
+    @property
+    def sentence(self) -> str:
+        return first_sentence(self.text) if self.text.strip() else ""
+
+
+class IncrementalJSONObject:
+    """
+    Minimal incremental parser for ONE top-level JSON object: feed() text chunks and
+    get back the (key, value) pairs that became complete. Scalars are only accepted
+    once a delimiter follows, so "12" is not reported before "123" arrives.
+    """
+    _decoder = json.JSONDecoder()
+
+    def __init__(self):
+        self.buf = ""
+        self.pos = None  # index just after '{' / previous member, once the object started
+        self.done = False
+
+    def _skip_ws(self, i: int) -> int:
+        while i < len(self.buf) and self.buf[i] in " \t\r\n":
+            i += 1
+        return i
+
+    def feed(self, chunk: str) -> list:
+        self.buf += chunk
+        out = []
+        if self.pos is None:
+            start = self.buf.find("{")
+            if start < 0:
+                return out
+            self.pos = start + 1
+        while not self.done:
+            i = self._skip_ws(self.pos)
+            if i >= len(self.buf):
+                break
+            if self.buf[i] == ",":
+                i = self._skip_ws(i + 1)
+                if i >= len(self.buf):
+                    break
+            if self.buf[i] == "}":
+                self.done = True
+                break
+            try:
+                key, j = self._decoder.raw_decode(self.buf, i)
+            except ValueError:
+                break
+            j = self._skip_ws(j)
+            if j >= len(self.buf) or self.buf[j] != ":":
+                break
+            j = self._skip_ws(j + 1)
+            try:
+                value, end = self._decoder.raw_decode(self.buf, j)
+            except ValueError:
+                break
+            if not isinstance(value, (dict, list, str)):
+                k = self._skip_ws(end)
+                if k >= len(self.buf) or self.buf[k] not in ",}":
+                    break
+            out.append((key, value))
+            self.pos = end
+        return out